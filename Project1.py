@@ -1,423 +1,407 @@
 """
 Redbus Data Scraping with Selenium & Dynamic Filtering using Streamlit
 
-This module scrapes bus route data from RedBus for various state 
-transport corporations in India using Selenium, stores the data in a  
-MySQL database, and displays it in an interactive Streamlit web app 
-with filtering options.
+This module displays the bus route data scraped from RedBus for various
+state transport corporations in India in an interactive Streamlit web
+app with filtering options.
+
+The app only reads the loaded data, from MySQL or from an embedded
+DuckDB/SQLite snapshot file (see storage.py). Scraping and loading are
+done by the separate ingestion entry point (ingest.py), so starting the
+app never triggers a scrape.
 
 Modules used:
-- time: for delays in scraping
+- os: for reading runtime configuration
+- numpy: for formatting a page of results
 - pandas: for data storage and manipulation
-- selenium: for web scraping
 - streamlit: for web app UI
-- mysql.connector: for database operations
+- storage: for the MySQL or embedded storage backend
+- route_slice: for in-memory filtering of a route
+- bitmap_index: for statewide and nationwide searches
+- query_cache: for caching navigation queries per snapshot
 """
-import time
+import os
+
+import numpy as np
 
 import pandas as pd
 
-from selenium import webdriver
+import streamlit as st
 
-from selenium.webdriver.common.by import By
+import route_slice
 
-from selenium.webdriver.support.ui import WebDriverWait
+import storage
 
-from selenium.webdriver.support import expected_conditions as EC
+from bitmap_index import BitmapIndex, read_snapshot
 
-import streamlit as st
+from query_cache import QueryCache
 
-import mysql.connector
+# Storage backend serving the dashboard ("mysql", "duckdb" or
+# "sqlite"), and the embedded file for the latter two
+STORAGE_BACKEND = os.environ.get("REDBUS_STORAGE", "mysql")
 
-from sqlalchemy import create_engine
+STORAGE_PATH = os.environ.get("REDBUS_STORAGE_PATH", "busgrid.duckdb")
 
-# Cache the scraped data to avoid re-scraping on every app reload
-@st.cache_data 
+# Query results kept by the query cache, and for how many seconds
+QUERY_CACHE_SIZE = int(os.environ.get("REDBUS_QUERY_CACHE_SIZE", "512"))
 
-# Function to scrape bus data from RedBus
-def scrap_redbus_data():
+QUERY_CACHE_TTL = float(os.environ.get("REDBUS_QUERY_CACHE_TTL", "3600"))
 
+# Seconds between checks for a newly published snapshot
+VERSION_POLL = float(os.environ.get("REDBUS_VERSION_POLL", "10"))
 
-    def extraction(x,y,z):
+# Buses per page of results; "Load more" fetches the next page
+PAGE_SIZE = int(os.environ.get("REDBUS_PAGE_SIZE", "100"))
 
-        """
-        Extracts bus details from a route page and 
-        appends them to the DATA dictionary.
-        """
-        def scroll():
+# Define filtering options for the bus search
+FILTERING_OPTIONS = [
+    "❄️ AC","🪟 NON-AC","🛌 SLEEPER","💺 SEATER","🌟 LUXURY",
+    "⚡ ELECTRIC","🏛️ GOVERNMENT","🏢 PRIVATE","⭐ HIGHLY RATED",
+    "🌞 DAY TRAVEL","🌙 NIGHT TRAVEL"
+]
 
-            """
-            Scrolls through the bus listings page until 
-            the end of the listings is reached
-            or maximum scroll attempts are exceeded.
-            """
+# Filter pill -> bitmap index filter
+PILL_FILTERS = {
+    "❄️ AC": "ac",
+    "🪟 NON-AC": "non_ac",
+    "🛌 SLEEPER": "sleeper",
+    "💺 SEATER": "seater",
+    "🌟 LUXURY": "luxury",
+    "⚡ ELECTRIC": "electric",
+    "🏛️ GOVERNMENT": "government",
+    "🏢 PRIVATE": "private",
+    "⭐ HIGHLY RATED": "highly_rated",
+    "🌞 DAY TRAVEL": "day",
+    "🌙 NIGHT TRAVEL": "night"
+}
 
-            B = 0
+# Column headers of the bus details table
+DETAIL_COLUMNS = [
+    "BUS NAME", "BUS TYPE", "DEPARTING TIME", "DURATION",
+    "REACHING TIME", "STAR RATING", "PRICE (₹)", "SEATS AVAILABLE"
+]
 
-            while True:
 
-                BUSES = driver.find_elements(
-                    By.XPATH,"//div[contains(@class,'travelsName___')]"
-                )
+def format_clock(TIMES):
 
-                if len(BUSES) < 3:
+    """
+    Formats a column of times of day as "8:05 PM".
+    """
 
-                    break
+    SECONDS = TIMES.dt.total_seconds().fillna(0).astype(int)
 
-                driver.execute_script(
-                    """
-                    arguments[0].scrollIntoView({
-                        behavior: 'smooth',
-                        block: 'center'
-                    });
-                    """,
-                    BUSES[-3],
-                )
+    HOURS, MINUTES = SECONDS // 3600, SECONDS % 3600 // 60
 
-                time.sleep(3)
+    TEXT = (
+        (HOURS % 12).replace(0, 12).astype(str) + ":"
+        + MINUTES.astype(str).str.zfill(2)
+        + np.where(HOURS < 12, " AM", " PM")
+    )
 
-                try:
+    return TEXT.where(TIMES.notna(), "")
 
-                    # Check if the end of listings is reached
-                    driver.find_element(
-                        By.XPATH, "//span[contains(@class,'end')]"
-                    )
 
-                    break
+def format_minutes(MINUTES):
 
-                except:
+    """
+    Formats a column of durations in minutes as "08h 15m".
+    """
 
-                    pass
+    VALUES = MINUTES.astype(float).fillna(0).astype(int)
 
-                B += 1
+    TEXT = (
+        (VALUES // 60).astype(str).str.zfill(2) + "h "
+        + (VALUES % 60).astype(str).str.zfill(2) + "m"
+    )
 
-                if B > 10:
+    return TEXT.where(MINUTES.notna(), "")
 
-                    break
 
-        
+def format_number(VALUES, DIGITS):
 
-        # Scroll through the bus listings to load all buses
-        scroll()
+    """
+    Formats a numeric column with DIGITS decimals.
+    """
 
-        LE = driver.find_elements(
-            By.XPATH,"//div[contains(@class , 'travelsName___')]"
-        )
+    VALUES = VALUES.astype(float)
 
-        # Get the total number of buses on the page
-        LE = len(LE)
+    TEXT = pd.Series(
+        np.char.mod(f"%.{DIGITS}f", VALUES.fillna(0).to_numpy()),
+        index=VALUES.index
+    )
 
-        # Append static data for each bus
-        DATA['state'].extend([x]*(LE))
+    return TEXT.where(VALUES.notna(), "")
 
-        DATA['route_link'].extend([y]*(LE))
 
-        DATA['route_name'].extend([z]*(LE))
+def format_route_stats(BUSES, MIN_PRICE, MAX_PRICE, RATING):
 
-        # Append dynamic data for each bus
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//div[contains(@class,'travelsName___')]")
-            )
-        )
+    """
+    Formats a route's summary statistics for the route grid.
+    """
 
-        DATA['busname'].extend([C.text for C in driver.find_elements(
-            By.XPATH,"//div[contains(@class,'travelsName___')]"
-            )])
+    STATS = f"🚌 {BUSES} buses"
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'busType___')]")
-            )
-        )
+    if MIN_PRICE is not None:
 
-        DATA['bustype'].extend([C.text for C in driver.find_elements(
-            By.XPATH,"//p[contains(@class,'busType___')]"
-            )])
+        STATS += f" · ₹{MIN_PRICE:,.0f}–₹{MAX_PRICE:,.0f}"
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'boardingTime___')]")
-            )
-        )
+    if RATING:
 
-        DATA['departing_time'].extend([C.text for C in driver.find_elements(
-            By.XPATH,"//p[contains(@class,'boardingTime___')]"
-            )])
+        STATS += f" · ⭐ {RATING:.1f}"
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'duration___')]")
-            )
-        )
+    return STATS
 
-        DATA['duration'].extend([C.text for C in driver.find_elements(
-            By.XPATH,"//p[contains(@class,'duration___')]"
-            )])
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'droppingTime___')]")
-            )
-        )
+def format_details(RESULT, SHOW_STATE=False, SHOW_ROUTE=False):
 
-        DATA['reaching_time'].extend([C.text for C in driver.find_elements(
-            By.XPATH,"//p[contains(@class,'droppingTime___')]"
-            )])
+    """
+    Builds the bus details table of a page of results, formatted
+    for display a column at a time.
+    """
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//div[contains(@class,'timeFareBoWrap___')]")
-            )
-        )
+    DETAILS = RESULT.drop(columns=["state", "route_name"])
 
-        # Extract ratings
-        MAINC = driver.find_elements(
-            By.XPATH,"//div[contains(@class,'timeFareBoWrap___')]"
-            )
+    DETAILS.columns = DETAIL_COLUMNS
 
-        for L in MAINC:
+    DETAILS["DEPARTING TIME"] = format_clock(DETAILS["DEPARTING TIME"])
 
-            MAINC = driver.find_elements(
-                By.XPATH,"//div[contains(@class,'timeFareBoWrap___')]"
-            )
-            
-            try:
+    DETAILS["REACHING TIME"] = format_clock(DETAILS["REACHING TIME"])
 
-                DATA['star_rating'].append(L.find_element(
-                    By.XPATH, ".//div[contains(@class,'rating___')]"
-                    ).text)
-                
-            except:
+    DETAILS["DURATION"] = format_minutes(DETAILS["DURATION"])
 
-                DATA['star_rating'].append(0)
+    DETAILS["STAR RATING"] = format_number(DETAILS["STAR RATING"], 1)
 
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'finalFare___')]")
-            )
-        )
+    DETAILS["PRICE (₹)"] = format_number(DETAILS["PRICE (₹)"], 2)
 
-        # Extract price and seats available
-        DATA['price'].extend(
-            [
-            (C.text).replace('₹','').replace(',','')
-            for C in driver.find_elements(
-                By.XPATH,"//p[contains(@class,'finalFare___')]"
-                )
-            ]
-        )
-        
-        wait.until(EC.presence_of_all_elements_located(
-            (By.XPATH, "//p[contains(@class,'totalSeats___')]")
-            )
-        )
+    DETAILS["SEATS AVAILABLE"] = format_number(
+        DETAILS["SEATS AVAILABLE"], 0
+    )
 
-        DATA['seats_available'].extend(
-            [
-            C.text.split()[0] 
-            for C in driver.find_elements(
-                By.XPATH,"//p[contains(@class,'totalSeats___')]"
-                )
-            ]
-        )
-        
-        # Go back to the previous page
-        driver.back()
+    if SHOW_ROUTE:
+
+        DETAILS.insert(0, "ROUTE", RESULT["route_name"].astype(str))
+
+    if SHOW_STATE:
+
+        DETAILS.insert(0, "STATE", RESULT["state"].astype(str))
+
+    return DETAILS
 
-        time.sleep(3)
+
+def show_pages(KEY, QUERY, FETCH, TOTAL, MESSAGE, **DISPLAY):
+
+    """
+    Shows the results of a query a page at a time, cheapest first.
+
+    FETCH(AFTER) returns the page after a keyset cursor and the
+    next cursor. Pages loaded so far are kept, already formatted,
+    in the session state under KEY until QUERY (the filters and
+    snapshot version) changes, so a rerun formats nothing again
+    and "Load more" fetches just one more page.
+    """
+
+    if st.session_state.get(f"{KEY}_query") != QUERY:
+
+        st.session_state[f"{KEY}_query"] = QUERY
+
+        st.session_state[f"{KEY}_pages"] = []
+
+        st.session_state[f"{KEY}_next"] = None
+
+    PAGES = st.session_state[f"{KEY}_pages"]
+
+    if not PAGES:
+
+        PAGE, NEXT = FETCH(None)
+
+        PAGES.append(format_details(PAGE, **DISPLAY))
+
+        st.session_state[f"{KEY}_next"] = NEXT
+
+    DETAILS = pd.concat(PAGES, ignore_index=True)
+
+    st.success(f"🚌 {TOTAL} buses found {MESSAGE}.")
+
+    st.dataframe(DETAILS, use_container_width=True, hide_index=True)
+
+    NEXT = st.session_state[f"{KEY}_next"]
+
+    if NEXT is None:
 
         return
 
+    st.caption(f"Showing the {len(DETAILS)} cheapest of {TOTAL} buses.")
 
-    def scrap(x):
+    if st.button("⬇️ Load more", key=f"{KEY}_more"):
 
-        """
-        Scrapes all bus routes for a given state and extracts
-        details for each bus.
-        """
+        PAGE, NEXT = FETCH(NEXT)
 
-        # Get all route links on the current state page
-        RDETAILS=driver.find_elements(By.CSS_SELECTOR,"a[class='route']")
+        PAGES.append(format_details(PAGE, **DISPLAY))
 
-        for i in range(len(RDETAILS)):
+        st.session_state[f"{KEY}_next"] = NEXT
 
-            
-            if MULTI_PAGE:
+        st.rerun()
 
-                PANUM = driver.find_elements(
-                        By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
-                        )
-            
 
+# One storage backend per server process (for MySQL, a bounded pool
+# of warm connections), shared by every session and rerun
+@st.cache_resource
+def get_storage():
+
+    """
+    Returns the process-wide storage backend.
+    """
 
-                driver.execute_script('arguments[0].click();', PANUM[PAGE])    
+    return storage.open_storage(STORAGE_BACKEND, STORAGE_PATH)
 
-            # Re-fetch route elements to avoid stale element reference
-            RDETAILS=driver.find_elements(By.CSS_SELECTOR,"a[class='route']")
 
-            ROUTE_LINK = RDETAILS[i].get_attribute('href')
-            
-            ROUTE_TITLE = RDETAILS[i].get_attribute('title')
+# One query result cache per server process, invalidated when
+# ingestion publishes a new snapshot version
+@st.cache_resource
+def get_query_cache():
 
-            # Open the route page
-            driver.get(ROUTE_LINK)
+    """
+    Returns the process-wide query result cache.
+    """
 
-            time.sleep(3)
+    return QueryCache(
+        get_storage().snapshot_version,
+        max_entries=QUERY_CACHE_SIZE,
+        ttl=QUERY_CACHE_TTL,
+        version_ttl=VERSION_POLL
+    )
 
-            try:
 
-                driver.find_element(By.CSS_SELECTOR,"//h4[contains(@class,'title___')]")
-                continue
+def fetch_all(QUERY, PARAMS=()):
 
-            except:
-                pass
+    """
+    Returns the rows of a read query, from the query cache when
+    the same query already ran against the current snapshot.
+    """
 
-            
-            try:
+    return get_query_cache().get_or_run(
+        QUERY, PARAMS, get_storage().fetch_all
+    )
 
-                # Wait until bus listings are loaded
-                wait.until(EC.presence_of_all_elements_located(
-                        (By.XPATH, "//li[contains(@class, 'tupleWrapper')]")
-                    )
-                )
 
-        
-            
-                # Get government bus listings
-                GOVT_BUSES = driver.find_elements(
-                    By.XPATH,"//div[contains(@class,'rtcInfoWrap___')]"
-                )
+# Build the bitmap index once per published snapshot and share
+# it between sessions; a new ingestion bumps the version
+@st.cache_resource(max_entries=1)
+def load_bitmap_index(version):
 
-                for j in range(len(GOVT_BUSES)):
+    """
+    Reads the bus_routes snapshot and builds its bitmap index.
+    """
 
-                    # Re-fetch to prevent stale element reference
-                    GOVT_BUSES = driver.find_elements(
-                        By.XPATH,"//div[contains(@class,'rtcInfoWrap___')]"
-                    )
+    return BitmapIndex(read_snapshot(get_storage()))
 
-                    GOVT_BUSES[j].click()
 
-                    # Wait until the bus details are loaded
-                    wait.until(EC.presence_of_all_elements_located(
-                        (By.XPATH, "//li[contains(@class, 'tupleWrapper')]")
-                        )
-                    )
+# Load each route's buses once per snapshot version, so moving
+# the price slider or toggling a pill never queries the database.
+# The cached value is the slice's Arrow buffer, not a pickled frame
+@st.cache_data(max_entries=256)
+def load_route_slice(state, route, version):
 
-                    # Extract bus details for the clicked government bus
-                    extraction(x, ROUTE_LINK, ROUTE_TITLE)
+    """
+    Reads the typed buses of one route as an Arrow buffer.
+    """
 
-                # Extract details for remaining buses on the route page
-                extraction(x, ROUTE_LINK, ROUTE_TITLE)          
+    return route_slice.to_arrow(
+        route_slice.read_route_slice(get_storage(), state, route)
+    )
 
-            except:
 
-                driver.back()
-                
-                time.sleep(3)
-        return
+def show_search(STATE=None):
 
-    # Initialize Chrome WebDriver
-    driver = webdriver.Chrome()
-
-    # Set up an explicit wait for elements to load (max 10 seconds)
-    wait = WebDriverWait(driver, 30)
-
-    # Dictionary containing state names and their 
-    # corresponding RedBus government bus URLs
-    GOVT_LINKS = {
-        'Andhra Pradesh': 'https://www.redbus.in/online-booking/apsrtc',
-        'Kerala': 'https://www.redbus.in/online-booking/ksrtc-kerala',
-        'Telangana': 'https://www.redbus.in/online-booking/tsrtc',
-        'Goa': 'https://www.redbus.in/online-booking/ktcl',
-        'Rajasthan': 'https://www.redbus.in/online-booking/rsrtc',
-        'South Bengal': (
-            'https://www.redbus.in/online-booking/'
-            'south-bengal-state-transport-corporation-sbstc'
-        ),
-        'Himachal Pradesh': 'https://www.redbus.in/online-booking/hrtc',
-        'Assam': 'https://www.redbus.in/online-booking/astc',
-        'Uttar Pradesh': (
-            'https://www.redbus.in/online-booking/'
-            'uttar-pradesh-state-road-transport-corporation-upsrtc'
-        ),
-        'West Bengal': 'https://www.redbus.in/online-booking/wbtc-ctc'
-    }
+    """
+    Shows a search across every route of STATE, or of every
+    state when STATE is None, answered by the bitmap index.
 
+    The index is only built once a search is submitted, so
+    browsing the states and routes never loads the snapshot.
+    """
 
-    # Dictionary to store extracted bus data
-    DATA = {
-                'state':[],
-                'route_name':[],
-                'route_link':[],
-                'busname':[],
-                'bustype':[],
-                'departing_time':[],
-                'duration':[],
-                'reaching_time':[],
-                'star_rating':[],
-                'price':[],
-                'seats_available':[]
-            }
-
-    # Loop through each state and its corresponding RedBus URL
-    for STATE,URL in GOVT_LINKS.items():
-
-        # Navigate to the state's RedBus page
-        driver.get(URL)
-
-        # Wait until all route links are present on the page
-        wait.until(EC.presence_of_all_elements_located(
-            (By.CSS_SELECTOR, ".route_link")
-            )
+    SCOPE = STATE or "all states"
+
+    KEY = f"search_{STATE or 'all'}"
+
+    with st.expander(f"🔎 Search buses across {SCOPE}"):
+
+        # Price range of the scope from the route summary
+        [(MIP, MAPR)] = fetch_all(
+            f"""
+            SELECT MIN(min_price), MAX(max_price) FROM route_summary
+            {'WHERE state = %s' if STATE else ''}
+            """, (STATE,) if STATE else ()
         )
 
-        try:
+        if MIP is None:
 
-            # Check if pagination tabs exist on the page
-            driver.find_element(
-                By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
+            st.warning(" 😔 No buses found.")
+
+            return
+
+        with st.form(f"{KEY}_form"):
+
+            FILV = st.pills(
+                "",
+                options=FILTERING_OPTIONS,
+                key=f"{KEY}_pills",
+                selection_mode="multi",
+                default = []
             )
 
-            # Get all pagination elements
-            PANUM = driver.find_elements(
-                By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
+            SLV = st.slider(
+                "Price Range (₹)",
+                min_value=int(MIP),
+                max_value=int(MAPR),
+                value=int(MAPR),
+                step=10,
+                key=f"{KEY}_price"
             )
 
-            # Iterate through each pagination tab
-            for i in range(len(PANUM)):
+            if st.form_submit_button("Search"):
 
-                # Re-fetch pagination elements to avoid stale element reference
-                PANUM = driver.find_elements(
-                    By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
-                )
+                st.session_state[f"{KEY}_search"] = (tuple(FILV), SLV)
 
-                # Click on the pagination tab using JavaScript 
-                # to avoid element intercept errors
-                driver.execute_script("arguments[0].click();", PANUM[i])
+        SEARCH = st.session_state.get(f"{KEY}_search")
 
-                PAGE = i
+        if SEARCH is None:
 
-                MULTI_PAGE = True
-                # Call scrap function to extract bus details 
-                # for the current state
-                scrap(STATE)
+            return
 
-                          
+        FILV, SLV = SEARCH
 
-        except:
-            
-            MULTI_PAGE = False
+        INDEX = load_bitmap_index(SNAPSHOT_VERSION)
 
-            # If no pagination exists, directly scrap the page
-            scrap(STATE)
+        CONDITIONS = {
+            'state': STATE,
+            'filters': [PILL_FILTERS[PILL] for PILL in FILV],
+            'max_price': SLV
+        }
 
-        # Go back to the main state page after scraping
-        driver.back()
-        
+        # The total comes from the bitsets; rows are read a page
+        # at a time in (price, id) order
+        TOTAL = INDEX.count(**CONDITIONS)
 
-    # Close the Selenium WebDriver after scraping all data
-    driver.quit()
+        if not TOTAL:
 
-    # Convert the collected bus data into a pandas DataFrame
-    df = pd.DataFrame(DATA)
+            st.warning(" 😔 No buses found. Try changing the filters.")
 
-    df['star_rating'] = df['star_rating'].replace('New','3')
+            return
+
+        show_pages(
+            KEY,
+            (SNAPSHOT_VERSION, FILV, SLV),
+            lambda AFTER: INDEX.page(
+                after=AFTER, limit=PAGE_SIZE, **CONDITIONS
+            ),
+            TOTAL,
+            f"across {SCOPE}",
+            SHOW_STATE=STATE is None,
+            SHOW_ROUTE=True
+        )
 
-    return df
 
 # Configure the Streamlit app page layout and title
 st.set_page_config(page_title="BusGrid", layout="wide")
@@ -496,106 +480,26 @@ if not SELECTED_STATE and not SELECTED_ROUTE:
     </div>
     """, unsafe_allow_html=True)
 
-# Connect to the local MySQL database 'bus_DETAILS'  
-mydb = mysql.connector.connect(
-    host="gateway01.ap-southeast-1.prod.aws.tidbcloud.com",
-    user="PRcdCBsrEmMi29p.root",
-    password="oIyHQktds3I0RxUf",
-    database=""
-)
-
-# Get scraped bus data (cached to avoid re-scraping)
-df = scrap_redbus_data()
-
-# Create a buffered cursor to execute SQL queries
-mycursor = mydb.cursor(buffered=True)
-
-mycursor.execute("DROP DATABASE IF EXISTS Redbusdata")
-
-time.sleep(2)
-# Create a new MySQL database named Redbusdata
-mycursor.execute("CREATE DATABASE Redbusdata")
-
-
-# Connect to the new database using SQLAlchemy
-engine = create_engine(
-    (
-        "mysql+mysqlconnector://PRcdCBsrEmMi29p.root:"
-        "oIyHQktds3I0RxUf@"
-        "gateway01.ap-southeast-1.prod.aws.tidbcloud.com:4000/"
-        "Redbusdata"
-    ),
-    connect_args={"ssl_disabled": False},
-    pool_pre_ping=True,
-    pool_recycle=600,
-    pool_size=5,
-    max_overflow=10,  
-    pool_timeout=30
-
-)
-
-# Export the pandas DataFrame to the 'bus_routes' table 
-# in chunks of 300 rows
-
-
-for attempt in range(3):
-    try:
-        df.to_sql(
-            name='bus_routes',
-            con=engine,
-            if_exists='replace',
-            index=True,
-            chunksize=300,
-            index_label='id'
-        )
-        break  # Exit the loop if successful
-    except:
-        time.sleep(5)  # Wait before retrying
+# Version of the published data, used to key in-process caches;
+# checked against the storage at most every VERSION_POLL seconds
+SNAPSHOT_VERSION = get_query_cache().current_version()
 
-# Modify the table structure to add appropriate 
-# data types and primary key
-mycursor.execute(
-    """
-    USE Redbusdata;
-    """
-)
+# Serve whatever snapshot is loaded; before the first ingestion
+# there is nothing to show
+if not SNAPSHOT_VERSION:
 
-mycursor.execute(
-    """
-    ALTER TABLE bus_routes ADD 
-    PRIMARY KEY (id)
-    """
-)
+    st.info("ℹ️ No bus data loaded yet. Run `python ingest.py` first.")
 
-mycursor.execute(
-    """
-    alter table bus_routes modify column departing_time time;
-    """
-)
-
-mycursor.execute(
-    """
-    alter table bus_routes modify column reaching_time time;
-    """
-)
-
-mycursor.execute(
-    """
-    alter table bus_routes modify column star_rating float;
-    """
-)
+    st.stop()
 
-mycursor.execute(
-    """
-    alter table bus_routes modify column price decimal(10,2);
-    """
-)
+# Storage backend and query cache usage, shared by every
+# session of this process
+with st.sidebar.expander("⚙️ Database"):
 
-mycursor.execute(
-    """
-    alter table bus_routes modify column seats_available int;
-    """
-)
+    st.json({
+        "storage": get_storage().stats(),
+        "query_cache": get_query_cache().stats()
+    })
 
 # Case 1: User has selected both state and route
 if SELECTED_STATE and SELECTED_ROUTE:
@@ -607,23 +511,19 @@ if SELECTED_STATE and SELECTED_ROUTE:
 
         st.rerun() # Refresh the app with updated query params
 
-    # Fetch the minimum and maximum price for selected 
-    # state & route
-    mycursor.execute("""
-        SELECT MIN(price), MAX(price) FROM bus_routes
-        WHERE state = %s AND route_name = %s
-    """, (SELECTED_STATE, SELECTED_ROUTE))
+    # Load the buses of the route once per snapshot; the price
+    # bounds and every filter are then computed in memory
+    SLICE = route_slice.from_arrow(
+        load_route_slice(SELECTED_STATE, SELECTED_ROUTE, SNAPSHOT_VERSION)
+    )
+
+    MIP, MAPR = route_slice.price_bounds(SLICE) # Minimum and maximum prices
 
-    PRICE_DETAILS = mycursor.fetchone()
+    if MIP is None:
 
-    MIP, MAPR = list(PRICE_DETAILS) # Minimum and maximum prices
+        st.warning(" 😔 No buses found for this route.")
 
-    # Define filtering options for the bus search
-    FILTERING_OPTIONS = [
-        "❄️ AC","🪟 NON-AC","🛌 SLEEPER","💺 SEATER","🌟 LUXURY",
-        "⚡ ELECTRIC","🏛️ GOVERNMENT","🏢 PRIVATE","⭐ HIGHLY RATED",
-        "🌞 DAY TRAVEL","🌙 NIGHT TRAVEL"
-    ]
+        st.stop()
 
     # Split the page into filter column and data display column
     COL1, COL2 = st.columns([1, 4])
@@ -657,212 +557,34 @@ if SELECTED_STATE and SELECTED_ROUTE:
             key="price_slider"
         )
 
-    # Base SQL query to fetch bus details for 
-    # selected state & route within price range
-    QUERY1 = """
-        SELECT busname, bustype, departing_time, duration,
-            reaching_time, star_rating, price, seats_available
-        FROM bus_routes 
-        WHERE state = %s 
-            AND route_name = %s 
-            AND price <= %s
-    """
-
-    # Additional SQL filters based on selected options
-    if '❄️ AC' in FILV:# Filter for AC buses
-
-        SQUERY1 = """ and ( lower(bustype) like '%ac%' or 
-                            lower(bustype) like '%a/c%' or 
-                            lower(bustype) like '%a.c%') and
-                            lower(bustype) not like '%non%'
-                    """
-    
-    else:
-
-        SQUERY1 = ""
-
-    if '🪟 NON-AC' in FILV:# Filter for Non-AC buses
-
-        SQUERY2 = " and lower(bustype) like '%non%'"
-
-    else:
-        
-        SQUERY2 = ""
-
-    if '❄️ AC' in FILV and '🪟 NON-AC' in FILV:
-
-        SQUERY1,SQUERY2 = "",""
-
-    if '🛌 SLEEPER' in FILV:# Filter for Sleeper buses
-
-        SQUERY3 = " and upper(bustype) like '%SLEEP%'"
-
-    else:
-
-        SQUERY3 = ""
-
-    if '💺 SEATER' in FILV:# Filter for Seater buses
-
-        SQUERY4 = " and upper(bustype) like '%SEAT%'"
-
-    else:
-
-        SQUERY4 = ""
-
-    if '🌟 LUXURY' in FILV:# Filter for Luxury buses
-
-        SQUERY5 = " and upper(bustype) like '%LUXURY%'"
-
-    else:
-
-        SQUERY5 = ""
-
-    if '⚡ ELECTRIC' in FILV:# Filter for Electric buses
-
-        SQUERY6 = " and upper(bustype) like '%ELECTRIC%'"
-
-    else:
-
-        SQUERY6 = ""
-
-    if '🏛️ GOVERNMENT' in FILV:# Filter for Government buses
-
-        SQUERY7 = """ and (upper(busname) like '%APSRTC%' or
-                        upper(busname) like '%KSRTC%' or
-                        upper(busname) like '%TGSRTC%' or
-                        upper(busname) like '%KTCL%' or
-                        upper(busname) like '%RSRTC%' or
-                        upper(busname) like '%SBSTC%' or
-                        upper(busname) like '%HRTC%' or
-                        upper(busname) like '%ASTC%' or
-                        upper(busname) like '%UPSRTC%' or
-                        upper(busname) like '%WBTC%')
-                    """
-        
-    else:
-
-        SQUERY7 = ""
-
-    if '🏢 PRIVATE' in FILV:# Filter for Private buses
-
-        SQUERY8 = """ and (upper(busname) not like '%APSRTC%' and
-                            upper(busname) not like '%KSRTC%' and
-                            upper(busname) not like '%TGSRTC%' and
-                            upper(busname) not like '%KTCL%' and
-                            upper(busname) not like '%RSRTC%' and
-                            upper(busname) not like '%SBSTC%' and
-                            upper(busname) not like '%HRTC%' and
-                            upper(busname) not like '%ASTC%' and
-                            upper(busname) not like '%UPSRTC%' and
-                            upper(busname) not like '%WBTC%')
-                    """
-        
-    else:
-
-        SQUERY8 = ""
-
-    if '🏛️ GOVERNMENT' in FILV and '🏢 PRIVATE' in FILV:
-
-        SQUERY7, SQUERY8 = "", ""
-
-    if '⭐ HIGHLY RATED' in FILV:# Filter for Highly rated buses
-
-        SQUERY9 = " and star_rating >= 4.0"
-
-    else:
-
-        SQUERY9 = ""
-
-    if '🌞 DAY TRAVEL' in FILV:# Filter for Day travel buses
-
-        SQUERY10 = "and departing_time between '06:00:01' and '18:00:00'"
-
-    else:
-
-        SQUERY10 = ""
-
-    if '🌙 NIGHT TRAVEL' in FILV:# Filter for Night travel buses
-
-        SQUERY11 = "and (departing_time >= '18:00:01' or departing_time <= '06:00:00')"
-
-    else:
-
-        SQUERY11 = ""
-
-    # Combine all query parts to form the final SQL query
-    final_query = QUERY1 + SQUERY1 + SQUERY2 + SQUERY3 + SQUERY4
-
-    final_query+= SQUERY5 + SQUERY6 + SQUERY7 + SQUERY8 + SQUERY9
-
-    final_query+=SQUERY10 + SQUERY11 
-
-    # Execute query and fetch results
-    mycursor.execute(final_query, (SELECTED_STATE, SELECTED_ROUTE, SLV))
-
-    RAW_DATA = mycursor.fetchall()
-
-    # Convert query results into a DataFrame
-    DETAILS = pd.DataFrame(RAW_DATA, columns=[
-        "BUS NAME", "BUS TYPE", "DEPARTING TIME", "DURATION",
-        "REACHING TIME", "STAR RATING", "PRICE (₹)", "SEATS AVAILABLE"])
-
-    # Helper function to convert time to AM/PM format
-    def format_timedelta_to_ampm(td):
-
-        TOTAL_SECONDS = int(td.total_seconds())
-
-        HOURS = TOTAL_SECONDS // 3600
-
-        MINUTES = (TOTAL_SECONDS % 3600) // 60
-
-        PERIOD = "AM" if HOURS < 12 else "PM"
-
-        HOURS = HOURS % 12 or 12
-
-        return f"{HOURS}:{MINUTES:02d} {PERIOD}"
-    
-    # Apply formatting to relevant columns
-    DETAILS["DEPARTING TIME"] = DETAILS["DEPARTING TIME"].apply(
-        format_timedelta_to_ampm
-    )
-
-    DETAILS["REACHING TIME"] = DETAILS["REACHING TIME"].apply(
-        format_timedelta_to_ampm
-    )
-
-    DETAILS["STAR RATING"] = DETAILS["STAR RATING"].apply(
-        lambda x: f"{x:.1f}"
-    )
-
-    DETAILS["PRICE (₹)"] = DETAILS["PRICE (₹)"].apply(
-        lambda x: f"{x:.2f}"
-    )
+    # Apply the selected filters and price limit to the route
+    FILTERS = {
+        'filters': [PILL_FILTERS[PILL] for PILL in FILV],
+        'max_price': SLV
+    }
 
-    DETAILS["SEATS AVAILABLE"] = DETAILS["SEATS AVAILABLE"].apply(
-        lambda x: f"{x:.0f}"
-    )
+    TOTAL = int(route_slice.filter_mask(SLICE, **FILTERS).sum())
 
-    # Display bus details in Streamlit
+    # Display bus details in Streamlit, a page at a time
     with COL2:
 
-        if DETAILS.empty:
+        if not TOTAL:
 
             st.warning(" 😔 No buses found. Try changing the filters.")
 
         else:
 
-            st.success(
-
-                f"🚌 {len(DETAILS)} buses found within the " 
-
-                "selected price range."
-
-            )
-
-            st.dataframe(
-                DETAILS,
-                use_container_width=True,
-                hide_index=True
+            show_pages(
+                "route",
+                (
+                    SNAPSHOT_VERSION, SELECTED_STATE, SELECTED_ROUTE,
+                    tuple(FILV), SLV
+                ),
+                lambda AFTER: route_slice.page_slice(
+                    SLICE, after=AFTER, limit=PAGE_SIZE, **FILTERS
+                ),
+                TOTAL,
+                "within the selected price range"
             )
 
 # Case 2: User has selected only state
@@ -883,19 +605,22 @@ elif SELECTED_STATE:
         """, unsafe_allow_html=True
     )
 
-    # Fetch all available routes for the selected state
-    mycursor.execute(
+    # Fetch all available routes for the selected state with their
+    # statistics from the route summary built at ingest
+    ROUTES = fetch_all(
         """
-        SELECT DISTINCT route_name FROM bus_routes
+        SELECT route_name, bus_count, min_price, max_price, avg_rating
+        FROM route_summary
         WHERE state = %s
         ORDER BY route_name ASC
         """, (SELECTED_STATE,)
     )
 
-    ROUTES = mycursor.fetchall()
+    # Search every route of the state at once
+    show_search(SELECTED_STATE)
 
     # Display each route as a button
-    for i, (route,) in enumerate(ROUTES):
+    for i, (route, BUSES, MIN_PRICE, MAX_PRICE, RATING) in enumerate(ROUTES):
 
         if i % 3 == 0:
 
@@ -911,6 +636,10 @@ elif SELECTED_STATE:
 
                 st.rerun()
 
+            st.caption(format_route_stats(
+                BUSES, MIN_PRICE, MAX_PRICE, RATING
+            ))
+
 # Case 3: User has not selected anything
 else:
 
@@ -928,15 +657,18 @@ else:
         </div>
     """, unsafe_allow_html=True)
 
-    # Display all states as buttons
-    mycursor.execute("""
-        SELECT DISTINCT state FROM bus_routes
+    # Display all states as buttons, with their route and bus
+    # counts from the route summary built at ingest
+    STATES = fetch_all("""
+        SELECT state, COUNT(*), SUM(bus_count) FROM route_summary
+        GROUP BY state
         ORDER BY state
     """)
 
-    STATES = mycursor.fetchall()
+    # Search every route of every state at once
+    show_search()
 
-    for i, (STATE,) in enumerate(STATES):
+    for i, (STATE, ROUTE_COUNT, BUSES) in enumerate(STATES):
 
         if i % 4 == 0:
 
@@ -950,8 +682,6 @@ else:
 
                 st.rerun()
 
-# Close database connection
-mycursor.close()
+            st.caption(f"🗺️ {ROUTE_COUNT} routes · 🚌 {BUSES} buses")
 
-mydb.close()
 
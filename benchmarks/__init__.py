@@ -0,0 +1,10 @@
+"""
+Benchmarks for the BusGrid scraping and loading pipeline
+
+Run them from the repository root, e.g.:
+    python -m benchmarks.load_benchmark --database redbus_bench --rows 50000
+    python -m benchmarks.scrape_benchmark fixtures
+
+The scraper benchmarks run offline against fixtures served by the
+replay harness (benchmarks.replay).
+"""
@@ -0,0 +1,203 @@
+"""
+Benchmark: bulk staging loader vs. pandas to_sql
+
+Generates synthetic, normalized bus rows and writes them into a scratch
+copy of the staging table twice: once with the old
+df.to_sql(chunksize=300) path and once with loader.bulk_insert() at each
+requested worker count. Reports rows per second for every run.
+
+Usage:
+    python -m benchmarks.load_benchmark --database redbus_bench \
+        --rows 50000 --workers 1 4 8
+
+It connects with the REDBUS_DB_* variables but only to the database
+named by --database, which must not be the app's own. Only the scratch
+table is created there, so the app's schema is never checked or
+migrated, and it is dropped afterwards.
+
+Modules used:
+- argparse: for the command line
+- random / time: for synthetic rows and timing
+- pandas: for the synthetic DataFrame
+- sqlalchemy: for the scratch table
+- db, loader, normalize: for the code under test
+"""
+import argparse
+
+import random
+
+import time
+
+import pandas as pd
+
+from sqlalchemy import text
+
+import db
+
+import loader
+
+from normalize import FLAG_COLUMNS, normalize_frame
+
+BENCH_TABLE = 'bus_routes_bench'
+
+
+def synthetic_frame(ROWS, SEED=0):
+
+    """
+    Returns ROWS scraped-looking rows, normalized like a real scrape.
+    """
+
+    RANDOM = random.Random(SEED)
+
+    TYPES = [
+        'A/C Sleeper (2+1)', 'NON A/C Seater (2+2)', 'Volvo Multi-Axle',
+        'Electric A/C Seater', 'Super Luxury (Non-AC, 2+2 Push Back)'
+    ]
+
+    # The scraped columns, before normalize adds the flags
+    DATA = {
+        COLUMN: [] for COLUMN in loader.COLUMNS
+        if COLUMN not in FLAG_COLUMNS
+    }
+
+    for I in range(ROWS):
+
+        ROUTE = I // 40
+
+        HOUR, MINUTE = RANDOM.randrange(24), RANDOM.randrange(0, 60, 5)
+
+        DATA['state'].append(f"State {ROUTE % 10}")
+
+        DATA['route_name'].append(f"City {ROUTE} to City {ROUTE + 1}")
+
+        DATA['route_link'].append(
+            f"https://www.redbus.in/bus-tickets/route-{ROUTE}"
+        )
+
+        DATA['busname'].append(
+            RANDOM.choice(['APSRTC', 'KSRTC', 'Orange Travels', 'SRS'])
+            + f" {I}"
+        )
+
+        DATA['bustype'].append(RANDOM.choice(TYPES))
+
+        DATA['departing_time'].append(f"{HOUR:02d}:{MINUTE:02d}")
+
+        DATA['duration'].append(f"{RANDOM.randrange(2, 14):02d}h 15m")
+
+        DATA['reaching_time'].append(f"{(HOUR + 8) % 24:02d}:{MINUTE:02d}")
+
+        DATA['star_rating'].append(RANDOM.choice(['4.2', '3.1', 'New', 0]))
+
+        DATA['price'].append(str(RANDOM.randrange(200, 2500)))
+
+        DATA['seats_available'].append(str(RANDOM.randrange(1, 45)))
+
+    return normalize_frame(pd.DataFrame(DATA))
+
+
+def reset_table(ENGINE):
+
+    """
+    Recreates the empty scratch table with the staging table's
+    columns and keys.
+    """
+
+    with ENGINE.begin() as conn:
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+        conn.execute(text(loader.CREATE_STAGING_TABLE.replace(
+            loader.STAGING_TABLE, BENCH_TABLE
+        )))
+
+
+def run_to_sql(ENGINE, ROWS):
+
+    START = time.perf_counter()
+
+    ROWS.to_sql(
+        name=BENCH_TABLE,
+        con=ENGINE,
+        if_exists='append',
+        index=False,
+        chunksize=300
+    )
+
+    return time.perf_counter() - START
+
+
+def run_bulk(ENGINE, ROWS, WORKERS, CHUNK_SIZE):
+
+    return loader.bulk_insert(
+        ENGINE, BENCH_TABLE, ROWS, chunk_size=CHUNK_SIZE, workers=WORKERS
+    )['seconds']
+
+
+def main(argv=None):
+
+    PARSER = argparse.ArgumentParser(
+        description="Compare the bulk loader with pandas to_sql."
+    )
+
+    PARSER.add_argument(
+        "--database", required=True,
+        help="scratch database to write to, never the app's own"
+    )
+
+    PARSER.add_argument("--rows", type=int, default=20000)
+
+    PARSER.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+
+    PARSER.add_argument("--chunk-size", type=int, default=loader.CHUNK_SIZE)
+
+    args = PARSER.parse_args(argv)
+
+    if args.database == db.DB_NAME:
+
+        PARSER.error(f"--database must not be the app's {db.DB_NAME}")
+
+    ROWS = loader.prepare_frame(synthetic_frame(args.rows))
+
+    db.create_database(args.database)
+
+    ENGINE = db.make_engine(args.database)
+
+    RUNS = [('to_sql (chunksize=300)', lambda: run_to_sql(ENGINE, ROWS))]
+
+    for WORKERS in args.workers:
+
+        RUNS.append((
+            f"bulk_insert (workers={WORKERS})",
+            lambda WORKERS=WORKERS: run_bulk(
+                ENGINE, ROWS, WORKERS, args.chunk_size
+            )
+        ))
+
+    try:
+
+        print(f"{len(ROWS)} rows")
+
+        for NAME, RUN in RUNS:
+
+            reset_table(ENGINE)
+
+            SECONDS = RUN()
+
+            print(
+                f"{NAME:<28} {SECONDS:8.2f}s "
+                f"{len(ROWS) / SECONDS:10.0f} rows/s"
+            )
+
+    finally:
+
+        with ENGINE.begin() as conn:
+
+            conn.execute(text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+
+        ENGINE.dispose()
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,201 @@
+"""
+Memory report: object-string frames vs the compact representation
+
+Rebuilds a full crawl from a checkpoint file (every route's scraped
+rows, see checkpoint) and measures it in two layouts:
+
+- before: pd.DataFrame(DATA) as the scraper used to return it, every
+  column a Python-object string,
+- after: normalize.normalize_frame(), with categorical names and
+  fixed-width numbers and times.
+
+For each layout it reports the deep memory use per column and in
+total, and the size and load time of a cached copy: a pickle of the
+frame (what st.cache_data stored) for before, and the Arrow IPC buffer
+of route_slice.to_arrow() for after.
+
+Results are appended as JSON lines, tagged with the current commit, to
+benchmarks/results/memory_report.jsonl.
+
+Usage:
+    REDBUS_CHECKPOINT=checkpoint.sqlite python ingest.py
+    python -m benchmarks.memory_report checkpoint.sqlite
+
+Modules used:
+- argparse: for the command line
+- json / os / pickle / time: for the cache copies and stored results
+- pandas: for the frames
+- checkpoint: for the scraped rows
+- normalize, route_slice: for the code under test
+- benchmarks.scrape_benchmark: for tagging results with the commit
+"""
+import argparse
+
+import json
+
+import os
+
+import pickle
+
+import time
+
+import pandas as pd
+
+import route_slice
+
+from benchmarks.scrape_benchmark import current_commit
+
+from checkpoint import CheckpointStore
+
+from normalize import normalize_frame
+
+from scraper import new_data
+
+RESULTS_PATH = os.path.join(
+    os.path.dirname(__file__), 'results', 'memory_report.jsonl'
+)
+
+
+def read_crawl(PATH):
+
+    """
+    Returns the scraped DATA of every route in a checkpoint file
+    and the number of routes.
+    """
+
+    STORE = CheckpointStore(PATH, ttl=0)
+
+    try:
+
+        DATA = new_data()
+
+        ROUTES = STORE.load_all(DATA)
+
+    finally:
+
+        STORE.close()
+
+    return DATA, ROUTES
+
+
+def timed(FUNCTION, *args):
+
+    START = time.perf_counter()
+
+    RESULT = FUNCTION(*args)
+
+    return RESULT, time.perf_counter() - START
+
+
+def measure(df, DUMP, LOAD):
+
+    """
+    Returns the memory use of a frame, per column and in total,
+    and the size and load time of its cached copy.
+    """
+
+    COLUMNS = df.memory_usage(deep=True, index=False)
+
+    BUFFER = DUMP(df)
+
+    _, SECONDS = timed(LOAD, BUFFER)
+
+    return {
+        'bytes': int(COLUMNS.sum()),
+        'columns': {NAME: int(SIZE) for NAME, SIZE in COLUMNS.items()},
+        'dtypes': {NAME: str(DTYPE) for NAME, DTYPE in df.dtypes.items()},
+        'cache_bytes': len(BUFFER),
+        'cache_load_seconds': round(SECONDS, 4)
+    }
+
+
+def report(PATH):
+
+    """
+    Measures the crawl in a checkpoint file in both layouts and
+    returns the result record.
+    """
+
+    DATA, ROUTES = read_crawl(PATH)
+
+    BEFORE = pd.DataFrame(DATA)
+
+    AFTER = normalize_frame(BEFORE)
+
+    return {
+        'commit': current_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'checkpoint': PATH,
+        'routes': ROUTES,
+        'buses': len(BEFORE),
+        'before': measure(BEFORE, pickle.dumps, pickle.loads),
+        'after': measure(
+            AFTER,
+            lambda df: route_slice.to_arrow(df).to_pybytes(),
+            route_slice.from_arrow
+        )
+    }
+
+
+def print_report(RECORD):
+
+    BEFORE, AFTER = RECORD['before'], RECORD['after']
+
+    print(f"{RECORD['routes']} routes, {RECORD['buses']} buses")
+
+    print(f"{'column':<18} {'before':>12} {'after':>12}  after type")
+
+    for NAME, SIZE in BEFORE['columns'].items():
+
+        print(
+            f"{NAME:<18} {SIZE:>12,} "
+            f"{AFTER['columns'].get(NAME, 0):>12,}  "
+            f"{AFTER['dtypes'].get(NAME, '-')}"
+        )
+
+    print(
+        f"{'total':<18} {BEFORE['bytes']:>12,} {AFTER['bytes']:>12,}  "
+        f"({BEFORE['bytes'] / max(AFTER['bytes'], 1):.1f}x smaller, "
+        f"flag columns included after)"
+    )
+
+    print(
+        f"cached copy: pickle {BEFORE['cache_bytes']:,} bytes, "
+        f"{BEFORE['cache_load_seconds']}s to load; Arrow "
+        f"{AFTER['cache_bytes']:,} bytes, "
+        f"{AFTER['cache_load_seconds']}s to load"
+    )
+
+
+def main(argv=None):
+
+    PARSER = argparse.ArgumentParser(
+        description="Compare the memory use of the frame layouts."
+    )
+
+    PARSER.add_argument(
+        "checkpoint", nargs="?",
+        default=os.environ.get("REDBUS_CHECKPOINT", "checkpoint.sqlite"),
+        help="checkpoint file of a full crawl"
+    )
+
+    PARSER.add_argument("--results", default=RESULTS_PATH)
+
+    args = PARSER.parse_args(argv)
+
+    RECORD = report(args.checkpoint)
+
+    print_report(RECORD)
+
+    os.makedirs(os.path.dirname(args.results), exist_ok=True)
+
+    with open(args.results, 'a') as HANDLE:
+
+        HANDLE.write(json.dumps(RECORD) + '\n')
+
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+
+    main()
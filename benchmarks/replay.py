@@ -0,0 +1,577 @@
+"""
+Offline replay harness: RedBus-like pages served from local fixtures
+
+A fixture directory mirrors the URL paths of the site, one HTML file
+per page, plus links.json (state -> state page path) and manifest.json
+(how the fixtures were made and, for generated ones, how many routes
+and buses a complete scrape must return):
+
+    fixtures/online-booking/<state>.html       state pages
+    fixtures/bus-tickets/<route>.html          route pages
+    fixtures/bus-tickets/<route>/rtc-<n>.html  government groups
+
+Fixtures are either generated (generate) or recorded from the live site
+(record). Generated pages reproduce the behaviours the scrapers rely
+on: state pages with DC_117_pageTabs pagination driven by JS, route
+pages with tupleWrapper cards, government groups behind rtcInfoWrap___
+that open their own page, and lists that load more cards in batches on
+scroll until an end marker appears. Recorded pages keep the HTML the
+site served; their scripts still call the live site.
+
+ReplayServer serves a fixture directory over local HTTP, optionally
+adding a fixed latency per request, and rewrites links.json into a
+links mapping for scraper.scrap_redbus_data(links=...).
+
+Usage:
+    python -m benchmarks.replay generate fixtures --states 4 --routes 25
+    python -m benchmarks.replay record fixtures
+    python -m benchmarks.replay serve fixtures --port 8800
+
+Modules used:
+- argparse: for the command line
+- http.server / threading / time: for the local server
+- json / os / random: for the fixture files
+- urllib: for recording live pages
+"""
+import argparse
+
+import json
+
+import os
+
+import random
+
+import threading
+
+import time
+
+import urllib.request
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib.parse import urlsplit
+
+# Class name suffix, standing in for the site's CSS module hashes
+SUFFIX = 'x7f3q'
+
+# Routes shown per pagination tab and cards per lazy-load batch
+ROUTES_PER_PAGE = 10
+
+LAZY_BATCH = 10
+
+BUS_TYPES = [
+    'A/C Sleeper (2+1)', 'NON A/C Seater (2+2)', 'Volvo Multi-Axle A/C',
+    'Electric A/C Seater', 'Super Luxury (Non-AC, 2+2 Push Back)'
+]
+
+OPERATORS = ['Orange Travels', 'SRS Travels', 'VRL Travels', 'Kallada']
+
+STATE_PAGE = """<!DOCTYPE html>
+<html><head><title>{state}</title></head><body>
+<h1>{state}</h1>
+<div id="routes">{first}</div>
+{templates}
+<div class="pagination">{tabs}</div>
+<script>
+function showPage(i) {{
+    document.getElementById('routes').innerHTML =
+        document.getElementById('page-' + i).innerHTML;
+}}
+</script>
+</body></html>
+"""
+
+ROUTE_PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title>
+<style>li {{ min-height: 160px; list-style: none; }}</style>
+</head><body>
+{groups}
+<ul id="buses">{cards}</ul>
+{end}
+<script type="application/json" id="more">{more}</script>
+<script>
+const more = JSON.parse(document.getElementById('more').textContent);
+let loading = false;
+window.addEventListener('scroll', () => {{
+    if (loading || document.querySelector("span[class*='end']")) return;
+    loading = true;
+    setTimeout(() => {{
+        const list = document.getElementById('buses');
+        if (more.length) {{
+            list.insertAdjacentHTML(
+                'beforeend', more.splice(0, {batch}).join('')
+            );
+        }} else {{
+            list.insertAdjacentHTML(
+                'afterend', '<span class="end___{suffix}">End of list</span>'
+            );
+        }}
+        loading = false;
+    }}, 150);
+}});
+</script>
+</body></html>
+"""
+
+CARD = (
+    '<li class="tupleWrapper___{s}">'
+    '<div class="travelsName___{s}">{busname}</div>'
+    '<p class="busType___{s}">{bustype}</p>'
+    '<p class="boardingTime___{s}">{departing}</p>'
+    '<p class="duration___{s}">{duration}</p>'
+    '<p class="droppingTime___{s}">{reaching}</p>'
+    '<div class="timeFareBoWrap___{s}">{rating}'
+    '<p class="finalFare___{s}">₹{price}</p></div>'
+    '<p class="totalSeats___{s}">{seats} Seats available</p>'
+    '</li>'
+)
+
+
+def card(RANDOM, NAME):
+
+    """
+    Returns the HTML of one random bus card.
+    """
+
+    HOUR, MINUTE = RANDOM.randrange(24), RANDOM.randrange(0, 60, 5)
+
+    HOURS = RANDOM.randrange(2, 14)
+
+    RATING = RANDOM.choice(['4.3', '3.8', '2.9', 'New', None])
+
+    return CARD.format(
+        s=SUFFIX,
+        busname=NAME,
+        bustype=RANDOM.choice(BUS_TYPES),
+        departing=f"{HOUR:02d}:{MINUTE:02d}",
+        duration=f"{HOURS:02d}h {MINUTE:02d}m",
+        reaching=f"{(HOUR + HOURS) % 24:02d}:{MINUTE:02d}",
+        rating=(
+            f'<div class="rating___{SUFFIX}">{RATING}</div>'
+            if RATING else ''
+        ),
+        price=f"{RANDOM.randrange(200, 2500):,}",
+        seats=RANDOM.randrange(1, 45)
+    )
+
+
+def route_page(TITLE, CARDS, GROUPS=()):
+
+    """
+    Returns a route page whose first LAZY_BATCH cards are in the
+    HTML and whose other cards load on scroll. GROUPS are the
+    paths of the government group pages.
+    """
+
+    FIRST, MORE = CARDS[:LAZY_BATCH], CARDS[LAZY_BATCH:]
+
+    return ROUTE_PAGE.format(
+        title=TITLE,
+        groups=''.join(
+            f'<div class="rtcInfoWrap___{SUFFIX}" '
+            f'onclick="location.href=\'{PATH}\'">Group {N + 1}</div>'
+            for N, PATH in enumerate(GROUPS)
+        ),
+        cards=''.join(FIRST),
+        # A list that fits in one batch is complete as served
+        end='' if MORE else f'<span class="end___{SUFFIX}">End of list</span>',
+        more=json.dumps(MORE).replace('</', '<\\/'),
+        batch=LAZY_BATCH,
+        suffix=SUFFIX
+    )
+
+
+def state_page(STATE, ROUTES):
+
+    """
+    Returns a state page listing (path, title) ROUTES, split
+    over JS-driven pagination tabs of ROUTES_PER_PAGE routes.
+    """
+
+    PAGES = [
+        ''.join(
+            f'<div class="route_link"><a class="route" href="{PATH}" '
+            f'title="{TITLE}">{TITLE}</a></div>'
+            for PATH, TITLE in ROUTES[I:I + ROUTES_PER_PAGE]
+        )
+        for I in range(0, len(ROUTES), ROUTES_PER_PAGE)
+    ] or ['']
+
+    return STATE_PAGE.format(
+        state=STATE,
+        first=PAGES[0],
+        templates=''.join(
+            f'<template id="page-{I}">{PAGE}</template>'
+            for I, PAGE in enumerate(PAGES)
+        ) if len(PAGES) > 1 else '',
+        tabs=''.join(
+            f'<div class="DC_117_pageTabs" onclick="showPage({I})">'
+            f'{I + 1}</div>'
+            for I in range(len(PAGES))
+        ) if len(PAGES) > 1 else ''
+    )
+
+
+def write_page(DIRECTORY, PATH, BODY):
+
+    FILE = os.path.join(DIRECTORY, PATH.strip('/') + '.html')
+
+    os.makedirs(os.path.dirname(FILE), exist_ok=True)
+
+    with open(FILE, 'w', encoding='utf-8') as HANDLE:
+
+        HANDLE.write(BODY)
+
+
+def write_json(DIRECTORY, NAME, VALUE):
+
+    with open(os.path.join(DIRECTORY, NAME), 'w') as HANDLE:
+
+        json.dump(VALUE, HANDLE, indent=2)
+
+
+def generate(
+    DIRECTORY, states=4, routes=25, buses=(5, 40), govt_every=5, seed=0
+):
+
+    """
+    Writes a deterministic synthetic fixture set: states state
+    pages of routes routes each, with between buses[0] and buses[1]
+    buses per route. Every govt_every-th route has two government
+    groups (0 disables them).
+
+    Returns the manifest, including the expected totals.
+    """
+
+    RANDOM = random.Random(seed)
+
+    LINKS, ROUTE_COUNT, BUS_COUNT = {}, 0, 0
+
+    for S in range(states):
+
+        STATE = f"State {S + 1}"
+
+        STATE_PATH = f"/online-booking/state-{S + 1}"
+
+        ROUTES = []
+
+        for R in range(routes):
+
+            TITLE = f"City {S}-{R} to City {S}-{R + 1}"
+
+            PATH = f"/bus-tickets/s{S + 1}-route-{R + 1}"
+
+            GROUPS = []
+
+            if govt_every and R % govt_every == govt_every - 1:
+
+                for G in range(2):
+
+                    GROUP_PATH = f"{PATH}/rtc-{G + 1}"
+
+                    CARDS = [
+                        card(RANDOM, f"RTC {S}-{R}-{G}-{B}")
+                        for B in range(RANDOM.randint(*buses))
+                    ]
+
+                    write_page(DIRECTORY, GROUP_PATH, route_page(TITLE, CARDS))
+
+                    GROUPS.append(GROUP_PATH)
+
+                    BUS_COUNT += len(CARDS)
+
+            CARDS = [
+                card(RANDOM, f"{RANDOM.choice(OPERATORS)} {S}-{R}-{B}")
+                for B in range(RANDOM.randint(*buses))
+            ]
+
+            write_page(DIRECTORY, PATH, route_page(TITLE, CARDS, GROUPS))
+
+            ROUTES.append((PATH, TITLE))
+
+            BUS_COUNT += len(CARDS)
+
+        write_page(DIRECTORY, STATE_PATH, state_page(STATE, ROUTES))
+
+        LINKS[STATE] = STATE_PATH
+
+        ROUTE_COUNT += len(ROUTES)
+
+    MANIFEST = {
+        'kind': 'generated',
+        'seed': seed,
+        'states': states,
+        'routes': ROUTE_COUNT,
+        'buses': BUS_COUNT,
+        'routes_per_page': ROUTES_PER_PAGE,
+        'lazy_batch': LAZY_BATCH
+    }
+
+    write_json(DIRECTORY, 'links.json', LINKS)
+
+    write_json(DIRECTORY, 'manifest.json', MANIFEST)
+
+    return MANIFEST
+
+
+def fetch_page(URL):
+
+    REQUEST = urllib.request.Request(
+        URL, headers={'User-Agent': 'Mozilla/5.0'}
+    )
+
+    with urllib.request.urlopen(REQUEST, timeout=30) as RESPONSE:
+
+        return RESPONSE.read()
+
+
+def record(DIRECTORY, links=None, limit=None):
+
+    """
+    Records the live state pages in links (scraper.GOVT_LINKS by
+    default) and the route pages they list, as served, into a
+    fixture directory. Only the first tab of a paginated state page
+    is in its HTML. limit caps the routes recorded per state.
+
+    Returns the manifest.
+    """
+
+    # Imported here so generating and serving need neither
+    import scraper
+
+    from http_engine import parse_state_page
+
+    LINKS, ROUTE_COUNT = {}, 0
+
+    for STATE, URL in (scraper.GOVT_LINKS if links is None else links).items():
+
+        BODY = fetch_page(URL)
+
+        STATE_PATH = urlsplit(URL).path
+
+        write_page(DIRECTORY, STATE_PATH, BODY.decode('utf-8', 'replace'))
+
+        LINKS[STATE] = STATE_PATH
+
+        ROUTES, _ = parse_state_page(BODY, URL)
+
+        for ROUTE_LINK, _ in ROUTES[:limit]:
+
+            write_page(
+                DIRECTORY, urlsplit(ROUTE_LINK).path,
+                fetch_page(ROUTE_LINK).decode('utf-8', 'replace')
+            )
+
+            ROUTE_COUNT += 1
+
+    MANIFEST = {
+        'kind': 'recorded',
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'states': len(LINKS),
+        'routes': ROUTE_COUNT,
+        # Only known once the recording has been scraped
+        'buses': None
+    }
+
+    write_json(DIRECTORY, 'links.json', LINKS)
+
+    write_json(DIRECTORY, 'manifest.json', MANIFEST)
+
+    return MANIFEST
+
+
+class ReplayServer:
+
+    """
+    Threaded local HTTP server for a fixture directory, usable
+    as a context manager. A request for /a/b is answered with
+    the file a/b.html; every response is delayed by latency
+    seconds. Requests and bytes served are counted.
+    """
+
+    def __init__(self, DIRECTORY, port=0, latency=0.0):
+
+        self.directory = os.path.abspath(DIRECTORY)
+
+        self.latency = latency
+
+        self.counts = {'requests': 0, 'bytes': 0, 'missing': 0}
+
+        self.lock = threading.Lock()
+
+        SERVER = self
+
+        class Handler(SimpleHTTPRequestHandler):
+
+            def do_GET(self):
+
+                if SERVER.latency:
+
+                    time.sleep(SERVER.latency)
+
+                FILE = os.path.join(
+                    SERVER.directory,
+                    urlsplit(self.path).path.strip('/') + '.html'
+                )
+
+                if not os.path.isfile(FILE):
+
+                    SERVER.count('missing')
+
+                    self.send_error(404)
+
+                    return
+
+                with open(FILE, 'rb') as HANDLE:
+
+                    BODY = HANDLE.read()
+
+                self.send_response(200)
+
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+
+                self.send_header('Content-Length', str(len(BODY)))
+
+                self.end_headers()
+
+                self.wfile.write(BODY)
+
+                SERVER.count('requests')
+
+                SERVER.count('bytes', len(BODY))
+
+            def log_message(self, *args):
+
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+        self.httpd.daemon_threads = True
+
+        self.thread = None
+
+    def count(self, NAME, VALUE=1):
+
+        with self.lock:
+
+            self.counts[NAME] += VALUE
+
+    @property
+    def base_url(self):
+
+        HOST, PORT = self.httpd.server_address[:2]
+
+        return f"http://{HOST}:{PORT}"
+
+    def links(self):
+
+        """
+        Returns the state -> URL mapping of the fixtures,
+        pointing at this server.
+        """
+
+        with open(os.path.join(self.directory, 'links.json')) as HANDLE:
+
+            return {
+                STATE: self.base_url + PATH
+                for STATE, PATH in json.load(HANDLE).items()
+            }
+
+    def manifest(self):
+
+        with open(os.path.join(self.directory, 'manifest.json')) as HANDLE:
+
+            return json.load(HANDLE)
+
+    def start(self):
+
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.httpd.shutdown()
+
+        self.httpd.server_close()
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self, *exc):
+
+        self.stop()
+
+
+def main(argv=None):
+
+    PARSER = argparse.ArgumentParser(
+        description="Generate, record or serve replay fixtures."
+    )
+
+    COMMANDS = PARSER.add_subparsers(dest="command", required=True)
+
+    GENERATE = COMMANDS.add_parser("generate", help="write synthetic fixtures")
+
+    GENERATE.add_argument("directory")
+
+    GENERATE.add_argument("--states", type=int, default=4)
+
+    GENERATE.add_argument("--routes", type=int, default=25)
+
+    GENERATE.add_argument("--buses", type=int, nargs=2, default=[5, 40])
+
+    GENERATE.add_argument("--govt-every", type=int, default=5)
+
+    GENERATE.add_argument("--seed", type=int, default=0)
+
+    RECORD = COMMANDS.add_parser("record", help="record live pages")
+
+    RECORD.add_argument("directory")
+
+    RECORD.add_argument("--limit", type=int, default=None)
+
+    SERVE = COMMANDS.add_parser("serve", help="serve fixtures locally")
+
+    SERVE.add_argument("directory")
+
+    SERVE.add_argument("--port", type=int, default=8800)
+
+    SERVE.add_argument("--latency", type=float, default=0.0)
+
+    args = PARSER.parse_args(argv)
+
+    if args.command == "generate":
+
+        print(json.dumps(generate(
+            args.directory, args.states, args.routes, tuple(args.buses),
+            args.govt_every, args.seed
+        ), indent=2))
+
+    elif args.command == "record":
+
+        print(json.dumps(record(args.directory, limit=args.limit), indent=2))
+
+    else:
+
+        SERVER = ReplayServer(args.directory, args.port, args.latency)
+
+        print(json.dumps(SERVER.links(), indent=2))
+
+        try:
+
+            SERVER.httpd.serve_forever()
+
+        except KeyboardInterrupt:
+
+            SERVER.httpd.server_close()
+
+
+if __name__ == "__main__":
+
+    main()
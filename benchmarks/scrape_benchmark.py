@@ -0,0 +1,360 @@
+"""
+Benchmark: scraper throughput against the offline replay harness
+
+Serves a fixture directory (see benchmarks.replay) on a local port and
+runs scraper.scrap_redbus_data() against it once per engine setting:
+the selenium engine at each --workers count and browser --profiles, and
+the http engine at each --concurrency. Every run reports wall time,
+routes/min, buses/sec, whether the expected number of buses was
+scraped, the bytes transferred and load time per route page, and wall
+time per phase:
+
+- selenium: seconds spent in each kind of adaptive wait (page_load,
+  state_page, scroll, extract, ...), summed over workers, and
+  the rest of the run as "other" (navigation, clicks, extraction),
+- http: the concurrent HTTP phase and the browser fallback phase.
+
+Results are appended as JSON lines, tagged with the current commit, to
+benchmarks/results/scrape_benchmark.jsonl, and --compare prints the
+stored runs of each setting side by side across commits.
+
+Usage:
+    python -m benchmarks.replay generate fixtures
+    python -m benchmarks.scrape_benchmark fixtures --engines http selenium
+    python -m benchmarks.scrape_benchmark --compare
+
+Modules used:
+- argparse: for the command line
+- json / os / subprocess / time: for storing tagged results
+- benchmarks.replay: for the local fixture server
+- metrics: for per-page measurements
+- scraper: for the code under test
+"""
+import argparse
+
+import json
+
+import os
+
+import subprocess
+
+import time
+
+import scraper
+
+from benchmarks.replay import ReplayServer
+
+from metrics import Metrics
+
+RESULTS_PATH = os.path.join(
+    os.path.dirname(__file__), 'results', 'scrape_benchmark.jsonl'
+)
+
+
+def current_commit():
+
+    """
+    Returns the short hash of the checked out commit, marked
+    dirty when the tree has changes, or "unknown" outside git.
+    """
+
+    try:
+
+        COMMIT = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+        DIRTY = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+
+        return 'unknown'
+
+    return f"{COMMIT}-dirty" if DIRTY else COMMIT
+
+
+def phase_times(ENGINE, STATS, SECONDS):
+
+    """
+    Returns the wall time per phase of one run from the
+    statistics of its workers.
+    """
+
+    if ENGINE == 'http':
+
+        S = STATS[0]
+
+        return {
+            'http': round(S['http_seconds'], 3),
+            'browser': round(S['browser_seconds'], 3)
+        }
+
+    PHASES = {}
+
+    for S in STATS:
+
+        for KIND, WAITED in S['waits'].get('waited_by_kind', {}).items():
+
+            PHASES[KIND] = PHASES.get(KIND, 0.0) + WAITED
+
+    # Worker time not spent waiting, over every worker
+    BUSY = sum(S['seconds'] for S in STATS)
+
+    PHASES['other'] = max(BUSY - sum(PHASES.values()), 0.0)
+
+    PHASES['startup'] = max(SECONDS - max(S['seconds'] for S in STATS), 0.0)
+
+    return {KIND: round(VALUE, 3) for KIND, VALUE in PHASES.items()}
+
+
+def page_costs(METRICS):
+
+    """
+    Returns the mean bytes transferred and load time
+    (driver.get until the document is parsed) per route page.
+    """
+
+    SNAPSHOT = METRICS.snapshot()
+
+    COUNTERS = {
+        NAME: VALUE for NAME, LABELS, VALUE in SNAPSHOT['counters']
+        if LABELS.get('page') == 'route'
+    }
+
+    LOADS = [
+        (TOTAL, COUNT) for NAME, LABELS, _, TOTAL, COUNT
+        in SNAPSHOT['histograms']
+        if NAME == 'phase_seconds' and LABELS.get('phase') == 'route_get'
+    ]
+
+    PAGES = COUNTERS.get('pages', 0)
+
+    return {
+        'bytes_per_page': (
+            round(COUNTERS.get('bytes_transferred', 0) / PAGES)
+            if PAGES else None
+        ),
+        'load_seconds_per_page': (
+            round(LOADS[0][0] / LOADS[0][1], 3)
+            if LOADS and LOADS[0][1] else None
+        )
+    }
+
+
+def run_once(SERVER, ENGINE, WORKERS=1, CONCURRENCY=32, PROFILE='lean'):
+
+    """
+    Scrapes the served fixtures once and returns the result record.
+    """
+
+    MANIFEST = SERVER.manifest()
+
+    REQUESTS = dict(SERVER.counts)
+
+    METRICS = Metrics()
+
+    START = time.perf_counter()
+
+    df = scraper.scrap_redbus_data(
+        workers=WORKERS,
+        links=SERVER.links(),
+        engine=ENGINE,
+        concurrency=CONCURRENCY,
+        metrics=METRICS,
+        browser=PROFILE
+    )
+
+    SECONDS = time.perf_counter() - START
+
+    STATS = df.attrs['worker_stats']
+
+    ROUTES = sum(S['routes'] for S in STATS)
+
+    return {
+        'commit': current_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'fixtures': MANIFEST,
+        'latency': SERVER.latency,
+        'engine': ENGINE,
+        'workers': WORKERS if ENGINE == 'selenium' else None,
+        'concurrency': CONCURRENCY if ENGINE == 'http' else None,
+        'browser': PROFILE,
+        'seconds': round(SECONDS, 3),
+        'routes': ROUTES,
+        'buses': len(df),
+        'complete': (
+            None if MANIFEST.get('buses') is None
+            else len(df) == MANIFEST['buses']
+        ),
+        'routes_per_min': round(ROUTES / SECONDS * 60, 1),
+        'buses_per_sec': round(len(df) / SECONDS, 1),
+        'requests': SERVER.counts['requests'] - REQUESTS['requests'],
+        **page_costs(METRICS),
+        'phases': phase_times(ENGINE, STATS, SECONDS)
+    }
+
+
+def setting(RECORD):
+
+    BROWSER = RECORD.get('browser', 'default')
+
+    if RECORD['engine'] == 'http':
+
+        return f"http concurrency={RECORD['concurrency']} {BROWSER}"
+
+    return f"selenium workers={RECORD['workers']} {BROWSER}"
+
+
+def print_record(RECORD):
+
+    print(
+        f"{setting(RECORD):<34} {RECORD['seconds']:8.1f}s "
+        f"{RECORD['routes_per_min']:8.1f} routes/min "
+        f"{RECORD['buses_per_sec']:8.1f} buses/s "
+        f"complete={RECORD['complete']}"
+    )
+
+    if RECORD.get('bytes_per_page') is not None:
+
+        print(
+            f"    {RECORD['bytes_per_page']:,} bytes/page, "
+            f"{RECORD['load_seconds_per_page']}s load/page"
+        )
+
+    print(" " * 4 + ", ".join(
+        f"{KIND} {SECONDS:.1f}s"
+        for KIND, SECONDS in sorted(
+            RECORD['phases'].items(), key=lambda P: -P[1]
+        )
+    ))
+
+
+def save(RECORDS, PATH=RESULTS_PATH):
+
+    os.makedirs(os.path.dirname(PATH), exist_ok=True)
+
+    with open(PATH, 'a') as HANDLE:
+
+        for RECORD in RECORDS:
+
+            HANDLE.write(json.dumps(RECORD) + '\n')
+
+
+def compare(PATH=RESULTS_PATH, last=5):
+
+    """
+    Prints the last stored runs of every setting, oldest first.
+    """
+
+    if not os.path.exists(PATH):
+
+        print(f"No results in {PATH}")
+
+        return
+
+    with open(PATH) as HANDLE:
+
+        RECORDS = [json.loads(LINE) for LINE in HANDLE if LINE.strip()]
+
+    SETTINGS = {}
+
+    for RECORD in RECORDS:
+
+        SETTINGS.setdefault(setting(RECORD), []).append(RECORD)
+
+    for NAME, RUNS in sorted(SETTINGS.items()):
+
+        print(NAME)
+
+        for RECORD in RUNS[-last:]:
+
+            print(
+                f"    {RECORD['commit']:<16} {RECORD['time']}  "
+                f"{RECORD['fixtures'].get('routes')} routes "
+                f"latency={RECORD['latency']}s  "
+                f"{RECORD['seconds']:8.1f}s "
+                f"{RECORD['routes_per_min']:8.1f} routes/min "
+                f"{RECORD['buses_per_sec']:8.1f} buses/s "
+                f"{RECORD.get('bytes_per_page') or '-'} bytes/page"
+            )
+
+
+def main(argv=None):
+
+    PARSER = argparse.ArgumentParser(
+        description="Measure scraper throughput on replayed fixtures."
+    )
+
+    PARSER.add_argument("fixtures", nargs="?", default="fixtures")
+
+    PARSER.add_argument(
+        "--engines", nargs="+", choices=["selenium", "http"],
+        default=["http", "selenium"]
+    )
+
+    PARSER.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+
+    PARSER.add_argument(
+        "--concurrency", type=int, nargs="+", default=[8, 32]
+    )
+
+    PARSER.add_argument(
+        "--profiles", nargs="+", choices=["lean", "default"],
+        default=["lean"], help="browser profiles of the selenium runs"
+    )
+
+    PARSER.add_argument(
+        "--latency", type=float, default=0.05,
+        help="seconds added to every response"
+    )
+
+    PARSER.add_argument("--results", default=RESULTS_PATH)
+
+    PARSER.add_argument(
+        "--compare", action="store_true",
+        help="print stored results instead of running"
+    )
+
+    args = PARSER.parse_args(argv)
+
+    if args.compare:
+
+        compare(args.results)
+
+        return
+
+    RECORDS = []
+
+    with ReplayServer(args.fixtures, latency=args.latency) as SERVER:
+
+        for ENGINE in args.engines:
+
+            SETTINGS = (
+                [{'CONCURRENCY': C} for C in args.concurrency]
+                if ENGINE == 'http'
+                else [
+                    {'WORKERS': W, 'PROFILE': P}
+                    for P in args.profiles for W in args.workers
+                ]
+            )
+
+            for KWARGS in SETTINGS:
+
+                RECORD = run_once(SERVER, ENGINE, **KWARGS)
+
+                print_record(RECORD)
+
+                RECORDS.append(RECORD)
+
+    save(RECORDS, args.results)
+
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,485 @@
+"""
+In-process bitmap index over the loaded bus_routes snapshot
+
+The dashboard used to answer one (state, route) at a time and evaluate
+every filter pill as a string scan. This module loads the snapshot once
+and keeps, for every filterable attribute, the set of buses having it:
+
+- state and route membership,
+- the bus-type flags (ac, non_ac, sleeper, seater, luxury, electric)
+  and the operator flags, which are government and private: the
+  scrape records no other operator attribute,
+- highly rated (star_rating >= 4) and day / night departures.
+
+Sets are compressed the way roaring bitmaps choose their containers,
+but for the whole snapshot rather than per 65536-bus chunk: a set
+holding fewer than one bus in SPARSE_RATIO is kept as its sorted
+32-bit positions, any other as a dense bitset packed eight buses to a
+byte. Routes, and rare flags such as electric, are therefore stored
+in proportion to their own buses instead of the whole snapshot. A
+query expands the sets it uses into bitsets and ANDs those, so no
+run-length containers are kept and a query costs about size / 8 bytes
+per condition.
+
+Prices and ratings are kept as sorted arrays, so a price ceiling or a
+rating floor becomes a bitset through one binary search. Any mix of the
+dashboard's filters can then be answered for a route, a whole state or
+the whole country by AND-ing bitsets, e.g. all AC sleepers in Kerala
+under 800 departing at night:
+
+    INDEX.query(state='Kerala', filters=['ac', 'sleeper', 'night'],
+                max_price=800)
+
+The pill semantics match the route page: choosing both ac and non_ac
+(or government and private) does not filter on either.
+
+Results are served a page at a time with keyset pagination on
+(price, id): page() returns the cheapest matching buses after a
+cursor, the (price, id) of the last bus already shown. It reads only
+the nonzero bytes of the match and ranks the matching buses by price
+with one lookup each, so a page costs size / 8 bytes plus the matches
+rather than a pass over every bus, and count() serves the total from
+the bitsets alone.
+
+Modules used:
+- numpy: for bitsets, position lists and sorted arrays
+- pandas: for the snapshot rows
+- loader: for reading the buses from the star schema
+- normalize: for the compact column types
+"""
+import numpy as np
+
+import pandas as pd
+
+from loader import bus_select
+
+from normalize import compact_frame
+
+# Filters answered by a precomputed flag column
+FLAG_FILTERS = {
+    'ac': 'is_ac',
+    'non_ac': 'is_non_ac',
+    'sleeper': 'is_sleeper',
+    'seater': 'is_seater',
+    'luxury': 'is_luxury',
+    'electric': 'is_electric',
+    'government': 'is_government'
+}
+
+FILTERS = list(FLAG_FILTERS) + ['private', 'highly_rated', 'day', 'night']
+
+# Pairs of filters that cancel out when chosen together
+EXCLUSIVE = [('ac', 'non_ac'), ('government', 'private')]
+
+HIGHLY_RATED = 4.0
+
+# Sets with fewer members than one bus in SPARSE_RATIO are stored as
+# positions: a 32-bit position per member costs less than a bit per bus
+SPARSE_RATIO = 32
+
+# Day departures are 06:00:01 to 18:00:00, in seconds of the day
+DAY_START, DAY_END = 6 * 3600 + 1, 18 * 3600
+
+# Buses per page of a paginated query
+PAGE_SIZE = 100
+
+# Columns returned by a query
+RESULT_COLUMNS = [
+    'state', 'route_name', 'busname', 'bustype', 'departing_time',
+    'duration', 'reaching_time', 'star_rating', 'price', 'seats_available'
+]
+
+
+def to_bitset(MASK):
+
+    """
+    Packs a boolean array into a bitset.
+    """
+
+    return np.packbits(np.asarray(MASK, dtype=bool), bitorder='little')
+
+
+def members(BITS):
+
+    """
+    Returns the sorted positions of the set bits of a bitset,
+    expanding only its nonzero bytes.
+    """
+
+    BYTES = np.flatnonzero(BITS)
+
+    ROWS, OFFSETS = np.nonzero(
+        np.unpackbits(BITS[BYTES][:, None], axis=1, bitorder='little')
+    )
+
+    return BYTES[ROWS] * 8 + OFFSETS
+
+
+def compress(POSITIONS, SIZE):
+
+    """
+    Returns the set of SIZE buses holding the sorted POSITIONS as
+    the positions themselves (uint32) when it is sparse, or else
+    as a bitset.
+    """
+
+    if len(POSITIONS) * SPARSE_RATIO < SIZE:
+
+        return np.asarray(POSITIONS, dtype=np.uint32)
+
+    MASK = np.zeros(SIZE, dtype=bool)
+
+    MASK[POSITIONS] = True
+
+    return to_bitset(MASK)
+
+
+def keyset_start(PRICES, IDS, AFTER):
+
+    """
+    Returns the position of the first key after the cursor
+    AFTER = (price, id) in keys sorted by (price, id), or 0 when
+    AFTER is None. Missing prices are keyed as infinity and their
+    cursor price as None, so they come last.
+    """
+
+    if AFTER is None:
+
+        return 0
+
+    PRICE, ID = AFTER
+
+    PRICE = np.inf if PRICE is None else PRICE
+
+    LOW = np.searchsorted(PRICES, PRICE, side='left')
+
+    HIGH = np.searchsorted(PRICES, PRICE, side='right')
+
+    return int(LOW + np.searchsorted(IDS[LOW:HIGH], ID, side='right'))
+
+
+def cursor_at(PRICE, ID):
+
+    """
+    Returns the cursor of the bus keyed (PRICE, ID), as plain
+    Python values that can be kept in the session state.
+    """
+
+    return (None if np.isinf(PRICE) else float(PRICE)), int(ID)
+
+
+class BitmapIndex:
+
+    """
+    Bitmap index over a DataFrame of bus_routes rows.
+    """
+
+    def __init__(self, ROWS):
+
+        self.rows = ROWS.reset_index(drop=True)
+
+        self.size = len(self.rows)
+
+        self.all = to_bitset(np.ones(self.size, dtype=bool))
+
+        self.bitmaps = {}
+
+        for NAME, COLUMN in FLAG_FILTERS.items():
+
+            self.bitmaps[NAME] = self._set(
+                self.rows[COLUMN].fillna(False).astype(bool).to_numpy()
+            )
+
+        self.bitmaps['private'] = self._set(
+            ~self.rows['is_government'].fillna(False).astype(bool).to_numpy()
+        )
+
+        RATING = self.rows['star_rating'].astype(float).fillna(0.0)
+
+        RATING = RATING.to_numpy()
+
+        self.bitmaps['highly_rated'] = self._set(RATING >= HIGHLY_RATED)
+
+        SECONDS = pd.to_timedelta(
+            self.rows['departing_time']
+        ).dt.total_seconds().to_numpy()
+
+        KNOWN = ~np.isnan(SECONDS)
+
+        DAY = (SECONDS >= DAY_START) & (SECONDS <= DAY_END)
+
+        self.bitmaps['day'] = self._set(KNOWN & DAY)
+
+        self.bitmaps['night'] = self._set(KNOWN & ~DAY)
+
+        self.states = {
+            STATE: compress(POSITIONS, self.size)
+            for STATE, POSITIONS in self._groups(self.rows['state'])
+        }
+
+        self.routes = {
+            KEY: compress(POSITIONS, self.size)
+            for KEY, POSITIONS in self._groups(
+                self.rows['state'].astype(str) + '\x00'
+                + self.rows['route_name'].astype(str)
+            )
+        }
+
+        # Sorted arrays: positions ordered by value, and the values
+        self.prices = self.rows['price'].astype(float).to_numpy()
+
+        # NaN prices sort last and never match a price ceiling
+        self.price_order = np.argsort(self.prices, kind='stable')
+
+        self.price_sorted = self.prices[self.price_order]
+
+        # Rank of every bus in the price order
+        self.price_rank = np.empty(self.size, dtype=np.uint32)
+
+        self.price_rank[self.price_order] = np.arange(self.size)
+
+        # Keyset order (price, id): snapshot rows are in id order,
+        # so the stable price sort already breaks ties by id
+        self.ids = (
+            self.rows['id'].to_numpy() if 'id' in self.rows
+            else np.arange(1, self.size + 1)
+        )
+
+        self.key_prices = np.where(
+            np.isnan(self.price_sorted), np.inf, self.price_sorted
+        )
+
+        self.key_ids = self.ids[self.price_order]
+
+        self.rating_order = np.argsort(RATING, kind='stable')
+
+        self.rating_sorted = RATING[self.rating_order]
+
+    @staticmethod
+    def _groups(SERIES):
+
+        """
+        Yields (value, sorted positions) for every distinct value,
+        grouping the rows with one sort instead of one scan per
+        value.
+        """
+
+        CODES, VALUES = pd.factorize(SERIES)
+
+        ORDER = np.argsort(CODES, kind='stable')
+
+        # Missing values (code -1) sort first and belong to no group
+        ORDER = ORDER[CODES[ORDER] >= 0]
+
+        ENDS = np.cumsum(np.bincount(CODES[ORDER], minlength=len(VALUES)))
+
+        for VALUE, POSITIONS in zip(VALUES, np.split(ORDER, ENDS[:-1])):
+
+            yield VALUE, POSITIONS
+
+    def _set(self, MASK):
+
+        return compress(np.flatnonzero(MASK), self.size)
+
+    def bitset(self, MEMBERS):
+
+        """
+        Returns a stored set (see compress) as a bitset.
+        """
+
+        if MEMBERS.dtype == np.uint32:
+
+            return self._positions(MEMBERS)
+
+        return MEMBERS
+
+    def _positions(self, POSITIONS):
+
+        MASK = np.zeros(self.size, dtype=bool)
+
+        MASK[POSITIONS] = True
+
+        return to_bitset(MASK)
+
+    def price_at_most(self, PRICE):
+
+        """
+        Bitset of the buses costing at most PRICE.
+        """
+
+        END = np.searchsorted(self.price_sorted, PRICE, side='right')
+
+        return self._positions(self.price_order[:END])
+
+    def rating_at_least(self, RATING):
+
+        """
+        Bitset of the buses rated at least RATING.
+        """
+
+        START = np.searchsorted(self.rating_sorted, RATING, side='left')
+
+        return self._positions(self.rating_order[START:])
+
+    def scope(self, state=None, route=None):
+
+        """
+        Bitset of a route, a state, or everything.
+        """
+
+        if route is not None:
+
+            MEMBERS = self.routes.get(f"{state}\x00{route}")
+
+        elif state is not None:
+
+            MEMBERS = self.states.get(state)
+
+        else:
+
+            return self.all
+
+        if MEMBERS is None:
+
+            return np.zeros_like(self.all)
+
+        return self.bitset(MEMBERS)
+
+    def match(
+        self, state=None, route=None, filters=(), max_price=None,
+        min_rating=None
+    ):
+
+        """
+        Returns the bitset of the buses matching every condition.
+        """
+
+        FILTERS_SET = set(filters)
+
+        for PAIR in EXCLUSIVE:
+
+            if FILTERS_SET.issuperset(PAIR):
+
+                FILTERS_SET.difference_update(PAIR)
+
+        BITS = self.scope(state, route).copy()
+
+        for NAME in FILTERS_SET:
+
+            BITS &= self.bitset(self.bitmaps[NAME])
+
+        if max_price is not None:
+
+            BITS &= self.price_at_most(max_price)
+
+        if min_rating is not None:
+
+            BITS &= self.rating_at_least(min_rating)
+
+        return BITS
+
+    def count(self, **CONDITIONS):
+
+        """
+        Returns the number of buses matching the conditions.
+        """
+
+        return int(np.unpackbits(
+            self.match(**CONDITIONS), count=self.size, bitorder='little'
+        ).sum())
+
+    def query(self, **CONDITIONS):
+
+        """
+        Returns the buses matching the conditions (see match())
+        as a DataFrame, in snapshot order.
+        """
+
+        MASK = np.unpackbits(
+            self.match(**CONDITIONS), count=self.size, bitorder='little'
+        ).astype(bool)
+
+        return self.rows.loc[MASK, RESULT_COLUMNS].reset_index(drop=True)
+
+    def page(self, after=None, limit=PAGE_SIZE, **CONDITIONS):
+
+        """
+        Returns up to limit buses matching the conditions, ordered
+        by (price, id) and starting after the cursor after, and the
+        cursor of the next page (None on the last page).
+
+        Only the matching buses are ranked by price, and just
+        the limit + 1 cheapest after the cursor are sorted.
+        """
+
+        START = keyset_start(self.key_prices, self.key_ids, after)
+
+        RANKS = self.price_rank[members(self.match(**CONDITIONS))]
+
+        RANKS = RANKS[RANKS >= START]
+
+        if len(RANKS) > limit + 1:
+
+            RANKS = np.partition(RANKS, limit)[:limit + 1]
+
+        RANKS = np.sort(RANKS)
+
+        NEXT = None
+
+        if len(RANKS) > limit:
+
+            LAST = RANKS[limit - 1]
+
+            NEXT = cursor_at(self.key_prices[LAST], self.key_ids[LAST])
+
+        POSITIONS = self.price_order[RANKS[:limit]]
+
+        PAGE = self.rows.loc[POSITIONS, RESULT_COLUMNS].reset_index(drop=True)
+
+        return PAGE, NEXT
+
+    def price_bounds(self, state=None, route=None):
+
+        """
+        Returns the (min, max) price within a scope, or
+        (None, None) when the scope has no priced buses.
+        """
+
+        MASK = np.unpackbits(
+            self.scope(state, route), count=self.size, bitorder='little'
+        ).astype(bool)
+
+        PRICES = self.prices[MASK]
+
+        PRICES = PRICES[~np.isnan(PRICES)]
+
+        if not len(PRICES):
+
+            return None, None
+
+        return PRICES.min(), PRICES.max()
+
+
+def read_snapshot(storage):
+
+    """
+    Reads every bus needed by the index, joined to its route,
+    operator and bus type, through a storage backend (see
+    storage.Storage).
+    """
+
+    COLUMNS = ['id'] + RESULT_COLUMNS + list(FLAG_FILTERS.values())
+
+    ROWS = pd.DataFrame(
+        storage.fetch_all(f"{bus_select(COLUMNS)} ORDER BY b.id"),
+        columns=COLUMNS
+    )
+
+    # TIME values arrive as timedeltas from MySQL and as
+    # "HH:MM:SS" text from the embedded backends
+    ROWS['departing_time'] = pd.to_timedelta(ROWS['departing_time'])
+
+    ROWS['reaching_time'] = pd.to_timedelta(ROWS['reaching_time'])
+
+    # Names as categoricals, numbers and flags as fixed-width arrays
+    return compact_frame(ROWS)
@@ -0,0 +1,143 @@
+"""
+Chrome profiles for the scraper: default and lean
+
+The scraper only reads text nodes, yet webdriver.Chrome() used to start
+a full, visible browser that waits for every image, font, ad and
+tracker before a page counts as loaded. The lean profile:
+
+- runs headless, with the "eager" page load strategy (driver.get
+  returns once the document is parsed, not when every subresource
+  has loaded),
+- blocks images, media, fonts, analytics, ad/tracker and other
+  third-party domains through DevTools request interception
+  (Network.setBlockedURLs), and disables images in the renderer,
+- keeps a warm user data directory per worker across runs, so the
+  HTTP cache, cookies and DNS/TLS state survive between refreshes.
+
+The default profile is the old behaviour. page_stats() reads the
+bytes transferred by the current page from the Resource Timing API, so
+both profiles can be compared per page (see the scrape benchmark).
+
+Modules used:
+- os: for the warm profile directories
+- selenium: for Chrome options and DevTools commands
+"""
+import os
+
+from selenium import webdriver
+
+PROFILES = ('default', 'lean')
+
+# URL patterns blocked by the lean profile ('*' is a wildcard)
+BLOCKED_URLS = [
+    # Images, media and fonts
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg',
+    '*.ico', '*.mp4', '*.webm', '*.mp3', '*.woff', '*.woff2', '*.ttf',
+    '*.otf', '*.eot',
+    # Analytics, ads and other third parties
+    '*google-analytics.com*', '*googletagmanager.com*',
+    '*googlesyndication.com*', '*doubleclick.net*', '*googleadservices.com*',
+    '*facebook.net*', '*facebook.com/tr*', '*connect.facebook*',
+    '*hotjar.com*', '*clarity.ms*', '*branch.io*', '*appsflyer.com*',
+    '*moengage.com*', '*newrelic.com*', '*nr-data.net*', '*criteo.*',
+    '*taboola.com*', '*outbrain.com*', '*adnxs.com*', '*bing.com/bat*',
+    '*youtube.com*', '*ytimg.com*', '*fonts.googleapis.com*',
+    '*fonts.gstatic.com*'
+]
+
+# Bytes transferred for the document and every resource loaded
+# so far (0 for cache hits and blocked requests)
+PAGE_STATS_SCRIPT = """
+const entries = performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'));
+let bytes = 0;
+for (const entry of entries) {
+    bytes += entry.transferSize || 0;
+}
+const nav = performance.getEntriesByType('navigation')[0];
+return {
+    bytes: bytes,
+    requests: entries.length,
+    dom_ready: nav ? nav.domContentLoadedEventEnd / 1000 : null
+};
+"""
+
+
+def chrome_options(profile='default', profile_dir=None):
+
+    """
+    Returns the Chrome options of a profile; profile_dir is the
+    user data directory kept between runs (lean profile only).
+    """
+
+    if profile not in PROFILES:
+
+        raise ValueError(f"Unknown browser profile: {profile!r}")
+
+    OPTIONS = webdriver.ChromeOptions()
+
+    if profile == 'default':
+
+        return OPTIONS
+
+    OPTIONS.page_load_strategy = 'eager'
+
+    for ARGUMENT in (
+        '--headless=new',
+        '--window-size=1366,900',
+        '--blink-settings=imagesEnabled=false',
+        '--disable-extensions',
+        '--disable-background-networking',
+        '--disable-component-update',
+        '--disable-default-apps',
+        '--disable-sync',
+        '--mute-audio',
+        '--no-first-run'
+    ):
+
+        OPTIONS.add_argument(ARGUMENT)
+
+    OPTIONS.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.default_content_setting_values.notifications': 2
+    })
+
+    if profile_dir:
+
+        os.makedirs(profile_dir, exist_ok=True)
+
+        OPTIONS.add_argument(
+            f'--user-data-dir={os.path.abspath(profile_dir)}'
+        )
+
+    return OPTIONS
+
+
+def start_chrome(profile='default', profile_dir=None):
+
+    """
+    Starts Chrome with a profile. The lean profile also turns
+    on request blocking for BLOCKED_URLS.
+    """
+
+    driver = webdriver.Chrome(options=chrome_options(profile, profile_dir))
+
+    if profile == 'lean':
+
+        driver.execute_cdp_cmd('Network.enable', {})
+
+        driver.execute_cdp_cmd(
+            'Network.setBlockedURLs', {'urls': BLOCKED_URLS}
+        )
+
+    return driver
+
+
+def page_stats(driver):
+
+    """
+    Returns the bytes transferred and requests made by the
+    current page so far, and its DOMContentLoaded time.
+    """
+
+    return driver.execute_script(PAGE_STATS_SCRIPT) or {}
@@ -0,0 +1,231 @@
+"""
+Persistent route checkpoints for resumable, incremental scraping
+
+Every route that finishes scraping is recorded in a small SQLite file,
+keyed by (state, route_link), together with its completion time, row
+count and the rows themselves. Before a route is visited the scraper
+asks the store whether it was completed within the freshness TTL; if
+so the saved rows are reused and the page is not loaded at all.
+
+This makes an interrupted run resume where it stopped (everything done
+before the failure is still fresh) and turns a nightly refresh into an
+incremental top-up of the routes whose data has gone stale.
+
+The route list discovered on each state page is stored as well, so a
+resumed run goes straight to the routes still to be visited without
+walking the state pages' pagination again.
+
+SQLite is used in WAL mode with a busy timeout so that several worker
+processes can share one checkpoint file.
+
+Modules used:
+- json: for storing the rows of a route and route lists
+- sqlite3: for the checkpoint file
+- time: for completion timestamps
+"""
+import json
+
+import sqlite3
+
+import time
+
+# Routes scraped within this many seconds are not scraped again
+DEFAULT_TTL = 12 * 3600
+
+
+class CheckpointStore:
+
+    """
+    Route checkpoints stored in a SQLite file at PATH.
+
+    A route is fresh when it was completed less than ttl seconds
+    ago; ttl=0 records checkpoints but never skips a route.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL):
+
+        self.path = path
+
+        self.ttl = ttl
+
+        self.conn = sqlite3.connect(path, timeout=30)
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS routes (
+                state TEXT NOT NULL,
+                route_link TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                row_count INTEGER NOT NULL,
+                rows TEXT NOT NULL,
+                PRIMARY KEY (state, route_link)
+            )
+            """
+        )
+
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS discovered (
+                state TEXT NOT NULL,
+                url TEXT NOT NULL,
+                discovered_at REAL NOT NULL,
+                routes TEXT NOT NULL,
+                PRIMARY KEY (state, url)
+            )
+            """
+        )
+
+        self.conn.commit()
+
+        self.stats = {'skipped': 0, 'saved': 0, 'route_lists': 0}
+
+    def fresh(self, STATE, ROUTE_LINK):
+
+        """
+        Returns True if the route was completed within the TTL.
+        """
+
+        if not self.ttl:
+
+            return False
+
+        ROW = self.conn.execute(
+            """
+            SELECT completed_at FROM routes
+            WHERE state = ? AND route_link = ?
+            """, (STATE, ROUTE_LINK)
+        ).fetchone()
+
+        return ROW is not None and time.time() - ROW[0] < self.ttl
+
+    def load(self, STATE, ROUTE_LINK, DATA):
+
+        """
+        Appends the saved rows of a route to the DATA dictionary.
+
+        Returns the number of rows appended.
+        """
+
+        ROW = self.conn.execute(
+            """
+            SELECT rows, row_count FROM routes
+            WHERE state = ? AND route_link = ?
+            """, (STATE, ROUTE_LINK)
+        ).fetchone()
+
+        if ROW is None:
+
+            return 0
+
+        PART = json.loads(ROW[0])
+
+        for COLUMN in DATA:
+
+            DATA[COLUMN].extend(PART[COLUMN])
+
+        self.stats['skipped'] += 1
+
+        return ROW[1]
+
+    def load_all(self, DATA):
+
+        """
+        Appends the saved rows of every route, ordered by state and
+        route, to the DATA dictionary. Returns the number of routes.
+        """
+
+        ROUTES = 0
+
+        for (ROWS,) in self.conn.execute(
+            "SELECT rows FROM routes ORDER BY state, route_link"
+        ):
+
+            PART = json.loads(ROWS)
+
+            for COLUMN in DATA:
+
+                DATA[COLUMN].extend(PART[COLUMN])
+
+            ROUTES += 1
+
+        return ROUTES
+
+    def save(self, STATE, ROUTE_LINK, PART):
+
+        """
+        Records a completed route and its rows (a DATA dictionary
+        holding only that route), replacing any earlier checkpoint.
+        """
+
+        with self.conn:
+
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO routes
+                (state, route_link, completed_at, row_count, rows)
+                VALUES (?, ?, ?, ?, ?)
+                """, (
+                    STATE, ROUTE_LINK, time.time(),
+                    len(PART['busname']), json.dumps(PART)
+                )
+            )
+
+        self.stats['saved'] += 1
+
+    def route_list(self, STATE, URL):
+
+        """
+        Returns the (route_link, route_title) pairs discovered on a
+        state page within the TTL, or None.
+        """
+
+        if not self.ttl:
+
+            return None
+
+        ROW = self.conn.execute(
+            """
+            SELECT discovered_at, routes FROM discovered
+            WHERE state = ? AND url = ?
+            """, (STATE, URL)
+        ).fetchone()
+
+        if ROW is None or time.time() - ROW[0] >= self.ttl:
+
+            return None
+
+        self.stats['route_lists'] += 1
+
+        return [tuple(ROUTE) for ROUTE in json.loads(ROW[1])]
+
+    def save_route_list(self, STATE, URL, ROUTES):
+
+        """
+        Records the routes discovered on a state page.
+        """
+
+        with self.conn:
+
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO discovered
+                (state, url, discovered_at, routes)
+                VALUES (?, ?, ?, ?)
+                """, (STATE, URL, time.time(), json.dumps(ROUTES))
+            )
+
+    def close(self):
+
+        self.conn.close()
+
+
+def open_store(path, ttl=DEFAULT_TTL):
+
+    """
+    Returns a CheckpointStore for path, or None when
+    checkpointing is disabled (path is empty or None).
+    """
+
+    return CheckpointStore(path, ttl) if path else None
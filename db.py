@@ -0,0 +1,334 @@
+"""
+Database connection settings shared by the ingestion job and the app
+
+The connection details default to the project's TiDB Cloud gateway and
+can be overridden through REDBUS_DB_* environment variables.
+
+ConnectionPool keeps a bounded set of warm connections for the
+dashboard, so Streamlit reruns and concurrent users reuse connections
+instead of paying the TLS and authentication handshake on every click.
+
+Modules used:
+- os: for reading runtime configuration
+- queue / threading / time: for the connection pool
+- contextlib: for borrowing pooled connections
+- mysql.connector: for plain DB-API connections
+- sqlalchemy: for the engine used by the loader
+"""
+import os
+
+import queue
+
+import threading
+
+import time
+
+from contextlib import contextmanager
+
+import mysql.connector
+
+from sqlalchemy import create_engine
+
+DB_HOST = os.environ.get(
+    "REDBUS_DB_HOST", "gateway01.ap-southeast-1.prod.aws.tidbcloud.com"
+)
+
+DB_PORT = int(os.environ.get("REDBUS_DB_PORT", "4000"))
+
+DB_USER = os.environ.get("REDBUS_DB_USER", "PRcdCBsrEmMi29p.root")
+
+DB_PASSWORD = os.environ.get("REDBUS_DB_PASSWORD", "oIyHQktds3I0RxUf")
+
+DB_NAME = os.environ.get("REDBUS_DB_NAME", "Redbusdata")
+
+# Connections kept by the dashboard's pool
+POOL_SIZE = int(os.environ.get("REDBUS_DB_POOL_SIZE", "5"))
+
+
+def connect(database=DB_NAME):
+
+    """
+    Opens a mysql.connector connection, to DB_NAME by default
+    or to no database when database is empty.
+    """
+
+    return mysql.connector.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=database
+    )
+
+
+def create_database(database=DB_NAME):
+
+    """
+    Creates the database (DB_NAME by default) if it does not
+    exist yet.
+    """
+
+    CONN = connect(database="")
+
+    try:
+
+        CURSOR = CONN.cursor()
+
+        CURSOR.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+
+        CURSOR.close()
+
+    finally:
+
+        CONN.close()
+
+
+def make_engine(database=DB_NAME):
+
+    """
+    Returns a pooled SQLAlchemy engine for the database,
+    DB_NAME by default.
+    """
+
+    return create_engine(
+        (
+            f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@"
+            f"{DB_HOST}:{DB_PORT}/{database}"
+        ),
+        connect_args={"ssl_disabled": False},
+        pool_pre_ping=True,
+        pool_recycle=600,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30
+    )
+
+
+class ConnectionPool:
+
+    """
+    Thread-safe, bounded pool of mysql.connector connections.
+
+    At most size connections exist at once; acquire() waits up to
+    timeout seconds for one to be released. A connection idle for
+    more than ping_after seconds is health-checked with a ping
+    (reconnecting if needed) before it is handed out, and one that
+    fails the check is replaced. Pooled connections use autocommit,
+    so a reused connection never reads from an old snapshot.
+    """
+
+    def __init__(
+        self, size=POOL_SIZE, timeout=30, ping_after=60, database=DB_NAME
+    ):
+
+        self.size = size
+
+        self.timeout = timeout
+
+        self.ping_after = ping_after
+
+        self.database = database
+
+        # Most recently used first, so warm connections are reused
+        self.idle = queue.LifoQueue()
+
+        self.slots = threading.BoundedSemaphore(size)
+
+        self.lock = threading.Lock()
+
+        self.counts = {
+            'open': 0,
+            'in_use': 0,
+            'created': 0,
+            'reused': 0,
+            'pings': 0,
+            'replaced': 0,
+            'waited': 0.0
+        }
+
+    def _count(self, NAME, VALUE=1):
+
+        with self.lock:
+
+            self.counts[NAME] += VALUE
+
+    def _create(self):
+
+        CONN = connect(self.database)
+
+        CONN.autocommit = True
+
+        self._count('created')
+
+        self._count('open')
+
+        return CONN
+
+    def _discard(self, CONN):
+
+        self._count('open', -1)
+
+        try:
+
+            CONN.close()
+
+        except mysql.connector.Error:
+
+            pass
+
+    def acquire(self):
+
+        """
+        Returns a healthy connection; release() must be called
+        with it once the caller is done.
+        """
+
+        START = time.perf_counter()
+
+        if not self.slots.acquire(timeout=self.timeout):
+
+            raise mysql.connector.errors.PoolError(
+                f"No connection free after {self.timeout}s"
+            )
+
+        self._count('waited', time.perf_counter() - START)
+
+        try:
+
+            CONN = None
+
+            while CONN is None:
+
+                try:
+
+                    CONN, RELEASED = self.idle.get_nowait()
+
+                except queue.Empty:
+
+                    CONN = self._create()
+
+                    break
+
+                if time.monotonic() - RELEASED < self.ping_after:
+
+                    self._count('reused')
+
+                    break
+
+                try:
+
+                    self._count('pings')
+
+                    CONN.ping(reconnect=True, attempts=2, delay=0)
+
+                    self._count('reused')
+
+                except mysql.connector.Error:
+
+                    self._count('replaced')
+
+                    self._discard(CONN)
+
+                    CONN = None
+
+        except Exception:
+
+            self.slots.release()
+
+            raise
+
+        self._count('in_use')
+
+        return CONN
+
+    def release(self, CONN, broken=False):
+
+        """
+        Returns a connection to the pool, or closes it when the
+        caller saw it fail (broken=True).
+        """
+
+        self._count('in_use', -1)
+
+        try:
+
+            if broken:
+
+                self._count('replaced')
+
+                self._discard(CONN)
+
+            else:
+
+                self.idle.put((CONN, time.monotonic()))
+
+        finally:
+
+            self.slots.release()
+
+    @contextmanager
+    def connection(self):
+
+        """
+        Borrows a connection for the duration of a with block.
+        """
+
+        CONN = self.acquire()
+
+        BROKEN = False
+
+        try:
+
+            yield CONN
+
+        except (
+            mysql.connector.errors.InterfaceError,
+            mysql.connector.errors.OperationalError
+        ):
+
+            # The connection itself failed; do not hand it out again
+            BROKEN = True
+
+            raise
+
+        finally:
+
+            # Query errors (e.g. a missing table) leave the
+            # connection usable, so only BROKEN ones are closed
+            self.release(CONN, broken=BROKEN)
+
+    def stats(self):
+
+        """
+        Returns the pool size and usage counters.
+        """
+
+        with self.lock:
+
+            STATS = dict(self.counts)
+
+        STATS['size'] = self.size
+
+        STATS['idle'] = self.idle.qsize()
+
+        STATS['waited'] = round(STATS['waited'], 3)
+
+        return STATS
+
+    def close(self):
+
+        """
+        Closes every idle connection.
+        """
+
+        while True:
+
+            try:
+
+                CONN, _ = self.idle.get_nowait()
+
+            except queue.Empty:
+
+                return
+
+            self._discard(CONN)
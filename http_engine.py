@@ -0,0 +1,625 @@
+"""
+Browserless HTTP scraping engine for RedBus route pages
+
+The Selenium engine renders every route page in a full Chrome just to
+read the text of a few class-prefixed nodes. This engine fetches state
+and route pages over plain HTTP with a pooled aiohttp session, runs many
+requests concurrently under asyncio, and parses the HTML with compiled
+lxml XPath expressions that use the same class selectors as the browser
+extractor (travelsName___, finalFare___, totalSeats___, ...).
+
+Only pages that genuinely need JavaScript fall back to Selenium:
+- state pages with several DC_117_pageTabs tabs (the tabs are JS-driven),
+- route pages with no bus cards in the served HTML, with collapsed
+  government groups (rtcInfoWrap___), or with a full first batch of
+  cards and no end marker (more buses load on scroll).
+Fallback pages are visited one after another through a single browser
+that is only started when the first such page is seen.
+
+The base URLs come from the links mapping, so the engine can be pointed
+at a local HTTP server serving captured pages.
+
+Modules used:
+- asyncio: for concurrent fetching
+- os: for the fallback browser's profile directory
+- time: for throughput timing
+- logging: for reporting throughput and fallbacks
+- urllib.parse: for resolving relative route links
+- aiohttp: for pooled HTTP connections
+- lxml: for HTML parsing
+- scraper: for the DATA layout and the Selenium fallback
+- checkpoint: for skipping fresh routes and recording completed ones
+- metrics: for fetch timings, route counters and route spans
+"""
+import asyncio
+
+import logging
+
+import os
+
+import time
+
+from urllib.parse import urljoin
+
+import aiohttp
+
+from lxml import etree, html
+
+import scraper
+
+from checkpoint import DEFAULT_TTL, open_store
+
+from metrics import Metrics
+
+LOGGER = logging.getLogger(__name__)
+
+# Default number of requests in flight at once
+CONCURRENCY = 32
+
+# Attempts per request before a page is handed to the browser
+RETRIES = 3
+
+HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml',
+    'Accept-Language': 'en-IN,en;q=0.9'
+}
+
+# Compiled selectors, mirroring the ones used with Selenium
+ROUTE_LINKS = etree.XPath("//a[@class='route']")
+
+PAGE_TABS = etree.XPath("//div[contains(@class, 'DC_117_pageTabs')]")
+
+CARDS = etree.XPath("//li[contains(@class, 'tupleWrapper')]")
+
+GOVT_GROUPS = etree.XPath("//div[contains(@class, 'rtcInfoWrap___')]")
+
+END_MARKER = etree.XPath("//span[contains(@class, 'end')]")
+
+# XPath selectors of the bus fields, relative to a tupleWrapper
+# card (the lxml counterpart of scraper.CARD_FIELDS)
+CARD_FIELDS = {
+    'busname': etree.XPath(".//div[contains(@class, 'travelsName___')]"),
+    'bustype': etree.XPath(".//p[contains(@class, 'busType___')]"),
+    'departing_time': etree.XPath(
+        ".//p[contains(@class, 'boardingTime___')]"
+    ),
+    'duration': etree.XPath(".//p[contains(@class, 'duration___')]"),
+    'reaching_time': etree.XPath(
+        ".//p[contains(@class, 'droppingTime___')]"
+    ),
+    'star_rating': etree.XPath(
+        ".//div[contains(@class, 'timeFareBoWrap___')]"
+        "//div[contains(@class, 'rating___')]"
+    ),
+    'price': etree.XPath(".//p[contains(@class, 'finalFare___')]"),
+    'seats_available': etree.XPath(
+        ".//p[contains(@class, 'totalSeats___')]"
+    )
+}
+
+# A first batch of at least this many cards without the end
+# marker means the rest of the list is loaded on scroll
+LAZY_BATCH = 10
+
+
+def parse_state_page(BODY, BASE_URL):
+
+    """
+    Parses a state page.
+
+    Returns the (route_link, route_title) pairs found, without
+    duplicates, and whether the page has several pagination tabs
+    (whose routes can only be reached through the browser).
+    """
+
+    TREE = html.fromstring(BODY)
+
+    ROUTES = {}
+
+    for LINK in ROUTE_LINKS(TREE):
+
+        HREF = LINK.get('href')
+
+        if HREF:
+
+            ROUTES.setdefault(urljoin(BASE_URL, HREF), LINK.get('title'))
+
+    return list(ROUTES.items()), len(PAGE_TABS(TREE)) > 1
+
+
+def parse_cards(TREE):
+
+    """
+    Returns one record per bus card in the parsed route page, in
+    the same shape as scraper.extract_cards(). Cards without a bus
+    name are skipped and missing fields come back as None.
+    """
+
+    RECORDS = []
+
+    for CARD in CARDS(TREE):
+
+        RECORD = {}
+
+        for NAME, SELECT in CARD_FIELDS.items():
+
+            NODES = SELECT(CARD)
+
+            RECORD[NAME] = (
+                NODES[0].text_content().strip() or None if NODES else None
+            )
+
+        if RECORD['busname']:
+
+            RECORDS.append(RECORD)
+
+    return RECORDS
+
+
+def parse_route_page(BODY):
+
+    """
+    Parses a route page.
+
+    Returns the bus records, or None when the served HTML does
+    not hold the complete list and the page needs a browser.
+    """
+
+    TREE = html.fromstring(BODY)
+
+    if GOVT_GROUPS(TREE):
+
+        return None
+
+    RECORDS = parse_cards(TREE)
+
+    if not RECORDS:
+
+        return None
+
+    if len(RECORDS) >= LAZY_BATCH and not END_MARKER(TREE):
+
+        return None
+
+    return RECORDS
+
+
+async def fetch(SESSION, LIMIT, URL, METRICS):
+
+    """
+    Fetches a page as text, retrying failed requests with backoff.
+    Every request is timed and counted by status in METRICS.
+
+    Returns None when the page could not be fetched.
+    """
+
+    for ATTEMPT in range(RETRIES):
+
+        if ATTEMPT:
+
+            METRICS.incr('http_retries')
+
+        try:
+
+            async with LIMIT:
+
+                START = time.perf_counter()
+
+                async with SESSION.get(URL) as RESPONSE:
+
+                    # Decoded with the response charset, so "₹" and
+                    # non-ASCII names reach the parser intact
+                    BODY = (
+                        await RESPONSE.text(errors='replace')
+                        if RESPONSE.status == 200 else None
+                    )
+
+                METRICS.observe(
+                    'phase_seconds', time.perf_counter() - START,
+                    phase='http_fetch'
+                )
+
+                METRICS.incr('http_requests', status=RESPONSE.status)
+
+                if BODY is not None:
+
+                    return BODY
+
+                if RESPONSE.status not in (429, 500, 502, 503, 504):
+
+                    LOGGER.warning("HTTP %s for %s", RESPONSE.status, URL)
+
+                    return None
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+
+            LOGGER.debug("Request to %s failed", URL, exc_info=True)
+
+        await asyncio.sleep(0.5 * 2 ** ATTEMPT)
+
+    return None
+
+
+class BrowserFallback:
+
+    """
+    Lazily started Selenium browser for pages that need JavaScript,
+    recording into the metrics registry and started with a browser
+    profile (see browser.py).
+    """
+
+    def __init__(self, metrics=None, profile='default', profile_dir=None):
+
+        self.metrics = metrics
+
+        self.profile = profile
+
+        self.profile_dir = profile_dir
+
+        self.driver = None
+
+        self.wait = None
+
+        self.pages = 0
+
+    def start(self):
+
+        if self.driver is None:
+
+            self.driver, self.wait = scraper.new_driver(
+                self.metrics, self.profile, self.profile_dir
+            )
+
+    def route_links(self, URL):
+
+        """
+        Walks the pagination of a state page in the browser.
+        """
+
+        self.start()
+
+        self.pages += 1
+
+        return scraper.collect_route_links(self.driver, self.wait, URL)
+
+    def route(
+        self, DATA, STATE, ROUTE_LINK, ROUTE_TITLE, STORE=None, SINK=None
+    ):
+
+        """
+        Scrapes one route page in the browser into DATA, or SINK.
+        Returns the number of buses of the route.
+        """
+
+        if STORE is not None and STORE.fresh(STATE, ROUTE_LINK):
+
+            PART = scraper.new_data()
+
+            STORE.load(STATE, ROUTE_LINK, PART)
+
+            return scraper.emit_route(DATA, PART, ROUTE_LINK, SINK)
+
+        self.start()
+
+        self.pages += 1
+
+        return scraper.scrap_route(
+            self.driver, self.wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE,
+            STORE, SINK
+        )
+
+    def report(self):
+
+        if self.wait is None:
+
+            return {'waits': 0, 'timeouts': 0, 'time_saved': 0.0}
+
+        return self.wait.report()
+
+    def quit(self):
+
+        if self.driver is not None:
+
+            self.driver.quit()
+
+
+async def emit_route(DATA, PART, ROUTE_LINK, SINK=None):
+
+    """
+    Hands a finished route to SINK like scraper.emit_route(), but
+    on a worker thread: a sink that blocks (a full stream.RouteWriter
+    queue) then pauses only the state handing it over, not the event
+    loop and every fetch in flight. Returns the number of rows.
+    """
+
+    if SINK is None:
+
+        return scraper.emit_route(DATA, PART, ROUTE_LINK)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        None, scraper.emit_route, DATA, PART, ROUTE_LINK, SINK
+    )
+
+
+async def scrap_state(
+    SESSION, LIMIT, STATE, URL, DATA, PENDING, STORE, METRICS, SINK=None
+):
+
+    """
+    Scrapes the routes of one state over HTTP into DATA, or hands
+    each route to SINK (see scraper.emit_route).
+
+    Routes and state pages that need a browser are appended to
+    PENDING as (kind, ...) tuples. Routes still fresh in the
+    checkpoint STORE are not fetched. Every route is recorded as a
+    span in METRICS with its outcome (ok, skipped or fallback).
+    Returns the number of routes scraped over HTTP and the
+    number of buses scraped or reused.
+    """
+
+    BODY = await fetch(SESSION, LIMIT, URL, METRICS)
+
+    ROUTES, PAGINATED = (
+        parse_state_page(BODY, URL) if BODY else ([], False)
+    )
+
+    if PAGINATED or not ROUTES:
+
+        PENDING.append(('state', STATE, URL))
+
+        return 0, 0
+
+    async def skip():
+
+        return None, 0.0
+
+    async def timed_fetch(ROUTE_LINK):
+
+        START = time.perf_counter()
+
+        ROUTE_BODY = await fetch(SESSION, LIMIT, ROUTE_LINK, METRICS)
+
+        return ROUTE_BODY, time.perf_counter() - START
+
+    FRESH = [
+        STORE is not None and STORE.fresh(STATE, ROUTE_LINK)
+        for ROUTE_LINK, _ in ROUTES
+    ]
+
+    BODIES = await asyncio.gather(*(
+        skip() if IS_FRESH else timed_fetch(ROUTE_LINK)
+        for (ROUTE_LINK, _), IS_FRESH in zip(ROUTES, FRESH)
+    ))
+
+    SCRAPED, BUSES = 0, 0
+
+    # Append in route order so the result matches the Selenium engine
+    for (ROUTE_LINK, ROUTE_TITLE), (ROUTE_BODY, SECONDS), IS_FRESH in zip(
+        ROUTES, BODIES, FRESH
+    ):
+
+        SPAN = {'state': STATE, 'route': ROUTE_TITLE, 'link': ROUTE_LINK}
+
+        if IS_FRESH:
+
+            PART = scraper.new_data()
+
+            STORE.load(STATE, ROUTE_LINK, PART)
+
+            BUSES += await emit_route(DATA, PART, ROUTE_LINK, SINK)
+
+            METRICS.incr('routes_skipped', state=STATE)
+
+            METRICS.record_span('route', 0.0, outcome='skipped', **SPAN)
+
+            continue
+
+        with METRICS.timer('parse'):
+
+            RECORDS = parse_route_page(ROUTE_BODY) if ROUTE_BODY else None
+
+        if RECORDS is None:
+
+            # Counted as attempted when the browser visits it
+            METRICS.incr('routes_fallback', state=STATE)
+
+            METRICS.record_span('route', SECONDS, outcome='fallback', **SPAN)
+
+            PENDING.append(('route', STATE, ROUTE_LINK, ROUTE_TITLE))
+
+            continue
+
+        METRICS.incr('routes_attempted', state=STATE)
+
+        METRICS.incr('buses_extracted', len(RECORDS), state=STATE)
+
+        METRICS.record_span(
+            'route', SECONDS, outcome='ok', buses=len(RECORDS), **SPAN
+        )
+
+        PART = scraper.new_data()
+
+        for RECORD in RECORDS:
+
+            scraper.append_record(
+                PART, STATE, ROUTE_LINK, ROUTE_TITLE, RECORD
+            )
+
+        if STORE is not None:
+
+            STORE.save(STATE, ROUTE_LINK, PART)
+
+        BUSES += await emit_route(DATA, PART, ROUTE_LINK, SINK)
+
+        SCRAPED += 1
+
+    return SCRAPED, BUSES
+
+
+async def scrap_states(
+    LINKS, concurrency, STORE=None, METRICS=None, SINK=None
+):
+
+    """
+    Scrapes every state concurrently over one pooled session,
+    recording into the METRICS registry (a new one by default).
+
+    Returns the (task index, DATA) pairs, the pages left for
+    the browser per task, and the number of routes and of
+    buses scraped.
+    """
+
+    METRICS = Metrics() if METRICS is None else METRICS
+
+    LIMIT = asyncio.Semaphore(concurrency)
+
+    CONNECTOR = aiohttp.TCPConnector(
+        limit=concurrency, limit_per_host=concurrency, ttl_dns_cache=300
+    )
+
+    TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+    RESULTS = [(INDEX, scraper.new_data()) for INDEX in range(len(LINKS))]
+
+    PENDING = [[] for _ in LINKS]
+
+    async with aiohttp.ClientSession(
+        connector=CONNECTOR, timeout=TIMEOUT, headers=HEADERS
+    ) as SESSION:
+
+        COUNTS = await asyncio.gather(*(
+            scrap_state(
+                SESSION, LIMIT, STATE, URL, RESULTS[I][1], PENDING[I], STORE,
+                METRICS, SINK
+            )
+            for I, (STATE, URL) in enumerate(LINKS.items())
+        ))
+
+    return (
+        RESULTS, PENDING,
+        sum(C[0] for C in COUNTS), sum(C[1] for C in COUNTS)
+    )
+
+
+def run_fallback(BROWSER, DATA, PENDING, STORE=None, SINK=None):
+
+    """
+    Visits the pages that need JavaScript in the browser.
+
+    Returns the number of routes visited and of buses scraped.
+    """
+
+    ROUTES, BUSES = 0, 0
+
+    for ITEM in PENDING:
+
+        if ITEM[0] == 'state':
+
+            _, STATE, URL = ITEM
+
+            for ROUTE_LINK, ROUTE_TITLE in BROWSER.route_links(URL):
+
+                BUSES += BROWSER.route(
+                    DATA, STATE, ROUTE_LINK, ROUTE_TITLE, STORE, SINK
+                )
+
+                ROUTES += 1
+
+        else:
+
+            _, STATE, ROUTE_LINK, ROUTE_TITLE = ITEM
+
+            BUSES += BROWSER.route(
+                DATA, STATE, ROUTE_LINK, ROUTE_TITLE, STORE, SINK
+            )
+
+            ROUTES += 1
+
+    return ROUTES, BUSES
+
+
+def run_http(
+    LINKS, concurrency=CONCURRENCY, CHECKPOINT=None, TTL=DEFAULT_TTL,
+    PROFILE='default', PROFILE_DIR=None, SINK=None
+):
+
+    """
+    Scrapes every state in LINKS with the HTTP engine,
+    checkpointing routes to the CHECKPOINT file when one is given.
+    The fallback browser uses the PROFILE browser profile, with its
+    user data directory under PROFILE_DIR. With a SINK every route
+    is handed to it and the DATA stay empty.
+
+    Returns a list of (task index, DATA) pairs and the throughput
+    statistics, in the same shape as scraper.run_tasks().
+    """
+
+    START = time.perf_counter()
+
+    STORE = open_store(CHECKPOINT, TTL)
+
+    METRICS = Metrics()
+
+    RESULTS, PENDING, ROUTES, BUSES = asyncio.run(
+        scrap_states(LINKS, concurrency, STORE, METRICS, SINK)
+    )
+
+    STATS = {
+        'worker': 'http', 'tasks': len(LINKS), 'routes': ROUTES,
+        'buses': BUSES, 'http_routes': ROUTES, 'browser_pages': 0,
+        'http_seconds': time.perf_counter() - START
+    }
+
+    BROWSER = BrowserFallback(
+        METRICS, PROFILE,
+        os.path.join(PROFILE_DIR, 'fallback') if PROFILE_DIR else None
+    )
+
+    try:
+
+        for (INDEX, DATA), STATE_PENDING in zip(RESULTS, PENDING):
+
+            try:
+
+                VISITED, BUSES = run_fallback(
+                    BROWSER, DATA, STATE_PENDING, STORE, SINK
+                )
+
+                STATS['routes'] += VISITED
+
+                STATS['buses'] += BUSES
+
+            except Exception:
+
+                LOGGER.exception("Browser fallback failed for task %s", INDEX)
+
+    finally:
+
+        BROWSER.quit()
+
+        if STORE is not None:
+
+            STATS['checkpoint'] = dict(STORE.stats)
+
+            STORE.close()
+
+    STATS['browser_pages'] = BROWSER.pages
+
+    STATS['seconds'] = time.perf_counter() - START
+
+    STATS['browser_seconds'] = STATS['seconds'] - STATS['http_seconds']
+
+    STATS['waits'] = BROWSER.report()
+
+    STATS['metrics'] = METRICS.snapshot()
+
+    LOGGER.info(
+        "HTTP engine: %s routes over HTTP, %s pages through the browser",
+        STATS['http_routes'], STATS['browser_pages']
+    )
+
+    return RESULTS, STATS
@@ -0,0 +1,455 @@
+"""
+Ingestion entry point: scrape RedBus and load the result
+
+The dashboard used to scrape and rebuild the database at the top of
+the Streamlit script, so a cold start blocked the first visitor behind
+a full crawl. Scraping and loading now live here, and the dashboard
+only reads whatever snapshot was loaded last.
+
+Usage:
+    python ingest.py                 # scrape and load once
+    python ingest.py --every 86400   # keep running, once a day
+
+Every option defaults to its REDBUS_* environment variable (see the
+README), so the same configuration works for both modes.
+
+Each scrape is kept as a versioned Parquet snapshot and then loaded
+into the storage the dashboard serves from: MySQL (upserted in place)
+or an embedded DuckDB/SQLite file (rebuilt from the scrape), so the
+whole app can run with no database server.
+
+With --stream (MySQL only) every scraped route goes straight to a
+background writer that upserts it in batches while the scrape goes on
+(see stream), so memory stays flat and the first states are served
+long before the run ends. No Parquet snapshot is kept in that mode,
+since the whole scrape is never held in memory.
+
+The scrape's phase timings, counters and route spans (see metrics) can
+be appended to a JSON lines file per run, and served cumulatively in
+the Prometheus text format at /metrics while the process runs.
+
+Modules used:
+- argparse: for the command line
+- logging: for progress and error reporting
+- os: for reading runtime configuration
+- time: for retry delays and scheduling
+- scraper: for scraping
+- loader: for incremental loading into MySQL
+- db: for the database connection settings
+- storage: for Parquet snapshots and embedded storage files
+- metrics: for scrape instrumentation export
+- stream: for streaming routes into MySQL during the scrape
+"""
+import argparse
+
+import logging
+
+import os
+
+import time
+
+import db
+
+import loader
+
+import metrics
+
+import scraper
+
+import storage
+
+import stream
+
+LOGGER = logging.getLogger("ingest")
+
+# Number of worker processes (each with its own browser) used
+# for a scrape; 1 keeps the original sequential behaviour
+SCRAPE_WORKERS = int(os.environ.get("REDBUS_SCRAPE_WORKERS", "1"))
+
+# Scraping engine: "selenium" renders every page in Chrome, "http"
+# fetches pages concurrently and only uses Chrome where JS is needed
+SCRAPE_ENGINE = os.environ.get("REDBUS_SCRAPE_ENGINE", "selenium")
+
+# Chrome profile: "default" is a plain, visible Chrome; "lean"
+# (opt-in) runs headless with eager page loads and blocks images,
+# fonts, media and trackers
+BROWSER_PROFILE = os.environ.get("REDBUS_BROWSER_PROFILE", "default")
+
+# Directory of the warm per-worker browser profiles; empty (the
+# default) starts every browser with a fresh temporary profile
+BROWSER_DIR = os.environ.get("REDBUS_BROWSER_DIR", "")
+
+# Requests in flight at once for the http engine
+HTTP_CONCURRENCY = int(os.environ.get("REDBUS_HTTP_CONCURRENCY", "32"))
+
+# SQLite file recording completed routes, so that an interrupted
+# scrape resumes and recently scraped routes are not scraped again
+CHECKPOINT_PATH = os.environ.get("REDBUS_CHECKPOINT", "")
+
+# Seconds a checkpointed route stays fresh
+CHECKPOINT_TTL = float(os.environ.get("REDBUS_CHECKPOINT_TTL", "43200"))
+
+# Seconds between runs in scheduler mode; 0 runs once
+INGEST_EVERY = float(os.environ.get("REDBUS_INGEST_EVERY", "0"))
+
+# Storage loaded by each run ("mysql", "duckdb" or "sqlite"), and
+# the embedded file for the latter two; shared with the dashboard
+STORAGE_BACKEND = os.environ.get("REDBUS_STORAGE", "mysql")
+
+STORAGE_PATH = os.environ.get("REDBUS_STORAGE_PATH", "busgrid.duckdb")
+
+# Directory of the versioned Parquet snapshots; off unless one
+# is given
+SNAPSHOT_DIR = os.environ.get("REDBUS_SNAPSHOT_DIR", "")
+
+# JSON lines file receiving every run's route spans and metric
+# summary; empty disables it
+METRICS_LOG = os.environ.get("REDBUS_METRICS_LOG", "")
+
+# Port of the Prometheus-style /metrics endpoint; 0 disables it
+METRICS_PORT = int(os.environ.get("REDBUS_METRICS_PORT", "0"))
+
+# Metrics of every run of this process, served at /metrics
+REGISTRY = metrics.Metrics()
+
+# Attempts at loading a scrape before the run is failed
+LOAD_ATTEMPTS = 3
+
+# Connections writing staging chunks in parallel, and rows per chunk
+LOAD_WORKERS = int(
+    os.environ.get("REDBUS_LOAD_WORKERS", str(loader.WRITE_WORKERS))
+)
+
+LOAD_CHUNK_SIZE = int(
+    os.environ.get("REDBUS_LOAD_CHUNK_SIZE", str(loader.CHUNK_SIZE))
+)
+
+# Load routes into MySQL while scraping instead of after the scrape,
+# in batches of about this many rows
+STREAM = os.environ.get("REDBUS_STREAM", "0") == "1"
+
+STREAM_BATCH_ROWS = int(
+    os.environ.get("REDBUS_STREAM_BATCH_ROWS", str(stream.BATCH_ROWS))
+)
+
+
+def load(df, workers=LOAD_WORKERS, chunk_size=LOAD_CHUNK_SIZE):
+
+    """
+    Upserts a scraped DataFrame into bus_routes, retrying
+    a failed load (the upsert is idempotent). Buses are only
+    removed from the routes listed in df.attrs['scraped_routes'].
+    """
+
+    db.create_database()
+
+    ENGINE = db.make_engine()
+
+    try:
+
+        for ATTEMPT in range(1, LOAD_ATTEMPTS + 1):
+
+            try:
+
+                return loader.upsert_routes(
+                    ENGINE, df, chunk_size=chunk_size, workers=workers,
+                    routes=df.attrs.get('scraped_routes')
+                )
+
+            except Exception:
+
+                if ATTEMPT == LOAD_ATTEMPTS:
+
+                    raise
+
+                LOGGER.warning(
+                    "Load attempt %s failed, retrying", ATTEMPT, exc_info=True
+                )
+
+                time.sleep(5)
+
+    finally:
+
+        ENGINE.dispose()
+
+
+def export_metrics(args, RUN_METRICS, BUSES):
+
+    """
+    Appends a run's spans and summary to the metrics log and adds
+    its counters and histograms to the /metrics registry.
+    """
+
+    RUN_METRICS.incr('runs')
+
+    if args.metrics_log:
+
+        RUN_METRICS.write_jsonl(
+            args.metrics_log,
+            run=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            engine=args.engine,
+            buses=BUSES
+        )
+
+    # Spans are only logged, the endpoint keeps the aggregates
+    REGISTRY.merge({**RUN_METRICS.snapshot(), 'spans': []})
+
+
+def ingest_streaming(args):
+
+    """
+    Scrapes every state while a background writer upserts
+    the finished routes into MySQL.
+    """
+
+    START = time.perf_counter()
+
+    RUN_METRICS = metrics.Metrics()
+
+    db.create_database()
+
+    ENGINE = db.make_engine()
+
+    WRITER = stream.RouteWriter(
+        ENGINE, batch_rows=args.stream_batch_rows,
+        chunk_size=args.chunk_size, workers=args.load_workers
+    ).start()
+
+    try:
+
+        with RUN_METRICS.timer('scrape'):
+
+            df = scraper.scrap_redbus_data(
+                workers=args.workers,
+                engine=args.engine,
+                concurrency=args.concurrency,
+                checkpoint=args.checkpoint,
+                ttl=args.ttl,
+                metrics=RUN_METRICS,
+                browser=args.browser,
+                browser_dir=args.browser_dir,
+                sink=WRITER.put
+            )
+
+    finally:
+
+        # Loads the routes still queued, even after a failed scrape
+        COUNTS = WRITER.close()
+
+        ENGINE.dispose()
+
+    BUSES = sum(S['buses'] for S in df.attrs['worker_stats'])
+
+    LOGGER.info("Scraped and streamed %s buses", BUSES)
+
+    export_metrics(args, RUN_METRICS, BUSES)
+
+    LOGGER.info(
+        "Ingestion finished in %.1fs", time.perf_counter() - START
+    )
+
+    return COUNTS
+
+
+def ingest_once(args):
+
+    """
+    Scrapes every state and loads the result.
+    """
+
+    if args.stream:
+
+        if args.storage != "mysql":
+
+            raise ValueError("--stream needs --storage mysql")
+
+        return ingest_streaming(args)
+
+    START = time.perf_counter()
+
+    RUN_METRICS = metrics.Metrics()
+
+    with RUN_METRICS.timer('scrape'):
+
+        df = scraper.scrap_redbus_data(
+            workers=args.workers,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            checkpoint=args.checkpoint,
+            ttl=args.ttl,
+            metrics=RUN_METRICS,
+            browser=args.browser,
+            browser_dir=args.browser_dir
+        )
+
+    LOGGER.info("Scraped %s buses", len(df))
+
+    if args.snapshot_dir:
+
+        LOGGER.info(
+            "Wrote snapshot %s",
+            storage.write_parquet(df, args.snapshot_dir)
+        )
+
+    export_metrics(args, RUN_METRICS, len(df))
+
+    if args.storage == "mysql":
+
+        COUNTS = load(df, args.load_workers, args.chunk_size)
+
+    else:
+
+        VERSION = storage.build_embedded(
+            df, args.storage_path, args.storage
+        )
+
+        LOGGER.info(
+            "Published version %s to %s", VERSION, args.storage_path
+        )
+
+        COUNTS = {'version': VERSION, 'rows': len(df)}
+
+    LOGGER.info(
+        "Ingestion finished in %.1fs", time.perf_counter() - START
+    )
+
+    return COUNTS
+
+
+def parse_args(argv=None):
+
+    PARSER = argparse.ArgumentParser(
+        description="Scrape RedBus and load the buses."
+    )
+
+    PARSER.add_argument(
+        "--workers", type=int, default=SCRAPE_WORKERS,
+        help="worker processes (browsers) for the selenium engine"
+    )
+
+    PARSER.add_argument(
+        "--engine", choices=["selenium", "http"], default=SCRAPE_ENGINE,
+        help="scraping engine"
+    )
+
+    PARSER.add_argument(
+        "--browser", choices=["lean", "default"], default=BROWSER_PROFILE,
+        help="Chrome profile used by the browser"
+    )
+
+    PARSER.add_argument(
+        "--browser-dir", default=BROWSER_DIR,
+        help="directory of warm browser profiles (none by default)"
+    )
+
+    PARSER.add_argument(
+        "--concurrency", type=int, default=HTTP_CONCURRENCY,
+        help="requests in flight for the http engine"
+    )
+
+    PARSER.add_argument(
+        "--checkpoint", default=CHECKPOINT_PATH,
+        help="SQLite checkpoint file (empty disables checkpointing)"
+    )
+
+    PARSER.add_argument(
+        "--ttl", type=float, default=CHECKPOINT_TTL,
+        help="seconds a checkpointed route stays fresh"
+    )
+
+    PARSER.add_argument(
+        "--storage", choices=list(storage.BACKENDS), default=STORAGE_BACKEND,
+        help="storage to load: MySQL or an embedded DuckDB/SQLite file"
+    )
+
+    PARSER.add_argument(
+        "--storage-path", default=STORAGE_PATH,
+        help="embedded storage file for --storage duckdb/sqlite"
+    )
+
+    PARSER.add_argument(
+        "--snapshot-dir", default=SNAPSHOT_DIR,
+        help="directory of Parquet snapshots (none by default)"
+    )
+
+    PARSER.add_argument(
+        "--load-workers", type=int, default=LOAD_WORKERS,
+        help="connections writing staging chunks in parallel"
+    )
+
+    PARSER.add_argument(
+        "--chunk-size", type=int, default=LOAD_CHUNK_SIZE,
+        help="rows per bulk INSERT chunk"
+    )
+
+    PARSER.add_argument(
+        "--stream", action=argparse.BooleanOptionalAction, default=STREAM,
+        help="load routes into MySQL while scraping"
+    )
+
+    PARSER.add_argument(
+        "--stream-batch-rows", type=int, default=STREAM_BATCH_ROWS,
+        help="rows per streamed load batch"
+    )
+
+    PARSER.add_argument(
+        "--metrics-log", default=METRICS_LOG,
+        help="JSON lines file for route spans and metric summaries"
+    )
+
+    PARSER.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT,
+        help="serve Prometheus-style metrics at /metrics on this port"
+    )
+
+    PARSER.add_argument(
+        "--every", type=float, default=INGEST_EVERY,
+        help="keep running and ingest every this many seconds"
+    )
+
+    return PARSER.parse_args(argv)
+
+
+def main(argv=None):
+
+    args = parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(name)s %(levelname)s %(message)s"
+    )
+
+    if args.metrics_port:
+
+        metrics.serve_metrics(REGISTRY, args.metrics_port)
+
+        LOGGER.info("Serving metrics on :%s/metrics", args.metrics_port)
+
+    if not args.every:
+
+        ingest_once(args)
+
+        return
+
+    # Scheduler mode: a failed run is logged and retried on
+    # the next tick instead of stopping the scheduler
+    while True:
+
+        START = time.monotonic()
+
+        try:
+
+            ingest_once(args)
+
+        except Exception:
+
+            LOGGER.exception("Ingestion run failed")
+
+            REGISTRY.incr('runs_failed')
+
+        time.sleep(max(0, args.every - (time.monotonic() - START)))
+
+
+if __name__ == "__main__":
+
+    main()
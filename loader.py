@@ -0,0 +1,889 @@
+"""
+Incremental loading of scraped bus data into MySQL/TiDB
+
+The app used to drop and recreate the whole Redbusdata database on
+every run, rewrite every row with to_sql(if_exists='replace') and then
+rebuild the table with ALTER TABLE statements. This module keeps a
+persistent star schema, created once with its final column types:
+
+- dimension tables with integer surrogate keys: states, routes (state,
+  route name and link), operators (bus name and the is_government
+  flag) and bus_types (bus type and its is_ac, is_sleeper, ... flags),
+- a narrow bus_routes fact table holding only those keys and the bus
+  values (times, duration, rating, price, seats), with a unique natural
+  key (route_id, operator_id, departing_time).
+
+The names, links and flags are stored once per dimension row instead
+of once per bus, so the fact table and its indexes are mostly small
+integers. A (route_id, price) index serves the route page, and the
+dashboard reads the buses by joining the dimensions on their keys.
+The scraped frame already holds the final types (see normalize), so
+values are written as-is and no table is rebuilt with ALTER TABLE.
+
+A load writes the scrape into a staging table with bulk_insert(): the
+rows are split into chunks that are written in parallel over several
+pooled connections as multi-row INSERT statements. A failed chunk is
+retried on its own; the insert upserts on the natural key, so a retry
+after a lost acknowledgement cannot duplicate rows. If a chunk still
+fails the load stops before bus_routes is touched. Then, inside one
+transaction:
+- adds the states, routes, operators and bus types seen for the first
+  time and resolves the staged rows to their dimension keys,
+- updates the rows whose natural key exists but whose values changed,
+- inserts the rows whose natural key is new,
+- deletes the rows of the scraped routes that are no longer listed.
+The caller passes the links of the routes it scraped completely, so a
+route that failed keeps its stored buses and a route that now lists
+no bus loses them, although neither has a staged row.
+Unchanged rows are not written, so write volume follows the change
+rather than the size of the table.
+
+The same transaction rebuilds the route_summary rows of the scraped
+routes: one row per (state, route_name) with the bus count, price
+range and median, average rating, total seats and first and last
+departure, so the navigation pages never scan the fact table.
+
+A load that changes anything also records a new row in the snapshots
+table. Its version number identifies the data currently published, so
+readers can key in-process caches on it (see snapshot_version).
+
+Modules used:
+- logging: for reporting what a load changed
+- time: for throughput timing and retry delays
+- concurrent.futures: for writing chunks in parallel
+- pandas: for preparing the staged rows
+- sqlalchemy: for executing the load statements
+"""
+import logging
+
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from sqlalchemy import bindparam, text
+
+LOGGER = logging.getLogger(__name__)
+
+TABLE = 'bus_routes'
+
+STATES_TABLE = 'states'
+
+ROUTES_TABLE = 'routes'
+
+OPERATORS_TABLE = 'operators'
+
+BUS_TYPES_TABLE = 'bus_types'
+
+STAGING_TABLE = 'bus_routes_staging'
+
+SNAPSHOT_TABLE = 'snapshots'
+
+SUMMARY_TABLE = 'route_summary'
+
+# Columns identifying one bus on one route in a scrape
+NATURAL_KEY = ['route_link', 'busname', 'departing_time']
+
+# Columns of a scrape written to the staging table, in table order
+COLUMNS = [
+    'state',
+    'route_name',
+    'route_link',
+    'busname',
+    'bustype',
+    'departing_time',
+    'duration',
+    'reaching_time',
+    'star_rating',
+    'price',
+    'seats_available',
+    'is_ac',
+    'is_non_ac',
+    'is_sleeper',
+    'is_seater',
+    'is_luxury',
+    'is_electric',
+    'is_government'
+]
+
+# Flags stored on the bus_types and operators dimensions
+BUSTYPE_FLAG_COLUMNS = [
+    'is_ac', 'is_non_ac', 'is_sleeper', 'is_seater', 'is_luxury',
+    'is_electric'
+]
+
+OPERATOR_FLAG_COLUMNS = ['is_government']
+
+# Columns of the bus_routes fact table, in table order
+FACT_COLUMNS = [
+    'route_id',
+    'operator_id',
+    'bustype_id',
+    'departing_time',
+    'duration',
+    'reaching_time',
+    'star_rating',
+    'price',
+    'seats_available'
+]
+
+# Columns identifying one bus on one route in bus_routes
+FACT_KEY = ['route_id', 'operator_id', 'departing_time']
+
+VALUE_COLUMNS = [C for C in FACT_COLUMNS if C not in FACT_KEY]
+
+# Stored as the table comment; a table with another version
+# is dropped and recreated by ensure_schema()
+SCHEMA_VERSION = 'bus_routes v5'
+
+# Rows per multi-row INSERT, connections writing chunks at once,
+# and attempts per chunk before the load fails
+CHUNK_SIZE = 1000
+
+WRITE_WORKERS = 4
+
+CHUNK_ATTEMPTS = 3
+
+# Columns holding a time of day
+TIME_COLUMNS = ['departing_time', 'reaching_time']
+
+CREATE_STATES_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {STATES_TABLE} (
+        state_id INT NOT NULL AUTO_INCREMENT,
+        state VARCHAR(64) NOT NULL,
+        PRIMARY KEY (state_id),
+        UNIQUE KEY state (state)
+    )
+"""
+
+CREATE_ROUTES_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {ROUTES_TABLE} (
+        route_id INT NOT NULL AUTO_INCREMENT,
+        state_id INT NOT NULL,
+        route_name VARCHAR(255) NOT NULL,
+        route_link VARCHAR(255) NOT NULL,
+        PRIMARY KEY (route_id),
+        UNIQUE KEY route_link (route_link),
+        KEY state_route (state_id, route_name)
+    )
+"""
+
+CREATE_OPERATORS_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {OPERATORS_TABLE} (
+        operator_id INT NOT NULL AUTO_INCREMENT,
+        busname VARCHAR(255) NOT NULL,
+        is_government BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (operator_id),
+        UNIQUE KEY busname (busname)
+    )
+"""
+
+CREATE_BUS_TYPES_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {BUS_TYPES_TABLE} (
+        bustype_id INT NOT NULL AUTO_INCREMENT,
+        bustype VARCHAR(255) NOT NULL,
+        is_ac BOOLEAN NOT NULL DEFAULT FALSE,
+        is_non_ac BOOLEAN NOT NULL DEFAULT FALSE,
+        is_sleeper BOOLEAN NOT NULL DEFAULT FALSE,
+        is_seater BOOLEAN NOT NULL DEFAULT FALSE,
+        is_luxury BOOLEAN NOT NULL DEFAULT FALSE,
+        is_electric BOOLEAN NOT NULL DEFAULT FALSE,
+        PRIMARY KEY (bustype_id),
+        UNIQUE KEY bustype (bustype)
+    )
+"""
+
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        id BIGINT NOT NULL AUTO_INCREMENT,
+        route_id INT NOT NULL,
+        operator_id INT NOT NULL,
+        bustype_id INT NOT NULL,
+        departing_time TIME,
+        duration SMALLINT COMMENT 'minutes',
+        reaching_time TIME,
+        star_rating FLOAT,
+        price DECIMAL(10,2),
+        seats_available SMALLINT,
+        PRIMARY KEY (id),
+        UNIQUE KEY natural_key (route_id, operator_id, departing_time),
+        KEY route_price (route_id, price)
+    ) COMMENT = '{SCHEMA_VERSION}'
+"""
+
+# The scrape as staged, with the dimension keys filled in
+# during the load
+CREATE_STAGING_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {STAGING_TABLE} (
+        id BIGINT NOT NULL AUTO_INCREMENT,
+        state VARCHAR(64),
+        route_name VARCHAR(255),
+        route_link VARCHAR(255),
+        busname VARCHAR(255),
+        bustype VARCHAR(255),
+        departing_time TIME,
+        duration SMALLINT,
+        reaching_time TIME,
+        star_rating FLOAT,
+        price DECIMAL(10,2),
+        seats_available SMALLINT,
+        is_ac BOOLEAN NOT NULL DEFAULT FALSE,
+        is_non_ac BOOLEAN NOT NULL DEFAULT FALSE,
+        is_sleeper BOOLEAN NOT NULL DEFAULT FALSE,
+        is_seater BOOLEAN NOT NULL DEFAULT FALSE,
+        is_luxury BOOLEAN NOT NULL DEFAULT FALSE,
+        is_electric BOOLEAN NOT NULL DEFAULT FALSE,
+        is_government BOOLEAN NOT NULL DEFAULT FALSE,
+        route_id INT,
+        operator_id INT,
+        bustype_id INT,
+        PRIMARY KEY (id),
+        UNIQUE KEY natural_key (route_link, busname, departing_time)
+    )
+"""
+
+CREATE_SNAPSHOT_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+        version BIGINT NOT NULL AUTO_INCREMENT,
+        loaded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        staged INT NOT NULL,
+        updated INT NOT NULL,
+        inserted INT NOT NULL,
+        deleted INT NOT NULL,
+        PRIMARY KEY (version)
+    )
+"""
+
+CREATE_SUMMARY_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        state VARCHAR(64) NOT NULL,
+        route_name VARCHAR(255) NOT NULL,
+        route_link VARCHAR(255),
+        bus_count INT NOT NULL,
+        min_price DECIMAL(10,2),
+        max_price DECIMAL(10,2),
+        median_price DECIMAL(10,2),
+        avg_rating FLOAT,
+        total_seats INT,
+        earliest_departure TIME,
+        latest_departure TIME,
+        PRIMARY KEY (state, route_name)
+    )
+"""
+
+SUMMARY_COLUMNS = [
+    'state', 'route_name', 'route_link', 'bus_count', 'min_price',
+    'max_price', 'median_price', 'avg_rating', 'total_seats',
+    'earliest_departure', 'latest_departure'
+]
+
+# Where each column of the old wide bus_routes table is read from
+# in the star schema (see bus_select)
+COLUMN_SOURCES = {
+    'id': 'b.id',
+    'state': 'd.state',
+    'route_name': 'r.route_name',
+    'route_link': 'r.route_link',
+    'busname': 'o.busname',
+    'bustype': 't.bustype',
+    **{C: f"b.{C}" for C in FACT_COLUMNS},
+    **{C: f"t.{C}" for C in BUSTYPE_FLAG_COLUMNS},
+    **{C: f"o.{C}" for C in OPERATOR_FLAG_COLUMNS}
+}
+
+
+def _key_match(LEFT, RIGHT):
+
+    """
+    Returns the null-safe join condition on the fact table's
+    natural key.
+    """
+
+    return ' AND '.join(
+        f"{LEFT}.{C} <=> {RIGHT}.{C}" for C in FACT_KEY
+    )
+
+
+def ensure_schema(conn):
+
+    """
+    Creates the dimension tables, bus_routes and its staging table
+    if they do not exist.
+
+    Tables from an older schema version (including the untyped
+    table of the old replace-on-every-run loader and the wide table
+    before the star schema) are dropped once and recreated; the next
+    load fills them again.
+    """
+
+    VERSION = conn.execute(text(
+        """
+        SELECT table_comment FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = :table
+        """
+    ), {'table': TABLE}).scalar()
+
+    if VERSION is not None and VERSION != SCHEMA_VERSION:
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_TABLE}"))
+
+        conn.execute(text(f"DROP TABLE IF EXISTS {SUMMARY_TABLE}"))
+
+        conn.execute(text(f"DROP TABLE {TABLE}"))
+
+        for NAME in (
+            ROUTES_TABLE, STATES_TABLE, OPERATORS_TABLE, BUS_TYPES_TABLE
+        ):
+
+            conn.execute(text(f"DROP TABLE IF EXISTS {NAME}"))
+
+    for CREATE in (
+        CREATE_STATES_TABLE, CREATE_ROUTES_TABLE, CREATE_OPERATORS_TABLE,
+        CREATE_BUS_TYPES_TABLE, CREATE_TABLE, CREATE_STAGING_TABLE
+    ):
+
+        conn.execute(text(CREATE))
+
+    conn.execute(text(CREATE_SNAPSHOT_TABLE))
+
+    conn.execute(text(CREATE_SUMMARY_TABLE))
+
+
+def snapshot_version(cursor):
+
+    """
+    Returns the version of the published data (0 before the
+    first load) using a DB-API cursor.
+    """
+
+    cursor.execute(
+        f"SELECT COALESCE(MAX(version), 0) FROM {SNAPSHOT_TABLE}"
+    )
+
+    return cursor.fetchone()[0]
+
+
+def _time_text(VALUE):
+
+    """
+    Formats a time of day (timedelta) as "HH:MM:SS" for a TIME
+    column, or returns None when it is missing.
+    """
+
+    if pd.isna(VALUE):
+
+        return None
+
+    SECONDS = int(pd.Timedelta(VALUE).total_seconds())
+
+    return f"{SECONDS // 3600:02d}:{SECONDS % 3600 // 60:02d}:00"
+
+
+def _none(VALUE):
+
+    """
+    Returns VALUE as a plain Python value, or None when missing.
+    """
+
+    if pd.isna(VALUE):
+
+        return None
+
+    return VALUE.item() if hasattr(VALUE, 'item') else VALUE
+
+
+def bus_select(COLUMNS):
+
+    """
+    Returns a SELECT of the given wide-table COLUMNS for every bus,
+    joining bus_routes to its dimensions on their integer keys.
+    The fact table is aliased b, so callers can add WHERE and
+    ORDER BY clauses (e.g. ORDER BY b.id).
+    """
+
+    return f"""
+        SELECT {', '.join(COLUMN_SOURCES[C] for C in COLUMNS)}
+        FROM {TABLE} b
+        JOIN {ROUTES_TABLE} r ON r.route_id = b.route_id
+        JOIN {STATES_TABLE} d ON d.state_id = r.state_id
+        JOIN {OPERATORS_TABLE} o ON o.operator_id = b.operator_id
+        JOIN {BUS_TYPES_TABLE} t ON t.bustype_id = b.bustype_id
+    """
+
+
+def summarize_routes(ROWS):
+
+    """
+    Returns one route_summary record (a dictionary) per
+    (state, route_name) of a DataFrame of bus_routes rows.
+    """
+
+    ROWS = ROWS.assign(
+        price=pd.to_numeric(ROWS['price']).astype(float),
+        star_rating=pd.to_numeric(ROWS['star_rating']).astype(float),
+        seats_available=pd.to_numeric(ROWS['seats_available']),
+        departing_time=pd.to_timedelta(ROWS['departing_time'])
+    )
+
+    SUMMARY = ROWS.groupby(['state', 'route_name'], sort=False).agg(
+        route_link=('route_link', 'first'),
+        bus_count=('route_link', 'size'),
+        min_price=('price', 'min'),
+        max_price=('price', 'max'),
+        median_price=('price', 'median'),
+        avg_rating=('star_rating', 'mean'),
+        total_seats=('seats_available', 'sum'),
+        earliest_departure=('departing_time', 'min'),
+        latest_departure=('departing_time', 'max')
+    ).reset_index()
+
+    RECORDS = []
+
+    for ROW in SUMMARY.to_dict('records'):
+
+        for COLUMN in ('earliest_departure', 'latest_departure'):
+
+            ROW[COLUMN] = _time_text(ROW[COLUMN])
+
+        RECORDS.append({C: _none(ROW[C]) for C in SUMMARY_COLUMNS})
+
+    return RECORDS
+
+
+def route_scope(conn, ROUTES=None):
+
+    """
+    Returns the route_id of every route whose buses a load replaces:
+    the routes of the staged rows and of the links in ROUTES, which
+    also covers routes that were scraped without any bus.
+    """
+
+    SCOPE = {
+        ROW[0] for ROW in conn.execute(text(
+            f"SELECT DISTINCT route_id FROM {STAGING_TABLE}"
+        ))
+    }
+
+    if ROUTES:
+
+        SCOPE.update(ROW[0] for ROW in conn.execute(
+            text(
+                f"SELECT route_id FROM {ROUTES_TABLE} "
+                f"WHERE route_link IN :links"
+            ).bindparams(bindparam('links', expanding=True)),
+            {'links': sorted(set(ROUTES))}
+        ))
+
+    return sorted(SCOPE)
+
+
+def refresh_summary(conn, SCOPE):
+
+    """
+    Rebuilds the route_summary rows of the routes in SCOPE (route_id
+    values, see route_scope) from bus_routes. A route left without
+    buses loses its row. Returns the number of routes refreshed.
+    """
+
+    RESULT = conn.execute(
+        text(
+            f"""
+            SELECT d.state, r.route_name, r.route_link, b.price,
+                b.star_rating, b.seats_available, b.departing_time
+            FROM {TABLE} b
+            JOIN {ROUTES_TABLE} r ON r.route_id = b.route_id
+            JOIN {STATES_TABLE} d ON d.state_id = r.state_id
+            WHERE b.route_id IN :scope
+            """
+        ).bindparams(bindparam('scope', expanding=True)),
+        {'scope': SCOPE}
+    )
+
+    ROWS = pd.DataFrame(RESULT.fetchall(), columns=list(RESULT.keys()))
+
+    conn.execute(
+        text(
+            f"""
+            DELETE s FROM {SUMMARY_TABLE} s
+            JOIN {ROUTES_TABLE} r ON s.route_name = r.route_name
+            JOIN {STATES_TABLE} d
+                ON d.state_id = r.state_id AND s.state = d.state
+            WHERE r.route_id IN :scope
+            """
+        ).bindparams(bindparam('scope', expanding=True)),
+        {'scope': SCOPE}
+    )
+
+    if ROWS.empty:
+
+        return 0
+
+    RECORDS = summarize_routes(ROWS)
+
+    conn.execute(text(
+        f"""
+        INSERT INTO {SUMMARY_TABLE} ({', '.join(SUMMARY_COLUMNS)})
+        VALUES ({', '.join(f":{C}" for C in SUMMARY_COLUMNS)})
+        """
+    ), RECORDS)
+
+    return len(RECORDS)
+
+
+def prepare_frame(df):
+
+    """
+    Returns the normalized rows to stage: the load columns only,
+    with rows repeating a natural key (a bus listed both in a
+    government group and in the main list) reduced to their last
+    occurrence, times of day as "HH:MM:SS" text for TIME columns
+    and categorical names as plain strings.
+    """
+
+    ROWS = df[COLUMNS].drop_duplicates(subset=NATURAL_KEY, keep='last')
+
+    ROWS = ROWS.copy()
+
+    for COLUMN in ROWS.select_dtypes('category'):
+
+        ROWS[COLUMN] = ROWS[COLUMN].astype(object)
+
+    for COLUMN in TIME_COLUMNS:
+
+        ROWS[COLUMN] = ROWS[COLUMN].map(_time_text).astype(object)
+
+    return ROWS
+
+
+def star_tables(ROWS):
+
+    """
+    Splits prepared rows (see prepare_frame) into the dimension
+    tables and the bus_routes fact table, numbering the dimension
+    rows from 1. Returns a dictionary of table name -> DataFrame.
+    """
+
+    ROWS = ROWS.assign(
+        route_name=ROWS['route_name'].fillna(''),
+        bustype=ROWS['bustype'].fillna('')
+    )
+
+    STATES = pd.DataFrame({
+        'state': ROWS['state'].drop_duplicates().reset_index(drop=True)
+    })
+
+    STATES.insert(0, 'state_id', range(1, len(STATES) + 1))
+
+    ROUTES = ROWS.drop_duplicates('route_link', keep='last').merge(
+        STATES, on='state'
+    )[['state_id', 'route_name', 'route_link']].reset_index(drop=True)
+
+    ROUTES.insert(0, 'route_id', range(1, len(ROUTES) + 1))
+
+    OPERATORS = ROWS.drop_duplicates('busname')[
+        ['busname'] + OPERATOR_FLAG_COLUMNS
+    ].reset_index(drop=True)
+
+    OPERATORS.insert(0, 'operator_id', range(1, len(OPERATORS) + 1))
+
+    BUS_TYPES = ROWS.drop_duplicates('bustype')[
+        ['bustype'] + BUSTYPE_FLAG_COLUMNS
+    ].reset_index(drop=True)
+
+    BUS_TYPES.insert(0, 'bustype_id', range(1, len(BUS_TYPES) + 1))
+
+    FACT = (
+        ROWS.merge(ROUTES[['route_id', 'route_link']], on='route_link')
+        .merge(OPERATORS[['operator_id', 'busname']], on='busname')
+        .merge(BUS_TYPES[['bustype_id', 'bustype']], on='bustype')
+    )[FACT_COLUMNS].reset_index(drop=True)
+
+    FACT.insert(0, 'id', range(1, len(FACT) + 1))
+
+    return {
+        STATES_TABLE: STATES,
+        ROUTES_TABLE: ROUTES,
+        OPERATORS_TABLE: OPERATORS,
+        BUS_TYPES_TABLE: BUS_TYPES,
+        TABLE: FACT
+    }
+
+
+def resolve_dimensions(conn):
+
+    """
+    Adds the states, routes, operators and bus types of the staged
+    rows that are not in the dimension tables yet, and fills in the
+    staged rows' dimension keys. A route's name and state follow
+    its latest scrape.
+    """
+
+    conn.execute(text(
+        f"""
+        INSERT INTO {STATES_TABLE} (state)
+        SELECT DISTINCT s.state FROM {STAGING_TABLE} s
+        LEFT JOIN {STATES_TABLE} d ON d.state = s.state
+        WHERE d.state_id IS NULL
+        """
+    ))
+
+    conn.execute(text(
+        f"""
+        INSERT INTO {ROUTES_TABLE} (state_id, route_name, route_link)
+        SELECT MAX(d.state_id), MAX(COALESCE(s.route_name, '')),
+            s.route_link
+        FROM {STAGING_TABLE} s
+        JOIN {STATES_TABLE} d ON d.state = s.state
+        GROUP BY s.route_link
+        ON DUPLICATE KEY UPDATE
+            state_id = VALUES(state_id), route_name = VALUES(route_name)
+        """
+    ))
+
+    conn.execute(text(
+        f"""
+        INSERT INTO {OPERATORS_TABLE}
+        (busname, {', '.join(OPERATOR_FLAG_COLUMNS)})
+        SELECT s.busname,
+            {', '.join(f"MAX(s.{C})" for C in OPERATOR_FLAG_COLUMNS)}
+        FROM {STAGING_TABLE} s
+        LEFT JOIN {OPERATORS_TABLE} o ON o.busname = s.busname
+        WHERE o.operator_id IS NULL
+        GROUP BY s.busname
+        """
+    ))
+
+    conn.execute(text(
+        f"""
+        INSERT INTO {BUS_TYPES_TABLE}
+        (bustype, {', '.join(BUSTYPE_FLAG_COLUMNS)})
+        SELECT COALESCE(s.bustype, ''),
+            {', '.join(f"MAX(s.{C})" for C in BUSTYPE_FLAG_COLUMNS)}
+        FROM {STAGING_TABLE} s
+        LEFT JOIN {BUS_TYPES_TABLE} t
+            ON t.bustype = COALESCE(s.bustype, '')
+        WHERE t.bustype_id IS NULL
+        GROUP BY COALESCE(s.bustype, '')
+        """
+    ))
+
+    conn.execute(text(
+        f"""
+        UPDATE {STAGING_TABLE} s
+        JOIN {ROUTES_TABLE} r ON r.route_link = s.route_link
+        JOIN {OPERATORS_TABLE} o ON o.busname = s.busname
+        JOIN {BUS_TYPES_TABLE} t ON t.bustype = COALESCE(s.bustype, '')
+        SET s.route_id = r.route_id, s.operator_id = o.operator_id,
+            s.bustype_id = t.bustype_id
+        """
+    ))
+
+
+def bulk_insert(
+    engine, TABLE_NAME, ROWS, chunk_size=CHUNK_SIZE,
+    workers=WRITE_WORKERS, attempts=CHUNK_ATTEMPTS
+):
+
+    """
+    Writes a DataFrame into TABLE_NAME in chunks of chunk_size rows,
+    using up to workers pooled connections in parallel.
+
+    Each chunk is one transaction of multi-row INSERTs that upserts
+    on the table's unique keys, and is retried on its own up to
+    attempts times. Raises the last error of a chunk that never
+    succeeds. Returns the rows written and the rows per second.
+    """
+
+    COLUMNS = list(ROWS.columns)
+
+    RECORDS = [
+        tuple(_none(VALUE) for VALUE in ROW)
+        for ROW in ROWS.itertuples(index=False, name=None)
+    ]
+
+    UPDATES = [C for C in COLUMNS if C not in NATURAL_KEY] or COLUMNS[:1]
+
+    # executemany() turns this into multi-row INSERT statements
+    SQL = (
+        f"INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(COLUMNS))}) "
+        f"ON DUPLICATE KEY UPDATE "
+        f"{', '.join(f'{C} = VALUES({C})' for C in UPDATES)}"
+    )
+
+    CHUNKS = [
+        RECORDS[START:START + chunk_size]
+        for START in range(0, len(RECORDS), chunk_size)
+    ]
+
+    def write(CHUNK):
+
+        for ATTEMPT in range(1, attempts + 1):
+
+            CONN = engine.raw_connection()
+
+            try:
+
+                CURSOR = CONN.cursor()
+
+                CURSOR.executemany(SQL, CHUNK)
+
+                CURSOR.close()
+
+                CONN.commit()
+
+                return len(CHUNK)
+
+            except Exception:
+
+                try:
+
+                    CONN.rollback()
+
+                except Exception:
+
+                    pass
+
+                if ATTEMPT == attempts:
+
+                    raise
+
+                LOGGER.warning(
+                    "Chunk of %s rows failed (attempt %s), retrying",
+                    len(CHUNK), ATTEMPT, exc_info=True
+                )
+
+                time.sleep(2 ** ATTEMPT)
+
+            finally:
+
+                # Returns the connection to the engine's pool
+                CONN.close()
+
+    START = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as EXECUTOR:
+
+        WRITTEN = sum(EXECUTOR.map(write, CHUNKS))
+
+    SECONDS = time.perf_counter() - START
+
+    return {
+        'rows': WRITTEN,
+        'seconds': SECONDS,
+        'rows_per_sec': WRITTEN / SECONDS if SECONDS else 0.0
+    }
+
+
+def upsert_routes(
+    engine, df, chunk_size=CHUNK_SIZE, workers=WRITE_WORKERS, routes=None
+):
+
+    """
+    Loads the scraped DataFrame into bus_routes, writing only new,
+    changed and removed rows.
+
+    routes lists the links of the routes scraped completely, those
+    without buses included; only buses of these routes and of the
+    staged rows are removed. Leave a route that failed out of both.
+
+    Returns a dictionary with the number of rows staged, updated,
+    inserted and deleted, and the staging rows per second.
+    """
+
+    ROWS = prepare_frame(df)
+
+    with engine.begin() as conn:
+
+        ensure_schema(conn)
+
+        conn.execute(text(f"DELETE FROM {STAGING_TABLE}"))
+
+    # Stage the scrape; the rows are already typed, so this is
+    # a plain parallel write into the final column types
+    STAGED = bulk_insert(
+        engine, STAGING_TABLE, ROWS, chunk_size=chunk_size, workers=workers
+    )
+
+    COUNTS = {
+        'staged': len(ROWS),
+        'stage_rows_per_sec': round(STAGED['rows_per_sec'], 1)
+    }
+
+    with engine.begin() as conn:
+
+        # Dimension keys of the staged rows
+        resolve_dimensions(conn)
+
+        # Rows whose values changed since the last load
+        COUNTS['updated'] = conn.execute(text(
+            f"""
+            UPDATE {TABLE} b JOIN {STAGING_TABLE} s
+                ON {_key_match('b', 's')}
+            SET {', '.join(f"b.{C} = s.{C}" for C in VALUE_COLUMNS)}
+            WHERE NOT ({' AND '.join(
+                f"b.{C} <=> s.{C}" for C in VALUE_COLUMNS
+            )})
+            """
+        )).rowcount
+
+        # Rows seen for the first time
+        COUNTS['inserted'] = conn.execute(text(
+            f"""
+            INSERT INTO {TABLE} ({', '.join(FACT_COLUMNS)})
+            SELECT {', '.join(f"s.{C}" for C in FACT_COLUMNS)}
+            FROM {STAGING_TABLE} s
+            LEFT JOIN {TABLE} b ON {_key_match('b', 's')}
+            WHERE b.id IS NULL
+            """
+        )).rowcount
+
+        SCOPE = route_scope(conn, routes)
+
+        COUNTS['deleted'] = 0
+
+        # Buses no longer listed on a route that was just scraped
+        if SCOPE:
+
+            COUNTS['deleted'] = conn.execute(
+                text(
+                    f"""
+                    DELETE b FROM {TABLE} b
+                    LEFT JOIN {STAGING_TABLE} s ON {_key_match('b', 's')}
+                    WHERE b.route_id IN :scope AND s.id IS NULL
+                    """
+                ).bindparams(bindparam('scope', expanding=True)),
+                {'scope': SCOPE}
+            ).rowcount
+
+        # Route statistics of the scraped routes
+        CHANGED = (
+            COUNTS['updated'] or COUNTS['inserted'] or COUNTS['deleted']
+        )
+
+        if CHANGED:
+
+            COUNTS['summarized'] = refresh_summary(conn, SCOPE)
+
+        conn.execute(text(f"DELETE FROM {STAGING_TABLE}"))
+
+        # Publish a new snapshot version when the data changed
+        if CHANGED:
+
+            conn.execute(text(
+                f"""
+                INSERT INTO {SNAPSHOT_TABLE}
+                (staged, updated, inserted, deleted)
+                VALUES (:staged, :updated, :inserted, :deleted)
+                """
+            ), COUNTS)
+
+    LOGGER.info(
+        "Loaded %s: %s staged (%.0f rows/s), %s updated, %s inserted, "
+        "%s deleted",
+        TABLE, COUNTS['staged'], COUNTS['stage_rows_per_sec'],
+        COUNTS['updated'], COUNTS['inserted'], COUNTS['deleted']
+    )
+
+    return COUNTS
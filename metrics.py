@@ -0,0 +1,391 @@
+"""
+Scraper instrumentation: counters, timing histograms and route spans
+
+A slow refresh used to leave no trace of where the time went. Metrics
+collects, per scraping process:
+
+- counters, e.g. routes attempted / skipped / failed, buses extracted,
+  scroll iterations and wait timeouts,
+- timing histograms per phase (driver.get, scroll, waits by kind,
+  extraction, HTTP fetches),
+- one span per route with its state, outcome, bus count and duration,
+  so outlier states and routes can be found.
+
+Worker processes return snapshot() with their statistics and the parent
+folds them together with merge(). A run can be exported as JSON lines
+(write_jsonl: one line per span plus a summary line) and in the
+Prometheus text format (prometheus_text, served by serve_metrics).
+
+Modules used:
+- json / threading / time: for thread-safe recording and export
+- contextlib: for timing phases with a with block
+- http.server: for the Prometheus-style text endpoint
+"""
+import json
+
+import threading
+
+import time
+
+from contextlib import contextmanager
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+# Prefix of every exported metric name
+PREFIX = 'redbus_scrape'
+
+
+def escape(VALUE):
+
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+
+    return (
+        str(VALUE).replace('\\', '\\\\')
+        .replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _key(NAME, LABELS):
+
+    return NAME, tuple(sorted(LABELS.items()))
+
+
+class Metrics:
+
+    """
+    Thread-safe registry of counters, histograms and spans.
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+
+        # (name, labels) -> value
+        self.counters = {}
+
+        # (name, labels) -> [bucket counts, sum, count]
+        self.histograms = {}
+
+        self.spans = []
+
+    def incr(self, NAME, VALUE=1, **LABELS):
+
+        """
+        Adds VALUE to a counter.
+        """
+
+        KEY = _key(NAME, LABELS)
+
+        with self.lock:
+
+            self.counters[KEY] = self.counters.get(KEY, 0) + VALUE
+
+    def observe(self, NAME, SECONDS, **LABELS):
+
+        """
+        Records one duration in a histogram.
+        """
+
+        KEY = _key(NAME, LABELS)
+
+        with self.lock:
+
+            if KEY not in self.histograms:
+
+                self.histograms[KEY] = [[0] * len(BUCKETS), 0.0, 0]
+
+            HISTOGRAM = self.histograms[KEY]
+
+            for I, BOUND in enumerate(BUCKETS):
+
+                if SECONDS <= BOUND:
+
+                    HISTOGRAM[0][I] += 1
+
+                    break
+
+            HISTOGRAM[1] += SECONDS
+
+            HISTOGRAM[2] += 1
+
+    @contextmanager
+    def timer(self, PHASE, **LABELS):
+
+        """
+        Times a with block into the phase_seconds histogram.
+        """
+
+        START = time.perf_counter()
+
+        try:
+
+            yield
+
+        finally:
+
+            self.observe(
+                'phase_seconds', time.perf_counter() - START,
+                phase=PHASE, **LABELS
+            )
+
+    def record_span(self, NAME, SECONDS, START=None, **ATTRIBUTES):
+
+        """
+        Records a span timed by the caller.
+        """
+
+        SPAN = dict(ATTRIBUTES)
+
+        SPAN['name'] = NAME
+
+        SPAN['start'] = time.time() - SECONDS if START is None else START
+
+        SPAN['seconds'] = round(SECONDS, 4)
+
+        with self.lock:
+
+            self.spans.append(SPAN)
+
+    @contextmanager
+    def span(self, NAME, **ATTRIBUTES):
+
+        """
+        Records a with block as a span. The yielded dictionary can
+        be updated with attributes known only at the end (outcome,
+        bus count); an exception sets the outcome to "error".
+        """
+
+        SPAN = dict(ATTRIBUTES)
+
+        START, WALL = time.perf_counter(), time.time()
+
+        try:
+
+            yield SPAN
+
+        except BaseException:
+
+            SPAN['outcome'] = 'error'
+
+            raise
+
+        finally:
+
+            self.record_span(
+                NAME, time.perf_counter() - START, WALL, **SPAN
+            )
+
+    def snapshot(self):
+
+        """
+        Returns a picklable, JSON-serializable copy of the registry.
+        """
+
+        with self.lock:
+
+            return {
+                'counters': [
+                    [NAME, dict(LABELS), VALUE]
+                    for (NAME, LABELS), VALUE in self.counters.items()
+                ],
+                'histograms': [
+                    [NAME, dict(LABELS), list(H[0]), H[1], H[2]]
+                    for (NAME, LABELS), H in self.histograms.items()
+                ],
+                'spans': list(self.spans)
+            }
+
+    def merge(self, SNAPSHOT):
+
+        """
+        Adds the values of another registry's snapshot to this one.
+        """
+
+        with self.lock:
+
+            for NAME, LABELS, VALUE in SNAPSHOT['counters']:
+
+                KEY = _key(NAME, LABELS)
+
+                self.counters[KEY] = self.counters.get(KEY, 0) + VALUE
+
+            for NAME, LABELS, COUNTS, TOTAL, COUNT in SNAPSHOT['histograms']:
+
+                KEY = _key(NAME, LABELS)
+
+                if KEY not in self.histograms:
+
+                    self.histograms[KEY] = [[0] * len(BUCKETS), 0.0, 0]
+
+                HISTOGRAM = self.histograms[KEY]
+
+                HISTOGRAM[0] = [A + B for A, B in zip(HISTOGRAM[0], COUNTS)]
+
+                HISTOGRAM[1] += TOTAL
+
+                HISTOGRAM[2] += COUNT
+
+            self.spans.extend(SNAPSHOT['spans'])
+
+    def summary(self):
+
+        """
+        Returns the counters and, per histogram, its count, total
+        and mean seconds, plus the slowest spans.
+        """
+
+        SNAPSHOT = self.snapshot()
+
+        return {
+            'counters': SNAPSHOT['counters'],
+            'histograms': [
+                [NAME, LABELS, COUNT, round(TOTAL, 3),
+                 round(TOTAL / COUNT, 4) if COUNT else 0.0]
+                for NAME, LABELS, _, TOTAL, COUNT in SNAPSHOT['histograms']
+            ],
+            'slowest': sorted(
+                SNAPSHOT['spans'], key=lambda S: -S['seconds']
+            )[:10]
+        }
+
+    def write_jsonl(self, PATH, **FIELDS):
+
+        """
+        Appends one JSON line per span and a summary line to PATH;
+        FIELDS (e.g. a run id) are added to every line.
+        """
+
+        SUMMARY = self.summary()
+
+        with open(PATH, 'a') as HANDLE:
+
+            for SPAN in self.snapshot()['spans']:
+
+                HANDLE.write(json.dumps({'type': 'span', **FIELDS, **SPAN}))
+
+                HANDLE.write('\n')
+
+            HANDLE.write(json.dumps({
+                'type': 'summary', **FIELDS,
+                'counters': SUMMARY['counters'],
+                'histograms': SUMMARY['histograms']
+            }))
+
+            HANDLE.write('\n')
+
+    def prometheus_text(self):
+
+        """
+        Renders the counters and histograms in the Prometheus
+        text exposition format.
+        """
+
+        SNAPSHOT = self.snapshot()
+
+        def labels(LABELS, **EXTRA):
+
+            PAIRS = {**LABELS, **EXTRA}
+
+            if not PAIRS:
+
+                return ''
+
+            return '{' + ','.join(
+                f'{K}="{escape(V)}"' for K, V in sorted(PAIRS.items())
+            ) + '}'
+
+        LINES, TYPED = [], set()
+
+        for NAME, LABELS, VALUE in sorted(
+            SNAPSHOT['counters'], key=lambda C: (C[0], sorted(C[1].items()))
+        ):
+
+            FULL = f"{PREFIX}_{NAME}_total"
+
+            if FULL not in TYPED:
+
+                LINES.append(f"# TYPE {FULL} counter")
+
+                TYPED.add(FULL)
+
+            LINES.append(f"{FULL}{labels(LABELS)} {VALUE}")
+
+        for NAME, LABELS, COUNTS, TOTAL, COUNT in sorted(
+            SNAPSHOT['histograms'],
+            key=lambda H: (H[0], sorted(H[1].items()))
+        ):
+
+            FULL = f"{PREFIX}_{NAME}"
+
+            if FULL not in TYPED:
+
+                LINES.append(f"# TYPE {FULL} histogram")
+
+                TYPED.add(FULL)
+
+            CUMULATIVE = 0
+
+            for BOUND, BUCKET in zip(BUCKETS, COUNTS):
+
+                CUMULATIVE += BUCKET
+
+                LE = '+Inf' if BOUND == float('inf') else f"{BOUND:g}"
+
+                LINES.append(
+                    f"{FULL}_bucket{labels(LABELS, le=LE)} {CUMULATIVE}"
+                )
+
+            LINES.append(f"{FULL}_sum{labels(LABELS)} {TOTAL:.6f}")
+
+            LINES.append(f"{FULL}_count{labels(LABELS)} {COUNT}")
+
+        return '\n'.join(LINES) + '\n'
+
+
+def serve_metrics(METRICS, port):
+
+    """
+    Serves METRICS.prometheus_text() at /metrics on port from a
+    background thread. Returns the server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+
+            if self.path.split('?')[0] != '/metrics':
+
+                self.send_error(404)
+
+                return
+
+            BODY = METRICS.prometheus_text().encode()
+
+            self.send_response(200)
+
+            self.send_header(
+                'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+            )
+
+            self.send_header('Content-Length', str(len(BODY)))
+
+            self.end_headers()
+
+            self.wfile.write(BODY)
+
+        def log_message(self, *args):
+
+            pass
+
+    SERVER = ThreadingHTTPServer(('', port), Handler)
+
+    SERVER.daemon_threads = True
+
+    threading.Thread(target=SERVER.serve_forever, daemon=True).start()
+
+    return SERVER
@@ -0,0 +1,237 @@
+"""
+Typed normalization of scraped bus data
+
+The scraper reads every field as page text. This module turns those
+strings into the types of the bus_routes table before loading, so the
+table can be written in a single pass with its final column types and
+no ALTER TABLE conversions afterwards:
+
+- departing_time, reaching_time: time of day as timedelta64
+  ("21:30" -> 21:30:00, a trailing date or "+1 day" is ignored)
+- duration: whole minutes as Int16 ("08h 15m" -> 495)
+- star_rating: float64 ("New" -> 3.0, missing -> 0.0)
+- price: float64 ("1,250" -> 1250.0)
+- seats_available: Int16 ("23 Seats left" -> 23)
+- state, route_name, route_link, busname, bustype: categoricals
+
+Values that cannot be parsed become missing rather than failing
+the whole load.
+
+It also materializes the bus-type and operator checks behind the
+dashboard's filter pills as boolean flag columns (is_ac, is_sleeper,
+is_government, ...), so the filters become equality predicates
+instead of LIKE scans. The flags follow the rules of the old LIKE
+filters exactly.
+
+compact_frame() gives every frame of bus rows, scraped or read back by
+the dashboard, the same compact layout: the few distinct names per
+column are dictionary-encoded as categoricals instead of one Python
+string per bus, and numbers and times are fixed-width arrays.
+
+Modules used:
+- pandas: for vectorized parsing
+"""
+import pandas as pd
+
+# Rating shown for buses that are too new to be rated
+NEW_RATING = 3.0
+
+TIME_PATTERN = r'(\d{1,2}):(\d{2})'
+
+DURATION_PATTERN = r'^\s*(?:(\d+)\s*h)?\s*(?:(\d+)\s*m)?'
+
+NUMBER_PATTERN = r'(\d+(?:\.\d+)?)'
+
+# Operator codes of the state transport corporations; a bus
+# whose name contains one of them is a government bus
+GOVT_OPERATORS = [
+    'APSRTC', 'KSRTC', 'TGSRTC', 'KTCL', 'RSRTC',
+    'SBSTC', 'HRTC', 'ASTC', 'UPSRTC', 'WBTC'
+]
+
+# Flag column -> substrings of the upper-cased bus type that set it
+BUSTYPE_FLAGS = {
+    'is_sleeper': ['SLEEP'],
+    'is_seater': ['SEAT'],
+    'is_luxury': ['LUXURY'],
+    'is_electric': ['ELECTRIC']
+}
+
+# Low-cardinality text columns stored as categoricals
+CATEGORY_COLUMNS = ['state', 'route_name', 'route_link', 'busname', 'bustype']
+
+# Key of a scraped DATA dictionary listing the links of the routes
+# it holds completely, routes without buses included
+SCRAPED_ROUTES = 'scraped_routes'
+
+# Whole-number columns, small enough for 16-bit integers
+SMALL_INT_COLUMNS = ['duration', 'seats_available']
+
+# Columns stored as float64
+FLOAT_COLUMNS = ['star_rating', 'price']
+
+FLAG_COLUMNS = [
+    'is_ac', 'is_non_ac', 'is_sleeper', 'is_seater',
+    'is_luxury', 'is_electric', 'is_government'
+]
+
+
+def parse_time(SERIES):
+
+    """
+    Parses "HH:MM" text into a timedelta64 time of day.
+    """
+
+    PARTS = SERIES.astype('string').str.extract(TIME_PATTERN).astype(float)
+
+    return pd.to_timedelta(PARTS[0] * 60 + PARTS[1], unit='m')
+
+
+def parse_duration(SERIES):
+
+    """
+    Parses "08h 15m" style text into whole minutes.
+    """
+
+    PARTS = SERIES.astype('string').str.extract(DURATION_PATTERN)
+
+    PARTS = PARTS.astype(float)
+
+    MINUTES = PARTS[0].fillna(0) * 60 + PARTS[1].fillna(0)
+
+    # Neither hours nor minutes found
+    MINUTES[PARTS[0].isna() & PARTS[1].isna()] = None
+
+    return MINUTES.round().astype('Int64')
+
+
+def parse_number(SERIES):
+
+    """
+    Parses the first number in text ("1,250" -> 1250.0).
+    """
+
+    TEXT = SERIES.astype('string').str.replace(',', '', regex=False)
+
+    return TEXT.str.extract(NUMBER_PATTERN)[0].astype(float)
+
+
+def parse_rating(SERIES):
+
+    """
+    Parses star ratings, mapping "New" to NEW_RATING and
+    missing ratings to 0.
+    """
+
+    TEXT = SERIES.astype('string').str.strip()
+
+    RATING = parse_number(TEXT)
+
+    RATING[TEXT.str.lower().eq('new').fillna(False)] = NEW_RATING
+
+    return RATING.fillna(0.0)
+
+
+def contains_any(SERIES, WORDS):
+
+    """
+    Returns a boolean mask of the values containing any of WORDS
+    (missing values never match).
+    """
+
+    MASK = pd.Series(False, index=SERIES.index)
+
+    for WORD in WORDS:
+
+        MASK |= SERIES.str.contains(WORD, regex=False).fillna(False)
+
+    return MASK.astype(bool)
+
+
+def add_flags(df):
+
+    """
+    Adds the boolean bus-type and operator flag columns.
+    """
+
+    BUSTYPE = df['bustype'].astype('string')
+
+    LOWER = BUSTYPE.str.lower()
+
+    UPPER = BUSTYPE.str.upper()
+
+    NON_AC = contains_any(LOWER, ['non'])
+
+    df['is_ac'] = contains_any(LOWER, ['ac', 'a/c', 'a.c']) & ~NON_AC
+
+    df['is_non_ac'] = NON_AC
+
+    for FLAG, WORDS in BUSTYPE_FLAGS.items():
+
+        df[FLAG] = contains_any(UPPER, WORDS)
+
+    df['is_government'] = contains_any(
+        df['busname'].astype('string').str.upper(), GOVT_OPERATORS
+    )
+
+    return df
+
+
+def normalize_frame(df):
+
+    """
+    Returns a copy of the scraped DataFrame with typed columns
+    and the filter flag columns.
+    """
+
+    df = df.copy()
+
+    df['departing_time'] = parse_time(df['departing_time'])
+
+    df['reaching_time'] = parse_time(df['reaching_time'])
+
+    df['duration'] = parse_duration(df['duration'])
+
+    df['star_rating'] = parse_rating(df['star_rating'])
+
+    df['price'] = parse_number(df['price'])
+
+    df['seats_available'] = parse_number(df['seats_available'])
+
+    return compact_frame(add_flags(df))
+
+
+def compact_frame(df):
+
+    """
+    Converts the bus columns present in df, in place, to their
+    compact types: categoricals for the CATEGORY_COLUMNS, Int16
+    and float64 for the numbers and bool for the flags. Time of
+    day columns are left as they are. Returns df.
+    """
+
+    for COLUMN in CATEGORY_COLUMNS:
+
+        if COLUMN in df:
+
+            df[COLUMN] = df[COLUMN].astype('category')
+
+    for COLUMN in SMALL_INT_COLUMNS:
+
+        if COLUMN in df:
+
+            df[COLUMN] = pd.to_numeric(df[COLUMN]).round().astype('Int16')
+
+    for COLUMN in FLOAT_COLUMNS:
+
+        if COLUMN in df:
+
+            df[COLUMN] = pd.to_numeric(df[COLUMN]).astype(float)
+
+    for COLUMN in FLAG_COLUMNS:
+
+        if COLUMN in df:
+
+            df[COLUMN] = df[COLUMN].fillna(False).astype(bool)
+
+    return df
@@ -0,0 +1,179 @@
+"""
+Snapshot-versioned cache of read query results
+
+The dashboard's navigation queries (the states, the routes of a state)
+only change when an ingestion publishes a new snapshot, yet they used
+to run on every page view. QueryCache keeps their results keyed by the
+normalized SQL text, the parameters and the snapshot version.
+
+The snapshot version is read through a callable at most once every
+version_ttl seconds, so repeat navigation costs no database queries at
+all. When the version changes every cached result is dropped at once,
+so results are invalidated exactly when new data is published (at most
+version_ttl seconds late). Entries also expire after ttl seconds, and
+the least recently used entry is evicted once max_entries is reached.
+
+Modules used:
+- collections: for the LRU order
+- threading / time: for thread-safe, expiring entries
+"""
+import threading
+
+import time
+
+from collections import OrderedDict
+
+
+def normalize_sql(QUERY):
+
+    """
+    Collapses whitespace so that differently indented copies
+    of the same query share a cache entry.
+    """
+
+    return ' '.join(QUERY.split())
+
+
+class QueryCache:
+
+    """
+    Thread-safe LRU cache of query results with TTL expiry,
+    invalidated whenever fetch_version() returns a new version.
+    """
+
+    def __init__(
+        self, fetch_version, max_entries=512, ttl=3600, version_ttl=10
+    ):
+
+        self.fetch_version = fetch_version
+
+        self.max_entries = max_entries
+
+        self.ttl = ttl
+
+        self.version_ttl = version_ttl
+
+        self.entries = OrderedDict()
+
+        self.lock = threading.Lock()
+
+        self.version = None
+
+        self.version_checked = 0.0
+
+        self.counts = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evicted': 0,
+            'invalidations': 0,
+            'version_checks': 0
+        }
+
+    def current_version(self):
+
+        """
+        Returns the published snapshot version, asking the database
+        at most once every version_ttl seconds. A new version drops
+        every cached result.
+        """
+
+        NOW = time.monotonic()
+
+        with self.lock:
+
+            if (
+                self.version is not None
+                and NOW - self.version_checked < self.version_ttl
+            ):
+
+                return self.version
+
+        VERSION = self.fetch_version()
+
+        with self.lock:
+
+            self.counts['version_checks'] += 1
+
+            if VERSION != self.version:
+
+                if self.entries:
+
+                    self.counts['invalidations'] += 1
+
+                self.entries.clear()
+
+                self.version = VERSION
+
+            self.version_checked = NOW
+
+        return VERSION
+
+    def get_or_run(self, QUERY, PARAMS, RUN):
+
+        """
+        Returns the cached result of QUERY with PARAMS for the
+        current version, or calls RUN(QUERY, PARAMS) and caches
+        what it returns.
+        """
+
+        VERSION = self.current_version()
+
+        KEY = (normalize_sql(QUERY), tuple(PARAMS), VERSION)
+
+        NOW = time.monotonic()
+
+        with self.lock:
+
+            ENTRY = self.entries.get(KEY)
+
+            if ENTRY is not None and NOW - ENTRY[0] < self.ttl:
+
+                self.entries.move_to_end(KEY)
+
+                self.counts['hits'] += 1
+
+                return ENTRY[1]
+
+            if ENTRY is not None:
+
+                del self.entries[KEY]
+
+                self.counts['expired'] += 1
+
+            self.counts['misses'] += 1
+
+        RESULT = RUN(QUERY, PARAMS)
+
+        with self.lock:
+
+            # A new version was published while the query ran
+            if VERSION == self.version:
+
+                self.entries[KEY] = (NOW, RESULT)
+
+                self.entries.move_to_end(KEY)
+
+                while len(self.entries) > self.max_entries:
+
+                    self.entries.popitem(last=False)
+
+                    self.counts['evicted'] += 1
+
+        return RESULT
+
+    def stats(self):
+
+        """
+        Returns the hit/miss counters, size and current version.
+        """
+
+        with self.lock:
+
+            STATS = dict(self.counts)
+
+            STATS['entries'] = len(self.entries)
+
+            STATS['version'] = self.version
+
+        return STATS
@@ -0,0 +1,236 @@
+"""
+In-memory filtering of one route's buses
+
+Every move of the route page's price slider and every pill toggle used
+to re-run a MIN/MAX(price) query and a concatenated filter query
+against the remote database. The route page now loads the buses of its
+(state, route) once per snapshot version and answers the price bounds
+and every filter with vectorized masks over typed columns.
+
+The filter semantics are those of the bitmap index (see bitmap_index),
+so the route page and the statewide search agree, and so is the keyset
+pagination on (price, id) with which page_slice() serves the matching
+buses a page at a time.
+
+Slices use the compact column types of normalize (categorical names,
+fixed-width numbers and times), and the dashboard caches them in the
+Arrow IPC format (to_arrow / from_arrow) rather than as pickled frames.
+
+Modules used:
+- numpy: for the filter masks
+- pandas: for the typed route slice
+- bitmap_index: for the shared filter definitions
+- loader: for reading the buses from the star schema
+- normalize: for the compact column types
+- pyarrow (optional): for caching slices in the Arrow format
+"""
+import numpy as np
+
+import pandas as pd
+
+from bitmap_index import (
+    DAY_END,
+    DAY_START,
+    EXCLUSIVE,
+    FLAG_FILTERS,
+    HIGHLY_RATED,
+    PAGE_SIZE,
+    RESULT_COLUMNS,
+    cursor_at,
+    keyset_start
+)
+
+from loader import bus_select
+
+from normalize import compact_frame
+
+# Columns of a route slice as read from the star schema
+SLICE_COLUMNS = ['id'] + RESULT_COLUMNS + list(FLAG_FILTERS.values())
+
+
+def read_route_slice(storage, STATE, ROUTE):
+
+    """
+    Reads the buses of one route through a storage backend
+    (see storage.Storage) and returns them as a typed DataFrame.
+    """
+
+    # The route is looked up in the small states and routes tables,
+    # then its buses are read through the (route_id, price) index
+    ROWS = pd.DataFrame(
+        storage.fetch_all(
+            f"""
+            {bus_select(SLICE_COLUMNS)}
+            WHERE d.state = %s AND r.route_name = %s
+            ORDER BY b.id
+            """, (STATE, ROUTE)
+        ),
+        columns=SLICE_COLUMNS
+    )
+
+    return type_slice(ROWS)
+
+
+def type_slice(ROWS):
+
+    """
+    Converts the slice columns to the compact fixed types (see
+    normalize.compact_frame) and adds the departure time in seconds
+    used by the day/night filters.
+    """
+
+    ROWS['departing_time'] = pd.to_timedelta(ROWS['departing_time'])
+
+    ROWS['reaching_time'] = pd.to_timedelta(ROWS['reaching_time'])
+
+    ROWS = compact_frame(ROWS)
+
+    ROWS['star_rating'] = ROWS['star_rating'].fillna(0.0)
+
+    ROWS['departing_seconds'] = ROWS['departing_time'].dt.total_seconds()
+
+    return ROWS
+
+
+def to_arrow(SLICE):
+
+    """
+    Serializes a slice in the Arrow IPC stream format. Categorical,
+    nullable integer and time columns keep their types, and reading
+    it back is a buffer copy rather than unpickling Python objects.
+    """
+
+    # Imported here so the module can be used without pyarrow
+    import pyarrow as pa
+
+    TABLE = pa.Table.from_pandas(SLICE, preserve_index=False)
+
+    SINK = pa.BufferOutputStream()
+
+    with pa.ipc.new_stream(SINK, TABLE.schema) as WRITER:
+
+        WRITER.write_table(TABLE)
+
+    return SINK.getvalue()
+
+
+def from_arrow(BUFFER):
+
+    """
+    Returns the slice serialized by to_arrow().
+    """
+
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(BUFFER).read_all().to_pandas()
+
+
+def price_bounds(SLICE):
+
+    """
+    Returns the (min, max) price of a slice, or (None, None)
+    when it has no priced buses.
+    """
+
+    PRICES = SLICE['price'].dropna()
+
+    if PRICES.empty:
+
+        return None, None
+
+    return PRICES.min(), PRICES.max()
+
+
+def filter_mask(SLICE, filters=(), max_price=None):
+
+    """
+    Returns the boolean mask of the buses of a slice matching
+    every filter and costing at most max_price.
+    """
+
+    FILTERS_SET = set(filters)
+
+    for PAIR in EXCLUSIVE:
+
+        if FILTERS_SET.issuperset(PAIR):
+
+            FILTERS_SET.difference_update(PAIR)
+
+    MASK = np.ones(len(SLICE), dtype=bool)
+
+    for NAME in FILTERS_SET & set(FLAG_FILTERS):
+
+        MASK &= SLICE[FLAG_FILTERS[NAME]].to_numpy()
+
+    if 'private' in FILTERS_SET:
+
+        MASK &= ~SLICE['is_government'].to_numpy()
+
+    if 'highly_rated' in FILTERS_SET:
+
+        MASK &= SLICE['star_rating'].to_numpy() >= HIGHLY_RATED
+
+    SECONDS = SLICE['departing_seconds'].to_numpy()
+
+    DAY = (SECONDS >= DAY_START) & (SECONDS <= DAY_END)
+
+    if 'day' in FILTERS_SET:
+
+        MASK &= DAY
+
+    if 'night' in FILTERS_SET:
+
+        MASK &= ~np.isnan(SECONDS) & ~DAY
+
+    if max_price is not None:
+
+        # NaN prices compare False and are dropped, as in SQL
+        MASK &= SLICE['price'].to_numpy() <= max_price
+
+    return MASK
+
+
+def filter_slice(SLICE, filters=(), max_price=None):
+
+    """
+    Returns the buses of a slice matching every filter and
+    costing at most max_price, in slice order.
+    """
+
+    MASK = filter_mask(SLICE, filters, max_price)
+
+    return SLICE.loc[MASK, RESULT_COLUMNS].reset_index(drop=True)
+
+
+def page_slice(SLICE, after=None, limit=PAGE_SIZE, **FILTERS):
+
+    """
+    Returns up to limit buses of a slice matching the filters
+    (see filter_mask), ordered by (price, id) and starting after
+    the cursor after, and the cursor of the next page (None on
+    the last page), like bitmap_index.BitmapIndex.page().
+    """
+
+    MATCHED = SLICE.loc[filter_mask(SLICE, **FILTERS)]
+
+    PRICES = MATCHED['price'].to_numpy(dtype=float, na_value=np.inf)
+
+    IDS = MATCHED['id'].to_numpy()
+
+    ORDER = np.lexsort((IDS, PRICES))
+
+    PRICES, IDS = PRICES[ORDER], IDS[ORDER]
+
+    START = keyset_start(PRICES, IDS, after)
+
+    END = START + limit
+
+    NEXT = None
+
+    if END < len(ORDER):
+
+        NEXT = cursor_at(PRICES[END - 1], IDS[END - 1])
+
+    PAGE = MATCHED.iloc[ORDER[START:END]]
+
+    return PAGE[RESULT_COLUMNS].reset_index(drop=True), NEXT
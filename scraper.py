@@ -0,0 +1,1169 @@
+"""
+RedBus scraper for state transport corporation bus routes
+
+This module holds the Selenium scraping logic used by the BusGrid
+Streamlit app. It is kept separate from the app so that it can be
+imported by worker processes without starting the dashboard.
+
+A scrape runs in two phases. Discovery walks the pagination of every
+state page once and collects the (state, route_link, route_title)
+triples into a deduplicated work queue, kept in the checkpoint file so
+a resumed run does not walk the state pages again. The visitor phase
+then opens every route directly by its URL, without re-clicking
+pagination tabs or navigating back, in chunks of ROUTE_CHUNK routes.
+Chunks are either run one after another through a single browser, or
+handed out to a pool of worker processes that each drive their own
+Chrome instance. Every chunk fills its own DATA dictionary and the
+results are merged, in discovery order, into a single DataFrame.
+With a sink (see stream.RouteWriter) every finished route is handed to
+it instead, through a bounded queue, and nothing is kept in memory.
+
+Modules used:
+- time: for throughput timing
+- timing: for event-driven, adaptive waits
+- metrics: for per-phase timings, counters and route spans
+- checkpoint: for resumable, incremental scraping
+- normalize: for parsing page text into typed columns
+- logging: for reporting per-worker throughput
+- concurrent.futures / multiprocessing: for the worker pool
+- threading: for relaying streamed routes from the worker pool
+- pandas: for data storage and manipulation
+- selenium: for web scraping
+- browser: for the default and lean Chrome profiles
+- http_engine: for the optional browserless engine
+"""
+import logging
+
+import multiprocessing
+
+import os
+
+import queue
+
+import threading
+
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from selenium.webdriver.common.by import By
+
+from selenium.webdriver.support import expected_conditions as EC
+
+from browser import page_stats, start_chrome
+
+from checkpoint import DEFAULT_TTL, open_store
+
+from metrics import Metrics
+
+from normalize import SCRAPED_ROUTES, normalize_frame
+
+from timing import (
+    AdaptiveWaiter,
+    document_ready,
+    links_changed,
+    new_cards_or_end
+)
+
+LOGGER = logging.getLogger(__name__)
+
+# Dictionary containing state names and their
+# corresponding RedBus government bus URLs
+GOVT_LINKS = {
+    'Andhra Pradesh': 'https://www.redbus.in/online-booking/apsrtc',
+    'Kerala': 'https://www.redbus.in/online-booking/ksrtc-kerala',
+    'Telangana': 'https://www.redbus.in/online-booking/tsrtc',
+    'Goa': 'https://www.redbus.in/online-booking/ktcl',
+    'Rajasthan': 'https://www.redbus.in/online-booking/rsrtc',
+    'South Bengal': (
+        'https://www.redbus.in/online-booking/'
+        'south-bengal-state-transport-corporation-sbstc'
+    ),
+    'Himachal Pradesh': 'https://www.redbus.in/online-booking/hrtc',
+    'Assam': 'https://www.redbus.in/online-booking/astc',
+    'Uttar Pradesh': (
+        'https://www.redbus.in/online-booking/'
+        'uttar-pradesh-state-road-transport-corporation-upsrtc'
+    ),
+    'West Bengal': 'https://www.redbus.in/online-booking/wbtc-ctc'
+}
+
+# Columns of the DATA dictionary, in DataFrame order
+DATA_COLUMNS = [
+    'state',
+    'route_name',
+    'route_link',
+    'busname',
+    'bustype',
+    'departing_time',
+    'duration',
+    'reaching_time',
+    'star_rating',
+    'price',
+    'seats_available'
+]
+
+# Routes per visitor task, so that one big state is spread over
+# several workers instead of holding up the whole run
+ROUTE_CHUNK = 10
+
+# Routes the worker processes may queue for a streaming sink
+# before they block
+SINK_QUEUE_SIZE = 16
+
+
+def new_data():
+
+    """
+    Returns an empty DATA dictionary with one list per column.
+    """
+
+    return {COLUMN: [] for COLUMN in DATA_COLUMNS}
+
+
+# CSS selectors of the bus fields, relative to a tupleWrapper card
+CARD_FIELDS = {
+    'busname': "div[class*='travelsName___']",
+    'bustype': "p[class*='busType___']",
+    'departing_time': "p[class*='boardingTime___']",
+    'duration': "p[class*='duration___']",
+    'reaching_time': "p[class*='droppingTime___']",
+    'star_rating': (
+        "div[class*='timeFareBoWrap___'] div[class*='rating___']"
+    ),
+    'price': "p[class*='finalFare___']",
+    'seats_available': "p[class*='totalSeats___']"
+}
+
+# Bus cards, the "no buses found" message of an empty route and
+# the collapsed government bus groups of a route page
+BUS_CARDS = "//li[contains(@class, 'tupleWrapper')]"
+
+NO_BUSES = "//h4[contains(@class,'title___')]"
+
+GOVT_GROUPS = "//div[contains(@class,'rtcInfoWrap___')]"
+
+# Route links of the state page tab being shown
+ROUTE_LINKS = "a[class='route']"
+
+# Bus cards not yet read by extract_cards()
+NEW_CARDS = "li[class*='tupleWrapper']:not([data-harvested])"
+
+# Scroll steps in a row that may bring only cards already harvested
+# (a virtualized list re-rendering old rows) before the harvest stops
+HARVEST_IDLE_STEPS = 3
+
+# Script run in the page that returns one record per bus card not
+# returned before, and marks those cards as harvested. Cards without
+# a bus name (banners, ads) are skipped and missing fields come back
+# as null. card_id is the card's id, or else its first data-*id
+# attribute, when the page sets one.
+EXTRACT_SCRIPT = """
+const fields = arguments[0];
+const records = [];
+for (const card of document.querySelectorAll(arguments[1])) {
+    card.setAttribute('data-harvested', '1');
+    const record = {};
+    for (const [name, selector] of Object.entries(fields)) {
+        const node = card.querySelector(selector);
+        record[name] = node ? node.innerText.trim() : null;
+    }
+    const dataId = Object.keys(card.dataset).find(key => /id$/i.test(key));
+    record.card_id = card.id || (dataId ? card.dataset[dataId] : null);
+    if (record.busname) {
+        records.push(record);
+    }
+}
+return records;
+"""
+
+
+def extract_cards(driver):
+
+    """
+    Returns the fields of every bus card rendered on the current
+    route page since the last call as a list of dictionaries,
+    using one script call.
+    """
+
+    return driver.execute_script(EXTRACT_SCRIPT, CARD_FIELDS, NEW_CARDS) or []
+
+
+def card_key(RECORD):
+
+    """
+    Returns the key a bus card is deduplicated by: its id, which
+    tells apart buses whose displayed fields are all the same, or
+    else all of its fields, which stay the same when a card is
+    rendered again.
+    """
+
+    if RECORD.get('card_id'):
+
+        return ('card_id', RECORD['card_id'])
+
+    return tuple(RECORD[NAME] for NAME in CARD_FIELDS)
+
+
+def append_record(DATA, STATE, ROUTE_LINK, ROUTE_TITLE, RECORD):
+
+    """
+    Appends one bus card record as a row of the DATA dictionary,
+    applying the same clean-up as the per-column extraction did.
+    """
+
+    PRICE = RECORD['price'] or ''
+
+    SEATS = (RECORD['seats_available'] or '').split()
+
+    ROW = {
+        'state': STATE,
+        'route_name': ROUTE_TITLE,
+        'route_link': ROUTE_LINK,
+        'busname': RECORD['busname'],
+        'bustype': RECORD['bustype'],
+        'departing_time': RECORD['departing_time'],
+        'duration': RECORD['duration'],
+        'reaching_time': RECORD['reaching_time'],
+        # Buses without a rating default to 0
+        'star_rating': RECORD['star_rating'] or 0,
+        'price': PRICE.replace('₹','').replace(',',''),
+        'seats_available': SEATS[0] if SEATS else None
+    }
+
+    for COLUMN in DATA_COLUMNS:
+
+        DATA[COLUMN].append(ROW[COLUMN])
+
+
+def new_driver(metrics=None, profile='default', profile_dir=None):
+
+    """
+    Starts a Chrome WebDriver with a browser profile ('default' or
+    'lean', see browser.py) and its adaptive explicit wait,
+    recording into the metrics registry (a new one by default).
+    """
+
+    # Initialize Chrome WebDriver
+    driver = start_chrome(profile, profile_dir)
+
+    # Set up an explicit wait whose timeout adapts to observed
+    # page latencies (never more than 30 seconds)
+    wait = AdaptiveWaiter(driver, max_timeout=30, metrics=metrics)
+
+    return driver, wait
+
+
+def measure_page(driver, wait, KIND):
+
+    """
+    Adds the bytes transferred by the current page to the
+    metrics, so browser profiles can be compared per page.
+    """
+
+    try:
+
+        STATS = page_stats(driver)
+
+    except Exception:
+
+        return
+
+    wait.metrics.incr('pages', page=KIND)
+
+    wait.metrics.incr('bytes_transferred', STATS.get('bytes', 0), page=KIND)
+
+    wait.metrics.incr('requests', STATS.get('requests', 0), page=KIND)
+
+
+def harvest(driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE):
+
+    """
+    Scrolls through the bus listings of a route page and appends
+    every bus to the DATA dictionary as it is rendered.
+
+    Each scroll step reads only the cards rendered since the last
+    step, so buses are kept even if a virtualized list removes them
+    from the page later, and cards rendered again are dropped by
+    card_key(). There is no cap on the number of steps: the harvest
+    stops at the end marker, when scrolling renders no new cards, or
+    after HARVEST_IDLE_STEPS steps that only bring known cards.
+
+    The scroll steps and the reason the harvest stopped are counted
+    in wait.metrics. Returns the number of buses appended.
+    """
+
+    SEEN = set()
+
+    IDLE = 0
+
+    while True:
+
+        with wait.metrics.timer('extract'):
+
+            RECORDS = extract_cards(driver)
+
+        NEW = 0
+
+        for RECORD in RECORDS:
+
+            KEY = card_key(RECORD)
+
+            if KEY in SEEN:
+
+                continue
+
+            SEEN.add(KEY)
+
+            append_record(DATA, STATE, ROUTE_LINK, ROUTE_TITLE, RECORD)
+
+            NEW += 1
+
+        if driver.find_elements(By.XPATH, "//span[contains(@class,'end')]"):
+
+            wait.metrics.incr('scroll_stops', reason='end_marker')
+
+            break
+
+        if len(SEEN) < 3:
+
+            wait.metrics.incr('scroll_stops', reason='few_buses')
+
+            break
+
+        IDLE = 0 if NEW else IDLE + 1
+
+        if IDLE >= HARVEST_IDLE_STEPS:
+
+            wait.metrics.incr('scroll_stops', reason='only_known_cards')
+
+            break
+
+        wait.metrics.incr('scroll_iterations')
+
+        driver.execute_script(
+            """
+            const cards = document.querySelectorAll(
+                "li[class*='tupleWrapper']"
+            );
+            if (cards.length) {
+                cards[cards.length - 1].scrollIntoView({block: 'end'});
+            }
+            """
+        )
+
+        # Wait until lazy loading renders new cards or the end of
+        # the listings shows up; if neither happens nothing is left
+        with wait.metrics.timer('scroll'):
+
+            MORE = wait.settle(new_cards_or_end(
+                NEW_CARDS, "//span[contains(@class,'end')]"
+            ), 'scroll')
+
+        if not MORE:
+
+            wait.metrics.incr('scroll_stops', reason='no_more_buses')
+
+            break
+
+    return len(SEEN)
+
+
+def extraction(driver, wait, DATA, x, y, z):
+
+    """
+    Extracts bus details from a route page and
+    appends them to the DATA dictionary.
+    """
+
+    # Wait until the bus cards are present
+    wait.until(EC.presence_of_all_elements_located(
+        (By.XPATH, BUS_CARDS)
+        ), 'extract'
+    )
+
+    # Read the cards while scrolling, one complete row per bus,
+    # so the DATA columns stay aligned
+    BUSES = harvest(driver, wait, DATA, x, y, z)
+
+    wait.metrics.incr('buses_extracted', BUSES, state=x)
+
+    # Everything the page loaded, including lazily loaded buses
+    measure_page(driver, wait, 'route')
+
+    return
+
+
+def open_route(driver, wait, ROUTE_LINK):
+
+    """
+    Opens a route page directly by its URL.
+    """
+
+    with wait.metrics.timer('route_get'):
+
+        driver.get(ROUTE_LINK)
+
+        wait.settle(document_ready(), 'page_load')
+
+
+def visit_route(driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE):
+
+    """
+    Opens one route page and extracts its buses, including the
+    government buses hidden behind the rtcInfoWrap groups.
+
+    Returns False if the route could not be scraped completely.
+    """
+
+    try:
+
+        # Open the route page
+        open_route(driver, wait, ROUTE_LINK)
+
+        # Wait until bus listings or the "no buses" message load
+        wait.until(EC.any_of(
+            EC.presence_of_element_located((By.XPATH, BUS_CARDS)),
+            EC.presence_of_element_located((By.XPATH, NO_BUSES))
+        ), 'route_page')
+
+        # A route without buses is complete as it is
+        if not driver.find_elements(By.XPATH, BUS_CARDS):
+
+            return True
+
+        # Get government bus listings
+        GOVT_BUSES = driver.find_elements(By.XPATH, GOVT_GROUPS)
+
+        for j in range(len(GOVT_BUSES)):
+
+            # Re-fetch to prevent stale element reference
+            GOVT_BUSES = driver.find_elements(By.XPATH, GOVT_GROUPS)
+
+            wait.metrics.incr('govt_groups', state=STATE)
+
+            with wait.metrics.timer('govt_group_open'):
+
+                GROUP = GOVT_BUSES[j]
+
+                GROUP.click()
+
+                # The old page's cards would satisfy the wait below,
+                # so first wait for the group to replace the page
+                wait.until(EC.staleness_of(GROUP), 'govt_group')
+
+                # Wait until the bus details are loaded
+                wait.until(EC.presence_of_all_elements_located(
+                    (By.XPATH, BUS_CARDS)
+                    )
+                )
+
+            # Extract bus details for the clicked government bus
+            extraction(driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE)
+
+            # Re-open the route page by URL for the next group
+            open_route(driver, wait, ROUTE_LINK)
+
+            wait.until(EC.presence_of_all_elements_located(
+                (By.XPATH, BUS_CARDS)
+                )
+            )
+
+        # Extract details for remaining buses on the route page
+        extraction(driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE)
+
+    except (TimeoutException, WebDriverException):
+
+        LOGGER.warning("Route %s could not be scraped", ROUTE_LINK)
+
+        return False
+
+    return True
+
+
+def emit_route(DATA, PART, ROUTE_LINK, SINK=None):
+
+    """
+    Hands the rows of a finished route (a DATA dictionary holding
+    only that route) to SINK, a callable, or appends them to DATA
+    when there is no sink. Returns the number of rows.
+
+    The route's link is listed under SCRAPED_ROUTES either way, so
+    the load also knows the routes that have no buses left.
+    """
+
+    PART[SCRAPED_ROUTES] = [ROUTE_LINK]
+
+    if SINK is not None:
+
+        SINK(PART)
+
+    else:
+
+        for COLUMN in DATA_COLUMNS:
+
+            DATA[COLUMN].extend(PART[COLUMN])
+
+        DATA.setdefault(SCRAPED_ROUTES, []).append(ROUTE_LINK)
+
+    return len(PART['busname'])
+
+
+def scrap_route(
+    driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE, STORE=None,
+    SINK=None
+):
+
+    """
+    Scrapes one route into DATA, or SINK (see emit_route), through
+    the checkpoint STORE.
+
+    A route completed within the store's TTL is not visited; its
+    saved rows are used instead. A freshly scraped route is
+    checkpointed as soon as it completes.
+
+    Every route is recorded as a span in wait.metrics, with its
+    outcome (ok, failed or skipped) and bus count. Returns the
+    number of buses of the route.
+    """
+
+    METRICS = wait.metrics
+
+    with METRICS.span(
+        'route', state=STATE, route=ROUTE_TITLE, link=ROUTE_LINK
+    ) as SPAN:
+
+        if STORE is not None and STORE.fresh(STATE, ROUTE_LINK):
+
+            PART = new_data()
+
+            STORE.load(STATE, ROUTE_LINK, PART)
+
+            METRICS.incr('routes_skipped', state=STATE)
+
+            SPAN['outcome'] = 'skipped'
+
+            return emit_route(DATA, PART, ROUTE_LINK, SINK)
+
+        METRICS.incr('routes_attempted', state=STATE)
+
+        PART = new_data()
+
+        OK = visit_route(driver, wait, PART, STATE, ROUTE_LINK, ROUTE_TITLE)
+
+        # A failed route is neither checkpointed nor loaded: it is
+        # retried, and the buses stored for it are kept until then
+        if not OK:
+
+            METRICS.incr('routes_failed', state=STATE)
+
+            SPAN['outcome'] = 'failed'
+
+            SPAN['buses'] = 0
+
+            return 0
+
+        if STORE is not None:
+
+            STORE.save(STATE, ROUTE_LINK, PART)
+
+        SPAN['outcome'] = 'ok'
+
+        SPAN['buses'] = emit_route(DATA, PART, ROUTE_LINK, SINK)
+
+        return SPAN['buses']
+
+
+def collect_route_links(driver, wait, URL):
+
+    """
+    Walks every pagination tab of a state page once and returns
+    the (route_link, route_title) pairs found, without duplicates.
+    """
+
+    with wait.metrics.timer('state_get'):
+
+        driver.get(URL)
+
+        wait.until(EC.presence_of_all_elements_located(
+            (By.CSS_SELECTOR, ".route_link")
+            ), 'state_page'
+        )
+
+    measure_page(driver, wait, 'state')
+
+    ROUTES = {}
+
+    PANUM = driver.find_elements(
+        By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
+    )
+
+    PAIRS = None
+
+    for i in range(max(len(PANUM), 1)):
+
+        if PANUM and i:
+
+            # Re-fetch pagination elements to avoid stale element reference
+            PANUM = driver.find_elements(
+                By.XPATH, "//div[contains(@class, 'DC_117_pageTabs')]"
+            )
+
+            driver.execute_script("arguments[0].click();", PANUM[i])
+
+        # The tabs switch client-side, so the document stays ready;
+        # wait until the tab's links replace the previous tab's
+        PAIRS = wait.until(
+            links_changed(ROUTE_LINKS, PAIRS), 'state_page'
+        )
+
+        for HREF, TITLE in PAIRS:
+
+            ROUTES.setdefault(HREF, TITLE)
+
+    return list(ROUTES.items())
+
+
+def discover_routes(
+    LINKS, CHECKPOINT=None, TTL=DEFAULT_TTL, PROFILE='default',
+    PROFILE_DIR=None, METRICS=None
+):
+
+    """
+    Discovery phase: walks the pagination of every state page once
+    and returns the (state, route_link, route_title) triples found,
+    in page order and without duplicates.
+
+    Route lists discovered within the TTL are read from the
+    CHECKPOINT file instead; a browser is only started when a state
+    page has to be loaded. A state that fails is logged and left out.
+    """
+
+    STORE = open_store(CHECKPOINT, TTL)
+
+    BROWSER = {}
+
+    ROUTES, SEEN = [], set()
+
+    try:
+
+        for STATE, URL in LINKS.items():
+
+            PAIRS = STORE.route_list(STATE, URL) if STORE else None
+
+            if PAIRS is None:
+
+                if not BROWSER:
+
+                    BROWSER['driver'], BROWSER['wait'] = new_driver(
+                        METRICS, PROFILE,
+                        os.path.join(PROFILE_DIR, 'discovery')
+                        if PROFILE_DIR else None
+                    )
+
+                WAIT = BROWSER['wait']
+
+                try:
+
+                    with WAIT.metrics.span('discover', state=STATE) as SPAN:
+
+                        PAIRS = collect_route_links(
+                            BROWSER['driver'], WAIT, URL
+                        )
+
+                        SPAN['outcome'] = 'ok'
+
+                        SPAN['routes'] = len(PAIRS)
+
+                except Exception:
+
+                    LOGGER.exception("Route discovery failed on %s", STATE)
+
+                    continue
+
+                if STORE is not None:
+
+                    STORE.save_route_list(STATE, URL, PAIRS)
+
+            for ROUTE_LINK, ROUTE_TITLE in PAIRS:
+
+                if (STATE, ROUTE_LINK) not in SEEN:
+
+                    SEEN.add((STATE, ROUTE_LINK))
+
+                    ROUTES.append((STATE, ROUTE_LINK, ROUTE_TITLE))
+
+    finally:
+
+        if BROWSER:
+
+            BROWSER['driver'].quit()
+
+        if STORE is not None:
+
+            STORE.close()
+
+    LOGGER.info(
+        "Discovered %s routes in %s states", len(ROUTES), len(LINKS)
+    )
+
+    return ROUTES
+
+
+def scrap_routes(
+    driver, wait, STATE, ROUTES, DATA, STORE=None, SINK=None
+):
+
+    """
+    Visitor phase: scrapes the (route_link, route_title) pairs of
+    one state into the DATA dictionary, or SINK, opening each route
+    directly by its URL. Routes still fresh in the checkpoint STORE
+    are taken from it instead of being visited.
+
+    Returns the number of routes handled and of buses scraped.
+    """
+
+    BUSES = 0
+
+    for ROUTE_LINK, ROUTE_TITLE in ROUTES:
+
+        BUSES += scrap_route(
+            driver, wait, DATA, STATE, ROUTE_LINK, ROUTE_TITLE, STORE, SINK
+        )
+
+    return len(ROUTES), BUSES
+
+
+def build_tasks(ROUTES, CHUNK=ROUTE_CHUNK):
+
+    """
+    Splits the discovered routes into visitor tasks.
+
+    Each task is a tuple (index, state, routes) holding up to CHUNK
+    (route_link, route_title) pairs of a single state, in discovery
+    order. CHUNK=None makes one task per state.
+    """
+
+    TASKS = []
+
+    for STATE, ROUTE_LINK, ROUTE_TITLE in ROUTES:
+
+        if (
+            not TASKS or TASKS[-1][1] != STATE
+            or (CHUNK and len(TASKS[-1][2]) >= CHUNK)
+        ):
+
+            TASKS.append((len(TASKS), STATE, []))
+
+        TASKS[-1][2].append((ROUTE_LINK, ROUTE_TITLE))
+
+    return TASKS
+
+
+def run_tasks(
+    WORKER, TASKS, CHECKPOINT=None, TTL=DEFAULT_TTL,
+    PROFILE='default', PROFILE_DIR=None, SINK=None
+):
+
+    """
+    Runs a list of tasks through a single browser, checkpointing
+    routes to the CHECKPOINT file when one is given. The browser
+    uses the PROFILE profile and, under PROFILE_DIR, a user data
+    directory of its own that is reused by the next run. With a
+    SINK every route is handed to it and the DATA stay empty.
+
+    Returns a list of (task index, DATA) pairs and the
+    throughput statistics of this worker, including a snapshot
+    of its metrics under 'metrics'.
+    """
+
+    RESULTS = []
+
+    STATS = {'worker': WORKER, 'tasks': 0, 'routes': 0, 'buses': 0}
+
+    START = time.perf_counter()
+
+    driver, STORE = None, None
+
+    # Replaced by the browser's waiter once it has started
+    wait = AdaptiveWaiter(None)
+
+    try:
+
+        driver, wait = new_driver(
+            profile=PROFILE,
+            profile_dir=(
+                os.path.join(PROFILE_DIR, f"worker-{WORKER}")
+                if PROFILE_DIR else None
+            )
+        )
+
+        STORE = open_store(CHECKPOINT, TTL)
+
+        for INDEX, STATE, ROUTES in TASKS:
+
+            DATA = new_data()
+
+            try:
+
+                with wait.metrics.span(
+                    'task', state=STATE, task=INDEX, routes=len(ROUTES)
+                ) as SPAN:
+
+                    VISITED, BUSES = scrap_routes(
+                        driver, wait, STATE, ROUTES, DATA, STORE, SINK
+                    )
+
+                    STATS['routes'] += VISITED
+
+                    STATS['buses'] += BUSES
+
+                    SPAN['outcome'] = 'ok'
+
+                    SPAN['buses'] = BUSES
+
+            except Exception:
+
+                LOGGER.exception(
+                    "Worker %s failed on task %s (%s)", WORKER, INDEX, STATE
+                )
+
+            STATS['tasks'] += 1
+
+            RESULTS.append((INDEX, DATA))
+
+    except Exception:
+
+        # E.g. Chrome failed to start: tasks not taken yet are left
+        # to the other workers, finished ones are still returned
+        LOGGER.exception("Worker %s stopped", WORKER)
+
+    finally:
+
+        # Close the Selenium WebDriver after scraping all tasks
+        if driver is not None:
+
+            driver.quit()
+
+        if STORE is not None:
+
+            STATS['checkpoint'] = dict(STORE.stats)
+
+            STORE.close()
+
+    STATS['seconds'] = time.perf_counter() - START
+
+    STATS['waits'] = wait.report()
+
+    STATS['metrics'] = wait.metrics.snapshot()
+
+    return RESULTS, STATS
+
+
+def _worker(
+    WORKER, TASK_QUEUE, CHECKPOINT=None, TTL=DEFAULT_TTL,
+    PROFILE='default', PROFILE_DIR=None, SINK_QUEUE=None
+):
+
+    """
+    Worker process entry point: pulls tasks from the shared
+    queue until it is empty, using one browser for all of them.
+    Finished routes are put on SINK_QUEUE when one is given.
+    """
+
+    def tasks():
+
+        while True:
+
+            try:
+
+                yield TASK_QUEUE.get_nowait()
+
+            except queue.Empty:
+
+                return
+
+    return run_tasks(
+        WORKER, tasks(), CHECKPOINT, TTL, PROFILE, PROFILE_DIR,
+        SINK_QUEUE.put if SINK_QUEUE is not None else None
+    )
+
+
+def relay(SOURCE, SINK):
+
+    """
+    Moves routes from the worker pool's queue to SINK until
+    a None arrives.
+    """
+
+    while True:
+
+        PART = SOURCE.get()
+
+        if PART is None:
+
+            return
+
+        SINK(PART)
+
+
+def merge_results(RESULTS):
+
+    """
+    Merges (task index, DATA) pairs into a single DATA
+    dictionary, keeping the original task order.
+    """
+
+    DATA = {**new_data(), SCRAPED_ROUTES: []}
+
+    for INDEX, PART in sorted(RESULTS, key=lambda R: R[0]):
+
+        for COLUMN in DATA_COLUMNS:
+
+            DATA[COLUMN].extend(PART[COLUMN])
+
+        DATA[SCRAPED_ROUTES].extend(PART.get(SCRAPED_ROUTES, []))
+
+    return DATA
+
+
+def report_throughput(STATS):
+
+    """
+    Logs the routes and buses scraped per minute for every worker.
+    """
+
+    for S in sorted(STATS, key=lambda S: S['worker']):
+
+        MINUTES = max(S['seconds'], 1e-9) / 60
+
+        LOGGER.info(
+            "Worker %s: %s tasks, %s routes, %s buses in %.1fs "
+            "(%.1f routes/min, %.1f buses/min)",
+            S['worker'], S['tasks'], S['routes'], S['buses'],
+            S['seconds'], S['routes'] / MINUTES, S['buses'] / MINUTES
+        )
+
+        LOGGER.info(
+            "Worker %s: %s waits, %s timeouts, %.1fs saved over fixed sleeps",
+            S['worker'], S['waits']['waits'], S['waits']['timeouts'],
+            S['waits']['time_saved']
+        )
+
+        if 'checkpoint' in S:
+
+            LOGGER.info(
+                "Worker %s: %s fresh routes reused, %s routes checkpointed",
+                S['worker'], S['checkpoint']['skipped'],
+                S['checkpoint']['saved']
+            )
+
+    LOGGER.info(
+        "Run total: %.1fs saved over fixed sleeps",
+        sum(S['waits']['time_saved'] for S in STATS)
+    )
+
+
+def report_metrics(METRICS):
+
+    """
+    Logs the mean time per phase and the slowest routes.
+    """
+
+    SUMMARY = METRICS.summary()
+
+    for NAME, LABELS, COUNT, TOTAL, MEAN in sorted(
+        SUMMARY['histograms'], key=lambda H: -H[3]
+    ):
+
+        LOGGER.info(
+            "%s %s: %s samples, %.1fs total, %.3fs mean",
+            NAME, ','.join(f"{K}={V}" for K, V in LABELS.items()),
+            COUNT, TOTAL, MEAN
+        )
+
+    for SPAN in SUMMARY['slowest'][:5]:
+
+        LOGGER.info(
+            "Slow %s: %s %s in %.1fs (%s)",
+            SPAN['name'], SPAN['state'], SPAN.get('route', ''),
+            SPAN['seconds'], SPAN.get('outcome')
+        )
+
+
+def scrap_redbus_data(
+    workers=1, links=None, engine='selenium', concurrency=32,
+    checkpoint=None, ttl=DEFAULT_TTL, metrics=None,
+    browser='default', browser_dir=None, sink=None
+):
+
+    """
+    Scrapes bus data for every state in GOVT_LINKS and
+    returns it as a pandas DataFrame with typed columns
+    (see normalize.normalize_frame).
+
+    The routes of every state are discovered first (see
+    discover_routes) and then visited by URL. With workers greater
+    than one the route chunks are spread over that many worker
+    processes, each running its own browser. Per-worker throughput is logged
+    and stored in df.attrs['worker_stats']. The links of the routes
+    scraped completely, failed ones left out, are listed in
+    df.attrs['scraped_routes'] for loader.upsert_routes().
+
+    With engine='http' pages are fetched over HTTP with up to
+    concurrency requests in flight and parsed without a browser
+    (see http_engine); workers is then ignored.
+
+    With checkpoint set to a file path every completed route is
+    recorded there, so an interrupted run resumes where it stopped
+    and routes scraped less than ttl seconds ago are not scraped
+    again (see checkpoint.CheckpointStore).
+
+    The phase timings, counters and route spans of every worker are
+    merged into the metrics registry (see metrics.Metrics) when one
+    is given, and the slowest phases and routes are logged.
+
+    Every browser is started with the browser profile ('default' or
+    'lean', see browser.py); with browser_dir set, each one keeps a
+    warm user data directory under it across runs.
+
+    With sink set (a callable, e.g. stream.RouteWriter.put) every
+    finished route is passed to it as a DATA dictionary as soon as
+    it is scraped, instead of being kept for the returned frame,
+    which then has no rows. Routes from worker processes go through
+    a bounded queue, so a slow sink holds the workers back.
+    """
+
+    LINKS = GOVT_LINKS if links is None else links
+
+    RUN_METRICS = Metrics() if metrics is None else metrics
+
+    if engine == 'http':
+
+        # Imported here so the Selenium engine does not need aiohttp
+        import http_engine
+
+        RESULTS, STATS = http_engine.run_http(
+            LINKS, concurrency, checkpoint, ttl, browser, browser_dir, sink
+        )
+
+        STATS = [STATS]
+
+    elif engine != 'selenium':
+
+        raise ValueError(f"Unknown scraping engine: {engine!r}")
+
+    elif workers <= 1:
+
+        ROUTES = discover_routes(
+            LINKS, checkpoint, ttl, browser, browser_dir, RUN_METRICS
+        )
+
+        # Sequential mode: a single browser visits every route
+        RESULTS, STATS = run_tasks(
+            0, build_tasks(ROUTES, CHUNK=None), checkpoint, ttl,
+            browser, browser_dir, sink
+        )
+
+        STATS = [STATS]
+
+    else:
+
+        ROUTES = discover_routes(
+            LINKS, checkpoint, ttl, browser, browser_dir, RUN_METRICS
+        )
+
+        TASKS = build_tasks(ROUTES)
+
+        # Shared queue so that idle workers pick up the next task
+        MANAGER = multiprocessing.Manager()
+
+        TASK_QUEUE = MANAGER.Queue()
+
+        for TASK in TASKS:
+
+            TASK_QUEUE.put(TASK)
+
+        SINK_QUEUE, RELAY = None, None
+
+        if sink is not None:
+
+            SINK_QUEUE = MANAGER.Queue(SINK_QUEUE_SIZE)
+
+            RELAY = threading.Thread(
+                target=relay, args=(SINK_QUEUE, sink), daemon=True
+            )
+
+            RELAY.start()
+
+        RESULTS, STATS = [], []
+
+        try:
+
+            with ProcessPoolExecutor(max_workers=workers) as EXECUTOR:
+
+                FUTURES = [
+                    EXECUTOR.submit(
+                        _worker, WORKER, TASK_QUEUE, checkpoint, ttl,
+                        browser, browser_dir, SINK_QUEUE
+                    )
+                    for WORKER in range(min(workers, len(TASKS)))
+                ]
+
+                for WORKER, FUTURE in enumerate(FUTURES):
+
+                    # A crashed worker must not discard the rows
+                    # of the others
+                    try:
+
+                        PART, WORKER_STATS = FUTURE.result()
+
+                    except Exception:
+
+                        LOGGER.exception("Worker %s failed", WORKER)
+
+                        continue
+
+                    RESULTS.extend(PART)
+
+                    STATS.append(WORKER_STATS)
+
+        finally:
+
+            if RELAY is not None:
+
+                SINK_QUEUE.put(None)
+
+                RELAY.join()
+
+            MANAGER.shutdown()
+
+    for S in STATS:
+
+        if 'metrics' in S:
+
+            RUN_METRICS.merge(S.pop('metrics'))
+
+    report_throughput(STATS)
+
+    report_metrics(RUN_METRICS)
+
+    # Convert the collected bus data into a pandas DataFrame
+    DATA = merge_results(RESULTS)
+
+    ROUTES = DATA.pop(SCRAPED_ROUTES)
+
+    df = pd.DataFrame(DATA)
+
+    # Parse the page text into the column types of bus_routes
+    df = normalize_frame(df)
+
+    df.attrs['worker_stats'] = STATS
+
+    df.attrs['scraped_routes'] = ROUTES
+
+    return df
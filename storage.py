@@ -0,0 +1,381 @@
+"""
+Pluggable storage for the dashboard: MySQL or an embedded snapshot
+
+The dashboard used to read only from the remote TiDB gateway, so every
+query paid WAN latency and nothing could run offline. Reads now go
+through a Storage object with one method, fetch_all(query, params),
+plus the published snapshot version. Queries are written once with
+MySQL-style %s placeholders and run unchanged on every backend:
+
+- MySQLStorage: the bus_routes database, through a connection pool.
+- EmbeddedStorage: a local DuckDB or SQLite file holding the same
+  star schema (the states, routes, operators and bus_types dimensions
+  and the bus_routes fact table) plus the route_summary and snapshots
+  tables, opened read-only (SQLite with memory-mapped I/O).
+
+Every scrape can also be kept as a versioned Parquet snapshot of the
+typed bus_routes rows (write_parquet), and an embedded file is built
+from a scrape with build_embedded(). Times of day are stored as
+"HH:MM:SS" text in the embedded files; readers convert them with
+pd.to_timedelta, which gives the same values as MySQL TIME columns.
+
+Modules used:
+- glob / os / re / time: for snapshot files
+- sqlite3: for the SQLite backend
+- pandas: for building embedded files and Parquet snapshots
+- mysql.connector: for MySQL error codes
+- db, loader: for the MySQL pool and the table layout
+- duckdb (optional): for the DuckDB backend
+"""
+import glob
+
+import os
+
+import re
+
+import sqlite3
+
+import time
+
+import pandas as pd
+
+import mysql.connector
+
+from mysql.connector import errorcode
+
+import db
+
+import loader
+
+BACKENDS = ('mysql', 'duckdb', 'sqlite')
+
+VERSION_QUERY = (
+    f"SELECT COALESCE(MAX(version), 0) FROM {loader.SNAPSHOT_TABLE}"
+)
+
+
+class Storage:
+
+    """
+    Read interface used by the dashboard.
+    """
+
+    backend = None
+
+    def fetch_all(self, QUERY, PARAMS=()):
+
+        """
+        Runs a read query with %s placeholders and returns its rows.
+        """
+
+        raise NotImplementedError
+
+    def snapshot_version(self):
+
+        """
+        Returns the published snapshot version, or 0 when nothing
+        has been loaded yet.
+        """
+
+        raise NotImplementedError
+
+    def stats(self):
+
+        """
+        Returns backend-specific usage statistics.
+        """
+
+        return {'backend': self.backend}
+
+
+class MySQLStorage(Storage):
+
+    """
+    Storage backed by the MySQL/TiDB database, read through a
+    bounded connection pool.
+    """
+
+    backend = 'mysql'
+
+    def __init__(self, pool_size=db.POOL_SIZE):
+
+        self.pool = db.ConnectionPool(size=pool_size)
+
+    def fetch_all(self, QUERY, PARAMS=()):
+
+        with self.pool.connection() as CONN:
+
+            CURSOR = CONN.cursor()
+
+            try:
+
+                CURSOR.execute(QUERY, PARAMS)
+
+                return CURSOR.fetchall()
+
+            finally:
+
+                CURSOR.close()
+
+    def snapshot_version(self):
+
+        try:
+
+            return self.fetch_all(VERSION_QUERY)[0][0]
+
+        except mysql.connector.Error as ERR:
+
+            # The database or its tables have not been created yet
+            if ERR.errno in (
+                errorcode.ER_BAD_DB_ERROR, errorcode.ER_NO_SUCH_TABLE
+            ):
+
+                return 0
+
+            raise
+
+    def stats(self):
+
+        return {'backend': self.backend, 'connections': self.pool.stats()}
+
+
+class EmbeddedStorage(Storage):
+
+    """
+    Storage backed by a local DuckDB or SQLite file built by
+    build_embedded(). A connection is opened read-only per query,
+    so a rebuilt file is picked up by the next query.
+    """
+
+    def __init__(self, path, backend='duckdb'):
+
+        if backend not in ('duckdb', 'sqlite'):
+
+            raise ValueError(f"Unknown embedded backend: {backend!r}")
+
+        self.path = path
+
+        self.backend = backend
+
+        self.queries = 0
+
+    def connect(self):
+
+        if self.backend == 'duckdb':
+
+            # Imported here so the other backends do not need duckdb
+            import duckdb
+
+            return duckdb.connect(self.path, read_only=True)
+
+        CONN = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+        CONN.execute("PRAGMA mmap_size = 268435456")
+
+        return CONN
+
+    def fetch_all(self, QUERY, PARAMS=()):
+
+        self.queries += 1
+
+        CONN = self.connect()
+
+        try:
+
+            return CONN.execute(
+                QUERY.replace('%s', '?'), list(PARAMS)
+            ).fetchall()
+
+        finally:
+
+            CONN.close()
+
+    def snapshot_version(self):
+
+        if not os.path.exists(self.path):
+
+            return 0
+
+        return self.fetch_all(VERSION_QUERY)[0][0]
+
+    def stats(self):
+
+        return {
+            'backend': self.backend,
+            'path': self.path,
+            'size_bytes': (
+                os.path.getsize(self.path)
+                if os.path.exists(self.path) else 0
+            ),
+            'queries': self.queries
+        }
+
+
+def open_storage(backend='mysql', path=None):
+
+    """
+    Returns the Storage for a backend name ('mysql', 'duckdb'
+    or 'sqlite'); path is the embedded file.
+    """
+
+    if backend == 'mysql':
+
+        return MySQLStorage()
+
+    if backend not in BACKENDS:
+
+        raise ValueError(f"Unknown storage backend: {backend!r}")
+
+    return EmbeddedStorage(path, backend)
+
+
+def write_parquet(df, DIRECTORY):
+
+    """
+    Writes a typed scrape as the next versioned Parquet snapshot,
+    bus_routes-v<version>-<UTC time>.parquet, in DIRECTORY.
+
+    Returns the path of the new file.
+    """
+
+    os.makedirs(DIRECTORY, exist_ok=True)
+
+    VERSIONS = [
+        int(MATCH.group(1))
+        for MATCH in (
+            re.search(r'bus_routes-v(\d+)-', os.path.basename(PATH))
+            for PATH in glob.glob(
+                os.path.join(DIRECTORY, 'bus_routes-v*.parquet')
+            )
+        )
+        if MATCH
+    ]
+
+    VERSION = max(VERSIONS, default=0) + 1
+
+    PATH = os.path.join(
+        DIRECTORY,
+        f"bus_routes-v{VERSION:06d}-"
+        f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.parquet"
+    )
+
+    FRAME = df[loader.COLUMNS].copy()
+
+    # Run statistics are not part of the data
+    FRAME.attrs = {}
+
+    FRAME.to_parquet(PATH, index=False)
+
+    return PATH
+
+
+def _previous_version(path, backend):
+
+    if not os.path.exists(path):
+
+        return 0
+
+    try:
+
+        return EmbeddedStorage(path, backend).snapshot_version()
+
+    except Exception:
+
+        return 0
+
+
+def build_embedded(df, path, backend='duckdb'):
+
+    """
+    Builds a DuckDB or SQLite file at path from a typed scrape, with
+    the star schema tables (see loader.star_tables), route_summary,
+    snapshots and the route indexes. The file is built next to path
+    and swapped in atomically. Returns the new snapshot version.
+    """
+
+    ROWS = loader.prepare_frame(df).reset_index(drop=True)
+
+    SUMMARY = pd.DataFrame(
+        loader.summarize_routes(ROWS), columns=loader.SUMMARY_COLUMNS
+    )
+
+    VERSION = _previous_version(path, backend) + 1
+
+    SNAPSHOTS = pd.DataFrame([{
+        'version': VERSION,
+        'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'staged': len(ROWS),
+        'updated': 0,
+        'inserted': len(ROWS),
+        'deleted': 0
+    }])
+
+    TABLES = {
+        **loader.star_tables(ROWS),
+        loader.SUMMARY_TABLE: SUMMARY,
+        loader.SNAPSHOT_TABLE: SNAPSHOTS
+    }
+
+    INDEXES = [
+        f"CREATE INDEX route_price ON {loader.TABLE} (route_id, price)",
+        f"CREATE INDEX state_route ON {loader.ROUTES_TABLE} "
+        f"(state_id, route_name)"
+    ]
+
+    TMP_PATH = f"{path}.tmp"
+
+    if os.path.exists(TMP_PATH):
+
+        os.remove(TMP_PATH)
+
+    if backend == 'duckdb':
+
+        import duckdb
+
+        CONN = duckdb.connect(TMP_PATH)
+
+        try:
+
+            for NAME, FRAME in TABLES.items():
+
+                CONN.register('frame', FRAME)
+
+                CONN.execute(f"CREATE TABLE {NAME} AS SELECT * FROM frame")
+
+                CONN.unregister('frame')
+
+            for INDEX in INDEXES:
+
+                CONN.execute(INDEX)
+
+        finally:
+
+            CONN.close()
+
+    elif backend == 'sqlite':
+
+        CONN = sqlite3.connect(TMP_PATH)
+
+        try:
+
+            for NAME, FRAME in TABLES.items():
+
+                FRAME.to_sql(NAME, CONN, index=False)
+
+            for INDEX in INDEXES:
+
+                CONN.execute(INDEX)
+
+            CONN.commit()
+
+        finally:
+
+            CONN.close()
+
+    else:
+
+        raise ValueError(f"Unknown embedded backend: {backend!r}")
+
+    os.replace(TMP_PATH, path)
+
+    return VERSION
@@ -0,0 +1,214 @@
+"""
+Streaming scrape-to-database writer
+
+A batch ingest keeps every scraped bus in memory until the last state
+is done and only then builds one DataFrame and loads it, so memory
+grows with the crawl and nothing is queryable until the very end.
+
+RouteWriter is the sink a streaming scrape hands each finished route
+to (see scraper.scrap_redbus_data(sink=...)). Routes go into a bounded
+queue; a background thread takes them off, groups them into batches of
+about batch_rows rows and upserts every batch into bus_routes with
+loader.upsert_routes() while scraping continues. A batch always holds
+whole routes, so the upsert's removal of buses no longer listed on a
+route stays correct. Routes scraped without any bus are passed on too,
+so the buses stored for them are removed. A full queue blocks the scraper until the writer
+catches up, which keeps peak memory bounded whatever the crawl size.
+
+Every batch that changes anything publishes a new snapshot version,
+so the first states are served by the dashboard minutes into a run.
+
+Modules used:
+- logging: for reporting batch loads and errors
+- queue / threading: for the bounded queue and the writer thread
+- time: for load timing
+- pandas: for building each batch
+- loader: for the incremental upsert
+- normalize: for typing the scraped text
+"""
+import logging
+
+import queue
+
+import threading
+
+import time
+
+import pandas as pd
+
+import loader
+
+from normalize import SCRAPED_ROUTES, normalize_frame
+
+LOGGER = logging.getLogger(__name__)
+
+# Routes waiting for the writer before the scraper blocks
+QUEUE_SIZE = 64
+
+# Rows gathered before a batch is loaded
+BATCH_ROWS = 5000
+
+# Seconds without a new route after which a partial batch is loaded
+FLUSH_SECONDS = 30
+
+# Marks the end of the stream in the queue
+_DONE = object()
+
+
+class RouteWriter:
+
+    """
+    Bounded route queue drained into MySQL by a background thread.
+
+    put(PART) queues one route's DATA dictionary and blocks while
+    the queue is full. close() loads what is left, stops the thread
+    and raises the first load error, if any; after an error the
+    remaining routes are drained and dropped so the scraper never
+    blocks on a dead writer.
+    """
+
+    def __init__(
+        self, engine, maxsize=QUEUE_SIZE, batch_rows=BATCH_ROWS,
+        flush_seconds=FLUSH_SECONDS, chunk_size=loader.CHUNK_SIZE,
+        workers=loader.WRITE_WORKERS
+    ):
+
+        self.engine = engine
+
+        self.queue = queue.Queue(maxsize)
+
+        self.batch_rows = batch_rows
+
+        self.flush_seconds = flush_seconds
+
+        self.chunk_size = chunk_size
+
+        self.workers = workers
+
+        self.error = None
+
+        self.counts = {
+            'routes': 0, 'rows': 0, 'batches': 0, 'staged': 0,
+            'updated': 0, 'inserted': 0, 'deleted': 0, 'seconds': 0.0
+        }
+
+        self.thread = threading.Thread(
+            target=self.run, name='route-writer', daemon=True
+        )
+
+    def start(self):
+
+        self.thread.start()
+
+        return self
+
+    def put(self, PART):
+
+        self.queue.put(PART)
+
+    def write(self, PARTS):
+
+        """
+        Upserts a batch of routes into bus_routes.
+        """
+
+        if self.error is not None or not PARTS:
+
+            return
+
+        START = time.perf_counter()
+
+        ROUTES = [
+            LINK for PART in PARTS for LINK in PART.pop(SCRAPED_ROUTES, [])
+        ]
+
+        try:
+
+            df = normalize_frame(pd.concat(
+                [pd.DataFrame(PART) for PART in PARTS], ignore_index=True
+            ))
+
+            COUNTS = loader.upsert_routes(
+                self.engine, df, chunk_size=self.chunk_size,
+                workers=self.workers, routes=ROUTES
+            )
+
+        except Exception as ERROR:
+
+            LOGGER.exception("Streaming load of %s routes failed", len(PARTS))
+
+            self.error = ERROR
+
+            return
+
+        self.counts['batches'] += 1
+
+        self.counts['seconds'] += time.perf_counter() - START
+
+        for KEY in ('staged', 'updated', 'inserted', 'deleted'):
+
+            self.counts[KEY] += COUNTS[KEY]
+
+    def run(self):
+
+        PARTS, ROWS = [], 0
+
+        while True:
+
+            try:
+
+                PART = self.queue.get(timeout=self.flush_seconds)
+
+            except queue.Empty:
+
+                # Scraping is slow right now: publish what there is
+                self.write(PARTS)
+
+                PARTS, ROWS = [], 0
+
+                continue
+
+            if PART is _DONE:
+
+                break
+
+            self.counts['routes'] += 1
+
+            PARTS.append(PART)
+
+            ROWS += len(PART['busname'])
+
+            self.counts['rows'] += len(PART['busname'])
+
+            if ROWS >= self.batch_rows:
+
+                self.write(PARTS)
+
+                PARTS, ROWS = [], 0
+
+        self.write(PARTS)
+
+    def close(self):
+
+        """
+        Loads the remaining routes and waits for the writer.
+        Returns the load counts.
+        """
+
+        self.queue.put(_DONE)
+
+        self.thread.join()
+
+        if self.error is not None:
+
+            raise self.error
+
+        LOGGER.info(
+            "Streamed %s routes (%s rows) in %s batches: %s updated, "
+            "%s inserted, %s deleted",
+            self.counts['routes'], self.counts['rows'],
+            self.counts['batches'], self.counts['updated'],
+            self.counts['inserted'], self.counts['deleted']
+        )
+
+        return dict(self.counts)
@@ -0,0 +1,134 @@
+"""
+BitmapIndex: compressed sets answer like plain boolean masks
+
+Builds an index over a synthetic snapshot with many small routes and
+checks counts and keyset pages against pandas filtering.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+pd = pytest.importorskip("pandas")
+
+pytest.importorskip("sqlalchemy")
+
+from bitmap_index import BitmapIndex, members, to_bitset
+
+
+@pytest.fixture(scope='module')
+def rows():
+
+    RNG = np.random.default_rng(0)
+
+    SIZE = 5000
+
+    ROUTE = RNG.integers(0, 200, SIZE)
+
+    PRICE = RNG.integers(300, 2000, SIZE).astype(float)
+
+    PRICE[RNG.random(SIZE) < 0.05] = np.nan
+
+    return pd.DataFrame({
+        'id': np.arange(1, SIZE + 1),
+        'state': np.where(ROUTE < 150, 'Kerala', 'Goa'),
+        'route_name': [f"Route {R}" for R in ROUTE],
+        'busname': [f"Bus {I}" for I in range(SIZE)],
+        'bustype': 'A/C Sleeper',
+        'departing_time': pd.to_timedelta(
+            RNG.integers(0, 86400, SIZE), unit='s'
+        ),
+        'duration': 600,
+        'reaching_time': pd.to_timedelta(0, unit='s'),
+        'star_rating': RNG.uniform(0, 5, SIZE),
+        'price': PRICE,
+        'seats_available': 10,
+        'is_ac': RNG.random(SIZE) < 0.6,
+        'is_non_ac': RNG.random(SIZE) < 0.4,
+        'is_sleeper': RNG.random(SIZE) < 0.5,
+        'is_seater': RNG.random(SIZE) < 0.5,
+        'is_luxury': RNG.random(SIZE) < 0.1,
+        'is_electric': RNG.random(SIZE) < 0.01,
+        'is_government': RNG.random(SIZE) < 0.3
+    })
+
+
+def test_sparse_sets_are_stored_as_positions(rows):
+
+    INDEX = BitmapIndex(rows)
+
+    ROUTES = rows['route_name'].nunique()
+
+    assert all(M.dtype == np.uint32 for M in INDEX.routes.values())
+
+    assert len(INDEX.routes) == ROUTES
+
+    assert INDEX.bitmaps['electric'].dtype == np.uint32
+
+    assert INDEX.bitmaps['ac'].dtype == np.uint8
+
+    # At least four times smaller than one dense bitset per route
+    DENSE = ROUTES * len(rows) / 8
+
+    assert sum(M.nbytes for M in INDEX.routes.values()) * 4 < DENSE
+
+
+@pytest.mark.parametrize('CONDITIONS, EXPECTED', [
+    ({}, lambda R: R.index == R.index),
+    ({'state': 'Goa'}, lambda R: R['state'] == 'Goa'),
+    (
+        {'state': 'Kerala', 'route': 'Route 7'},
+        lambda R: (R['state'] == 'Kerala') & (R['route_name'] == 'Route 7')
+    ),
+    (
+        {'state': 'Kerala', 'filters': ['electric', 'private']},
+        lambda R: (
+            (R['state'] == 'Kerala') & R['is_electric'] & ~R['is_government']
+        )
+    ),
+    (
+        {'filters': ['ac', 'sleeper'], 'max_price': 900},
+        lambda R: R['is_ac'] & R['is_sleeper'] & (R['price'] <= 900)
+    )
+])
+def test_matches_pandas(rows, CONDITIONS, EXPECTED):
+
+    INDEX = BitmapIndex(rows)
+
+    MATCHED = rows[EXPECTED(rows)]
+
+    assert INDEX.count(**CONDITIONS) == len(MATCHED)
+
+    # Walk every page and compare with a (price, id) sort
+    BUSES, NEXT = [], None
+
+    while True:
+
+        PAGE, NEXT = INDEX.page(after=NEXT, limit=97, **CONDITIONS)
+
+        BUSES.extend(PAGE['busname'])
+
+        if NEXT is None:
+
+            break
+
+    EXPECTED_ORDER = MATCHED.sort_values(
+        ['price', 'id'], na_position='last'
+    )['busname']
+
+    assert BUSES == list(EXPECTED_ORDER)
+
+
+def test_unknown_scope_matches_nothing(rows):
+
+    INDEX = BitmapIndex(rows)
+
+    assert INDEX.count(state='Bihar') == 0
+
+    assert INDEX.count(state='Goa', route='Route 7') == 0
+
+
+def test_members_are_the_set_bits():
+
+    MASK = np.random.default_rng(1).random(1001) < 0.1
+
+    assert list(members(to_bitset(MASK))) == list(np.flatnonzero(MASK))
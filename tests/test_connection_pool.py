@@ -0,0 +1,87 @@
+"""
+ConnectionPool: every borrowed connection goes back to the pool
+
+Uses stand-in connections, so no database server is needed.
+"""
+import pytest
+
+mysql_connector = pytest.importorskip("mysql.connector")
+
+pytest.importorskip("sqlalchemy")
+
+import db
+
+
+class FakeConnection:
+
+    def __init__(self):
+
+        self.closed = False
+
+    def close(self):
+
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+
+    monkeypatch.setattr(db, 'connect', lambda database: FakeConnection())
+
+    return db.ConnectionPool(size=2, timeout=0.1)
+
+
+def test_query_errors_release_the_connection(pool):
+
+    # e.g. ER_NO_SUCH_TABLE while polling the snapshot version
+    # before the first ingest
+    for _ in range(5):
+
+        with pytest.raises(mysql_connector.errors.ProgrammingError):
+
+            with pool.connection():
+
+                raise mysql_connector.errors.ProgrammingError("no table")
+
+    STATS = pool.stats()
+
+    assert STATS['in_use'] == 0
+
+    assert STATS['created'] == 1
+
+    assert STATS['replaced'] == 0
+
+
+def test_connection_errors_replace_the_connection(pool):
+
+    with pytest.raises(mysql_connector.errors.OperationalError):
+
+        with pool.connection() as CONN:
+
+            raise mysql_connector.errors.OperationalError("gone away")
+
+    assert CONN.closed
+
+    with pool.connection() as NEW:
+
+        assert NEW is not CONN
+
+    STATS = pool.stats()
+
+    assert STATS['in_use'] == 0
+
+    assert STATS['replaced'] == 1
+
+
+def test_abandoned_block_releases_the_connection(pool):
+
+    for _ in range(5):
+
+        BLOCK = pool.connection()
+
+        BLOCK.__enter__()
+
+        # A generator closed mid-block raises GeneratorExit inside it
+        BLOCK.gen.close()
+
+    assert pool.stats()['in_use'] == 0
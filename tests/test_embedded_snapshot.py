@@ -0,0 +1,143 @@
+"""
+Smoke test: build a small embedded snapshot and query it
+
+Runs a tiny scrape through normalize_frame() and
+storage.build_embedded(). It then reads it back the way the
+dashboard does: snapshot version, route_summary, the bitmap index
+and a route slice. Every backend that is installed is covered.
+"""
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+pytest.importorskip("sqlalchemy")
+
+pytest.importorskip("mysql.connector")
+
+import route_slice
+
+import storage
+
+from bitmap_index import BitmapIndex, read_snapshot
+
+from normalize import normalize_frame
+
+SCRAPE = {
+    'state': ['Kerala', 'Kerala', 'Kerala', 'Goa'],
+    'route_name': [
+        'Kochi to Bangalore', 'Kochi to Bangalore',
+        'Kochi to Chennai', 'Panaji to Pune'
+    ],
+    'route_link': [
+        'https://www.redbus.in/bus-tickets/kochi-to-bangalore',
+        'https://www.redbus.in/bus-tickets/kochi-to-bangalore',
+        'https://www.redbus.in/bus-tickets/kochi-to-chennai',
+        'https://www.redbus.in/bus-tickets/panaji-to-pune'
+    ],
+    'busname': ['KSRTC', 'Kallada Travels', 'KSRTC', 'Paulo Travels'],
+    'bustype': [
+        'Volvo A/C Seater', 'A/C Sleeper (2+1)',
+        'Non A/C Seater (2+3)', 'A/C Sleeper (2+1)'
+    ],
+    'departing_time': ['21:30', '22:15', '07:00', '19:45'],
+    'duration': ['10h 30m', '09h 45m', '12h 00m', '11h 15m'],
+    'reaching_time': ['08:00', '08:00', '19:00', '07:00'],
+    'star_rating': ['4.2', 'New', '3.1', '4.5'],
+    'price': ['1,250', '899', '650', '1,100'],
+    'seats_available': ['23 Seats left', '5 Seats left', '40 Seats', '12']
+}
+
+
+def backends():
+
+    BACKENDS = ['sqlite']
+
+    try:
+
+        import duckdb  # noqa: F401
+
+        BACKENDS.append('duckdb')
+
+    except ImportError:
+
+        pass
+
+    return BACKENDS
+
+
+@pytest.fixture(params=backends())
+def snapshot(request, tmp_path):
+
+    PATH = str(tmp_path / f"busgrid.{request.param}")
+
+    storage.build_embedded(
+        normalize_frame(pd.DataFrame(SCRAPE)), PATH, request.param
+    )
+
+    return storage.open_storage(request.param, PATH)
+
+
+def test_snapshot_version(snapshot):
+
+    assert snapshot.snapshot_version() == 1
+
+
+def test_route_summary(snapshot):
+
+    ROWS = snapshot.fetch_all(
+        """
+        SELECT state, route_name, bus_count, min_price, max_price
+        FROM route_summary
+        ORDER BY state, route_name
+        """
+    )
+
+    assert [(R[0], R[1], R[2]) for R in ROWS] == [
+        ('Goa', 'Panaji to Pune', 1),
+        ('Kerala', 'Kochi to Bangalore', 2),
+        ('Kerala', 'Kochi to Chennai', 1)
+    ]
+
+    assert float(ROWS[1][3]) == 899.0
+
+    assert float(ROWS[1][4]) == 1250.0
+
+
+def test_bitmap_index(snapshot):
+
+    INDEX = BitmapIndex(read_snapshot(snapshot))
+
+    assert INDEX.count() == 4
+
+    assert INDEX.count(state='Kerala') == 3
+
+    assert INDEX.count(state='Kerala', filters=['sleeper']) == 1
+
+    PAGE, NEXT = INDEX.page(limit=3)
+
+    assert list(PAGE['price']) == [650.0, 899.0, 1100.0]
+
+    PAGE, NEXT = INDEX.page(after=NEXT, limit=3)
+
+    assert list(PAGE['price']) == [1250.0]
+
+    assert NEXT is None
+
+
+def test_route_slice(snapshot):
+
+    SLICE = route_slice.read_route_slice(
+        snapshot, 'Kerala', 'Kochi to Bangalore'
+    )
+
+    assert route_slice.price_bounds(SLICE) == (899.0, 1250.0)
+
+    PAGE, NEXT = route_slice.page_slice(SLICE, limit=1)
+
+    assert list(PAGE['busname'].astype(str)) == ['Kallada Travels']
+
+    PAGE, NEXT = route_slice.page_slice(SLICE, after=NEXT, limit=1)
+
+    assert list(PAGE['busname'].astype(str)) == ['KSRTC']
+
+    assert NEXT is None
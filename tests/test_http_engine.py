@@ -0,0 +1,169 @@
+"""
+http_engine: scraping the replay fixtures and streaming to a sink
+
+The engine is run against benchmarks.replay.ReplayServer, and the
+scraped names and prices are checked against what the fixtures
+serve. A sink that blocks (a full stream.RouteWriter queue) must not
+stall the event loop the concurrent fetches run on.
+"""
+import asyncio
+
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+pytest.importorskip("lxml")
+
+pytest.importorskip("selenium")
+
+pytest.importorskip("pandas")
+
+import http_engine
+
+import scraper
+
+from benchmarks import replay
+
+from normalize import SCRAPED_ROUTES
+
+# Served routes: (path, title, [(bus name, price)])
+ROUTES = [
+    ('/bus-tickets/kochi-to-mysuru', 'Kochi → Mysuru', [
+        ('Kallada – Sleeper', 1858), ('KSRTC', 640), ('Sharma Travels', 2450)
+    ]),
+    ('/bus-tickets/chennai-to-madurai', 'சென்னை to மதுரை', [
+        ('திருவள்ளுவர் Express', 725), ('Parveen Travels', 1099)
+    ])
+]
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+
+    """
+    Writes one state of routes that the HTTP engine can scrape
+    without a browser (no pagination, government groups or lazy
+    loading), and the links and manifest files of the replay
+    server. The manifest lists the expected buses.
+    """
+
+    DIRECTORY = str(tmp_path)
+
+    RANDOM = replay.random.Random(0)
+
+    EXPECTED = []
+
+    for PATH, TITLE, BUSES in ROUTES:
+
+        CARDS = []
+
+        for NAME, PRICE in BUSES:
+
+            HTML = replay.card(RANDOM, NAME)
+
+            # Replace the random fare by the expected one
+            START = HTML.index('₹') + 1
+
+            END = HTML.index('<', START)
+
+            CARDS.append(HTML[:START] + f"{PRICE:,}" + HTML[END:])
+
+            EXPECTED.append((TITLE, NAME, str(PRICE)))
+
+        replay.write_page(
+            DIRECTORY, PATH, replay.route_page(TITLE, CARDS)
+        )
+
+    replay.write_page(
+        DIRECTORY, '/online-booking/kerala',
+        replay.state_page('Kerala', [(P, T) for P, T, _ in ROUTES])
+    )
+
+    replay.write_json(
+        DIRECTORY, 'links.json', {'Kerala': '/online-booking/kerala'}
+    )
+
+    replay.write_json(DIRECTORY, 'manifest.json', {
+        'kind': 'test', 'routes': len(ROUTES), 'buses': len(EXPECTED),
+        'expected': EXPECTED
+    })
+
+    return DIRECTORY
+
+
+def test_scrapes_the_replay_server(fixtures):
+
+    with replay.ReplayServer(fixtures) as SERVER:
+
+        RESULTS, PENDING, ROUTE_COUNT, BUSES = asyncio.run(
+            http_engine.scrap_states(SERVER.links(), 4)
+        )
+
+        MANIFEST = SERVER.manifest()
+
+    assert PENDING == [[]]
+
+    assert ROUTE_COUNT == MANIFEST['routes']
+
+    assert BUSES == MANIFEST['buses']
+
+    [(_, DATA)] = RESULTS
+
+    SCRAPED = list(zip(DATA['route_name'], DATA['busname'], DATA['price']))
+
+    assert SCRAPED == [tuple(E) for E in MANIFEST['expected']]
+
+
+
+def test_blocking_sink_leaves_the_event_loop_running():
+
+    RELEASED = threading.Event()
+
+    RECEIVED = []
+
+    def sink(PART):
+
+        # Blocks like a full writer queue until the loop, still
+        # running other coroutines, frees it
+        assert RELEASED.wait(timeout=5)
+
+        RECEIVED.append(PART)
+
+    async def other_fetch():
+
+        await asyncio.sleep(0.01)
+
+        RELEASED.set()
+
+    async def main(PART):
+
+        ROWS, _ = await asyncio.gather(
+            http_engine.emit_route(None, PART, LINK, sink), other_fetch()
+        )
+
+        return ROWS
+
+    LINK = 'https://www.redbus.in/bus-tickets/kochi-to-bangalore'
+
+    PART = {'busname': ['KSRTC', 'Kallada Travels']}
+
+    assert asyncio.run(main(PART)) == 2
+
+    assert RECEIVED == [PART]
+
+
+def test_without_sink_routes_are_appended():
+
+    DATA, PART = scraper.new_data(), scraper.new_data()
+
+    for COLUMN in PART:
+
+        PART[COLUMN].append(COLUMN)
+
+    LINK = 'https://www.redbus.in/bus-tickets/kochi-to-bangalore'
+
+    assert asyncio.run(http_engine.emit_route(DATA, PART, LINK)) == 1
+
+    assert DATA == {**PART, SCRAPED_ROUTES: [LINK]}
@@ -0,0 +1,86 @@
+"""
+scraper: worker failure handling and route bookkeeping
+
+Uses stand-ins for the browser, so Chrome is not needed.
+"""
+import pytest
+
+pytest.importorskip("selenium")
+
+pytest.importorskip("pandas")
+
+import scraper
+
+
+def test_worker_without_browser_returns_its_stats(monkeypatch):
+
+    def no_chrome(**KWARGS):
+
+        raise RuntimeError("Chrome failed to start")
+
+    monkeypatch.setattr(scraper, 'new_driver', no_chrome)
+
+    TASKS = [(0, 'Kerala', [('https://example.test/r', 'Route')])]
+
+    RESULTS, STATS = scraper.run_tasks(0, TASKS)
+
+    assert RESULTS == []
+
+    assert STATS['tasks'] == 0
+
+    # Still complete enough for report_throughput()
+    scraper.report_throughput([STATS])
+
+
+def test_failed_route_is_not_emitted(monkeypatch):
+
+    monkeypatch.setattr(scraper, 'visit_route', lambda *ARGS: False)
+
+    EMITTED = []
+
+    BUSES = scraper.scrap_route(
+        None, scraper.AdaptiveWaiter(None), None, 'Kerala',
+        'https://example.test/r', 'Route', SINK=EMITTED.append
+    )
+
+    assert BUSES == 0
+
+    assert EMITTED == []
+
+
+def test_route_without_buses_is_listed(monkeypatch):
+
+    monkeypatch.setattr(scraper, 'visit_route', lambda *ARGS: True)
+
+    DATA = scraper.new_data()
+
+    BUSES = scraper.scrap_route(
+        None, scraper.AdaptiveWaiter(None), DATA, 'Kerala',
+        'https://example.test/r', 'Route'
+    )
+
+    assert BUSES == 0
+
+    DATA = scraper.merge_results([(0, DATA)])
+
+    assert DATA.pop(scraper.SCRAPED_ROUTES) == ['https://example.test/r']
+
+    assert not DATA['busname']
+
+
+def test_cards_with_ids_are_told_apart():
+
+    RECORD = {NAME: 'same' for NAME in scraper.CARD_FIELDS}
+
+    FIRST = {**RECORD, 'card_id': 'bus-101'}
+
+    SECOND = {**RECORD, 'card_id': 'bus-102'}
+
+    assert scraper.card_key(FIRST) != scraper.card_key(SECOND)
+
+    assert scraper.card_key(FIRST) == scraper.card_key(dict(FIRST))
+
+    # Without an id the displayed fields are the key
+    assert scraper.card_key(RECORD) == scraper.card_key({
+        **RECORD, 'card_id': None
+    })
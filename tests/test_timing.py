@@ -0,0 +1,64 @@
+"""
+AdaptiveWaiter: adaptive timeouts only for waits that replace sleeps
+"""
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.common.exceptions import TimeoutException
+
+from timing import AdaptiveWaiter
+
+
+def ready_after(SECONDS):
+
+    START = time.perf_counter()
+
+    return lambda driver: time.perf_counter() - START >= SECONDS
+
+
+def fast_waiter():
+
+    WAIT = AdaptiveWaiter(
+        None, min_timeout=0.05, max_timeout=2, poll=0.005, max_poll=0.01
+    )
+
+    # A run of fast pages shrinks the adaptive timeout to the floor
+    for _ in range(20):
+
+        WAIT.until(lambda driver: True, 'page')
+
+    assert WAIT.timeout('page') == pytest.approx(0.05)
+
+    return WAIT
+
+
+def test_until_keeps_the_full_timeout_after_fast_waits():
+
+    WAIT = fast_waiter()
+
+    assert WAIT.until(ready_after(0.3), 'page')
+
+    assert WAIT.stats['timeouts'] == 0
+
+
+def test_settle_uses_the_adaptive_timeout():
+
+    WAIT = fast_waiter()
+
+    START = time.perf_counter()
+
+    assert WAIT.settle(ready_after(1.0), 'page') is False
+
+    assert time.perf_counter() - START < 0.5
+
+
+def test_until_raises_after_the_ceiling():
+
+    WAIT = AdaptiveWaiter(None, max_timeout=0.1, poll=0.01)
+
+    with pytest.raises(TimeoutException):
+
+        WAIT.until(lambda driver: False, 'page')
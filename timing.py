@@ -0,0 +1,316 @@
+"""
+Event-driven waits with an adaptive timing policy for the scraper
+
+The scraper used to sleep a fixed 3 seconds after every page load,
+every back navigation and every scroll step, and to wait up to 30
+seconds for every element. This module replaces those sleeps with
+waits on concrete DOM conditions (document ready, new cards or end
+marker present, route links changed) and tunes each wait's timeout
+from the latencies observed so far in the run.
+
+Each kind of wait keeps an exponentially weighted mean and deviation
+of its latency. Waits that stand in for a fixed sleep (settle()) time
+out after mean + FACTOR * deviation, clamped between a floor and the
+old 30 second ceiling: their timeout only means "nothing more came".
+Waits whose timeout fails a route (until()) keep the full ceiling, so
+one slow page after a run of fast ones is not lost. Polling starts fast
+and backs off, so quick pages are picked up in tens of milliseconds
+without busy-looping on slow ones.
+
+Every wait is also recorded in the waiter's Metrics registry (see
+metrics), which the scraper uses for its own phase timings.
+
+Modules used:
+- time: for measuring latencies
+- logging: for reporting the time saved per run
+- selenium: for driver exceptions and expected conditions
+- metrics: for wait histograms and timeout counters
+"""
+import logging
+
+import time
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException
+)
+
+from selenium.webdriver.common.by import By
+
+from metrics import Metrics
+
+LOGGER = logging.getLogger(__name__)
+
+# The fixed delay the event-driven waits replace, used to
+# estimate how much idle time a run avoided
+FIXED_SLEEP = 3
+
+# Exceptions that mean "not there yet" while polling a condition
+IGNORED_EXCEPTIONS = (NoSuchElementException, StaleElementReferenceException)
+
+
+def document_ready():
+
+    """
+    Condition: the current document has finished parsing.
+    """
+
+    def condition(driver):
+
+        return driver.execute_script(
+            "return document.readyState"
+        ) in ('interactive', 'complete')
+
+    return condition
+
+
+def new_cards_or_end(SELECTOR, END_XPATH):
+
+    """
+    Condition: an element matches the CSS SELECTOR (lazy loading
+    rendered cards not read yet) or the end-of-list marker is
+    present. Unlike a count, this also works for virtualized lists
+    that remove cards while adding new ones.
+    """
+
+    def condition(driver):
+
+        if driver.find_elements(By.CSS_SELECTOR, SELECTOR):
+
+            return True
+
+        return bool(driver.find_elements(By.XPATH, END_XPATH))
+
+    return condition
+
+
+def links_changed(SELECTOR, PREVIOUS=None):
+
+    """
+    Condition: links match the CSS SELECTOR and their (href, title)
+    pairs differ from PREVIOUS, e.g. once a client-side tab switch
+    has replaced the list. Returns the pairs.
+    """
+
+    def condition(driver):
+
+        PAIRS = [
+            (LINK.get_attribute('href'), LINK.get_attribute('title'))
+            for LINK in driver.find_elements(By.CSS_SELECTOR, SELECTOR)
+        ]
+
+        return PAIRS if PAIRS and PAIRS != PREVIOUS else False
+
+    return condition
+
+
+class AdaptiveWaiter:
+
+    """
+    Drop-in replacement for WebDriverWait whose timeout and
+    polling interval adapt to observed page latencies.
+
+    until(condition, kind) polls condition(driver) until it returns
+    a truthy value, like WebDriverWait.until, for up to max_timeout
+    seconds. settle(condition, kind) waits only as long as the
+    adaptive timeout of its kind. Latencies are tracked per kind,
+    so scroll steps and page loads tune separately. Pass
+    replaces=FIXED_SLEEP when a wait stands in for an old fixed sleep
+    so the time saved can be reported.
+
+    metrics is the Metrics registry every wait is recorded in; the
+    scraper records its phases and route spans in the same one.
+    """
+
+    FACTOR = 4
+
+    ALPHA = 0.2
+
+    def __init__(
+        self, driver, min_timeout=2, max_timeout=30,
+        poll=0.05, max_poll=0.5, metrics=None
+    ):
+
+        self.driver = driver
+
+        self.metrics = Metrics() if metrics is None else metrics
+
+        self.min_timeout = min_timeout
+
+        self.max_timeout = max_timeout
+
+        self.poll = poll
+
+        self.max_poll = max_poll
+
+        # kind -> [ewma latency, ewma absolute deviation]
+        self.latencies = {}
+
+        # kind -> total seconds spent waiting
+        self.waited_by_kind = {}
+
+        self.stats = {
+            'waits': 0,
+            'timeouts': 0,
+            'waited': 0.0,
+            'replaced': 0,
+            'replaced_waited': 0.0,
+        }
+
+    def timeout(self, kind):
+
+        """
+        Returns the current timeout for a kind of wait.
+        """
+
+        if kind not in self.latencies:
+
+            return self.max_timeout
+
+        MEAN, DEV = self.latencies[kind]
+
+        return min(
+            self.max_timeout,
+            max(self.min_timeout, MEAN + self.FACTOR * DEV)
+        )
+
+    def observe(self, kind, SECONDS):
+
+        """
+        Folds one observed latency into the running estimates.
+        """
+
+        if kind not in self.latencies:
+
+            self.latencies[kind] = [SECONDS, SECONDS / 2]
+
+            return
+
+        MEAN, DEV = self.latencies[kind]
+
+        DEV += self.ALPHA * (abs(SECONDS - MEAN) - DEV)
+
+        MEAN += self.ALPHA * (SECONDS - MEAN)
+
+        self.latencies[kind] = [MEAN, DEV]
+
+    def until(self, condition, kind='element', replaces=0, adaptive=False):
+
+        """
+        Polls condition(driver) with backoff until it is truthy
+        and returns its value, or raises TimeoutException after
+        max_timeout seconds (the adaptive timeout of the kind when
+        adaptive is True).
+        """
+
+        TIMEOUT = self.timeout(kind) if adaptive else self.max_timeout
+
+        POLL = self.poll
+
+        START = time.perf_counter()
+
+        try:
+
+            while True:
+
+                try:
+
+                    VALUE = condition(self.driver)
+
+                    if VALUE:
+
+                        self.observe(kind, time.perf_counter() - START)
+
+                        return VALUE
+
+                except IGNORED_EXCEPTIONS:
+
+                    pass
+
+                if time.perf_counter() - START >= TIMEOUT:
+
+                    self.stats['timeouts'] += 1
+
+                    self.metrics.incr('timeouts', kind=kind)
+
+                    # Back off: a timed-out wait counts as a slow sample
+                    # so the next wait of this kind gets more headroom
+                    self.observe(kind, TIMEOUT)
+
+                    raise TimeoutException(
+                        f"{kind} condition not met after {TIMEOUT:.1f}s"
+                    )
+
+                time.sleep(POLL)
+
+                POLL = min(self.max_poll, POLL * 1.5)
+
+        finally:
+
+            ELAPSED = time.perf_counter() - START
+
+            self.stats['waits'] += 1
+
+            self.stats['waited'] += ELAPSED
+
+            self.waited_by_kind[kind] = (
+                self.waited_by_kind.get(kind, 0.0) + ELAPSED
+            )
+
+            self.metrics.observe('wait_seconds', ELAPSED, kind=kind)
+
+            if replaces:
+
+                self.stats['replaced'] += 1
+
+                self.stats['replaced_waited'] += ELAPSED
+
+    def settle(self, condition, kind, replaces=FIXED_SLEEP):
+
+        """
+        Waits like until(), for the adaptive timeout of the kind,
+        but treats a timeout as "nothing more to wait for" and
+        returns False instead of raising.
+        """
+
+        try:
+
+            return self.until(condition, kind, replaces, adaptive=True)
+
+        except TimeoutException:
+
+            return False
+
+    def time_saved(self):
+
+        """
+        Seconds of fixed sleeping avoided by the event-driven waits.
+        """
+
+        return (
+            self.stats['replaced'] * FIXED_SLEEP
+            - self.stats['replaced_waited']
+        )
+
+    def report(self):
+
+        """
+        Returns the wait statistics including time saved and the
+        current timeout per kind of wait.
+        """
+
+        REPORT = dict(self.stats)
+
+        REPORT['time_saved'] = self.time_saved()
+
+        REPORT['timeouts_by_kind'] = {
+            KIND: round(self.timeout(KIND), 2) for KIND in self.latencies
+        }
+
+        REPORT['waited_by_kind'] = {
+            KIND: round(SECONDS, 3)
+            for KIND, SECONDS in self.waited_by_kind.items()
+        }
+
+        return REPORT